@@ -1,7 +1,16 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 import os
+from datetime import datetime
+import multiprocessing
+import atexit
 from predict_simple import WeatherPredictor
-from time_extractor import TimeExtractor
+from prediction_cache import PredictionCache
+from inference_pool import InferencePool
+from time_extractor import TimeExtractor, make_history_cursor, parse_history_cursor
+from partitioned_history import PartitionedTimeExtractor
+from history_writer import HistoryWriter
+from history_broadcaster import HistoryBroadcaster
+from history_export import EXPORT_FORMATS, export_filename, export_mimetype, iter_export
 from werkzeug.utils import secure_filename
 import logging
 
@@ -17,6 +26,40 @@ UPLOAD_FOLDER = os.path.join(BASE_DIR, 'static', 'uploads')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 MODEL_PATH = os.path.join(BASE_DIR, 'checkpoints', 'simple_model_best.h5')
 
+# Cấu hình cache kết quả dự đoán cho ảnh trùng lặp
+CACHE_MAX_ENTRIES = 1024
+CACHE_MAX_BYTES = 16 * 1024 * 1024
+CACHE_TTL_SECONDS = 300
+
+# Cấu hình micro-batching cho các request /predict đồng thời (MICRO_BATCH_SIZE=1 để tắt)
+MICRO_BATCH_SIZE = int(os.environ.get('MICRO_BATCH_SIZE', 32))
+MICRO_BATCH_WAIT_MS = float(os.environ.get('MICRO_BATCH_WAIT_MS', 5))
+
+# Chế độ nhiều process suy luận (INFERENCE_WORKERS=0 để suy luận trong process web)
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 0))
+WORKER_INTRA_OP_THREADS = int(os.environ.get('WORKER_INTRA_OP_THREADS', 1))
+WORKER_INTER_OP_THREADS = int(os.environ.get('WORKER_INTER_OP_THREADS', 1))
+
+# Tải TensorFlow và model trong thread nền để các trang lịch sử phục vụ được ngay
+LAZY_MODEL_LOAD = os.environ.get('LAZY_MODEL_LOAD', '1') != '0'
+# Thời gian tối đa /predict chờ model tải xong (giây)
+MODEL_READY_TIMEOUT = float(os.environ.get('MODEL_READY_TIMEOUT', 60))
+
+# Ghi lịch sử bất đồng bộ theo batch (ASYNC_HISTORY=0 để ghi đồng bộ)
+ASYNC_HISTORY = os.environ.get('ASYNC_HISTORY', '1') != '0'
+HISTORY_BATCH_SIZE = int(os.environ.get('HISTORY_BATCH_SIZE', 256))
+HISTORY_MAX_LATENCY_MS = float(os.environ.get('HISTORY_MAX_LATENCY_MS', 50))
+HISTORY_QUEUE_SIZE = int(os.environ.get('HISTORY_QUEUE_SIZE', 10000))
+HISTORY_FULL_POLICY = os.environ.get('HISTORY_FULL_POLICY', 'block')
+
+# Lưu lịch sử thành một file SQLite mỗi tháng trong thư mục này (để trống: một file duy nhất)
+HISTORY_PARTITION_DIR = os.environ.get('HISTORY_PARTITION_DIR', '')
+
+# Luồng Server-Sent Events cho bản ghi lịch sử mới (/api/history/stream)
+HISTORY_STREAM_QUEUE_SIZE = int(os.environ.get('HISTORY_STREAM_QUEUE_SIZE', 256))
+HISTORY_STREAM_HEARTBEAT = float(os.environ.get('HISTORY_STREAM_HEARTBEAT', 15))
+HISTORY_STREAM_REPLAY_LIMIT = int(os.environ.get('HISTORY_STREAM_REPLAY_LIMIT', 1000))
+
 # Tạo các thư mục cần thiết
 required_dirs = [
     os.path.join(BASE_DIR, 'static'),
@@ -30,15 +73,61 @@ for directory in required_dirs:
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
 # Khởi tạo model
-try:
-    if not os.path.exists(MODEL_PATH):
-        raise FileNotFoundError(f"Model file not found at {MODEL_PATH}")
-    predictor = WeatherPredictor(MODEL_PATH, data_dir=os.path.join(BASE_DIR, 'data'))
-    time_extractor = TimeExtractor()
-    logger.info("Model loaded successfully")
-except Exception as e:
-    logger.error(f"Error loading model: {str(e)}")
-    raise
+# Process worker của InferencePool (spawn) import lại module này: không khởi tạo model ở đó
+if multiprocessing.parent_process() is None:
+    try:
+        if not os.path.exists(MODEL_PATH):
+            raise FileNotFoundError(f"Model file not found at {MODEL_PATH}")
+        prediction_cache = PredictionCache(
+            max_entries=CACHE_MAX_ENTRIES,
+            max_bytes=CACHE_MAX_BYTES,
+            ttl=CACHE_TTL_SECONDS
+        )
+        inference_pool = None
+        if INFERENCE_WORKERS > 0:
+            inference_pool = InferencePool(
+                MODEL_PATH,
+                num_workers=INFERENCE_WORKERS,
+                intra_op_threads=WORKER_INTRA_OP_THREADS,
+                inter_op_threads=WORKER_INTER_OP_THREADS,
+                max_batch_size=MICRO_BATCH_SIZE,
+                data_dir=os.path.join(BASE_DIR, 'data')
+            ).start(wait=not LAZY_MODEL_LOAD)
+            atexit.register(inference_pool.stop)
+        if HISTORY_PARTITION_DIR:
+            time_extractor = PartitionedTimeExtractor(HISTORY_PARTITION_DIR)
+        else:
+            time_extractor = TimeExtractor()
+        atexit.register(time_extractor.close)
+        history_broadcaster = HistoryBroadcaster(
+            time_extractor,
+            queue_size=HISTORY_STREAM_QUEUE_SIZE,
+            heartbeat_seconds=HISTORY_STREAM_HEARTBEAT,
+            replay_limit=HISTORY_STREAM_REPLAY_LIMIT
+        )
+        time_extractor.add_listener(history_broadcaster.publish)
+        atexit.register(history_broadcaster.close)
+        history_writer = None
+        if ASYNC_HISTORY:
+            history_writer = HistoryWriter(
+                time_extractor,
+                max_queue_size=HISTORY_QUEUE_SIZE,
+                batch_size=HISTORY_BATCH_SIZE,
+                max_latency_ms=HISTORY_MAX_LATENCY_MS,
+                full_policy=HISTORY_FULL_POLICY
+            ).start()
+        predictor = WeatherPredictor(MODEL_PATH, data_dir=os.path.join(BASE_DIR, 'data'),
+                                     cache=prediction_cache, inference_pool=inference_pool,
+                                     lazy_load=LAZY_MODEL_LOAD, history_writer=history_writer,
+                                     time_extractor=time_extractor)
+        if LAZY_MODEL_LOAD:
+            predictor.load_in_background()
+        if MICRO_BATCH_SIZE > 1 and inference_pool is None:
+            predictor.start_micro_batching(MICRO_BATCH_SIZE, MICRO_BATCH_WAIT_MS)
+        logger.info("Predictor initialized" + (" (model loading in background)" if LAZY_MODEL_LOAD else ""))
+    except Exception as e:
+        logger.error(f"Error loading model: {str(e)}")
+        raise
 
 def allowed_file(filename):
     """Kiểm tra phần mở rộng của file có được cho phép không"""
@@ -64,16 +153,20 @@ def predict():
             return jsonify({'error': 'Chưa chọn file'}), 400
         
         if file and allowed_file(file.filename):
-            # Lưu file
             filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            
+            # Chờ model tải xong (chế độ tải nền)
+            if not predictor.wait_until_ready(MODEL_READY_TIMEOUT):
+                if predictor.load_error is not None:
+                    logger.error(f"Model failed to load: {str(predictor.load_error)}")
+                    return jsonify({'error': f'Lỗi khi tải model: {str(predictor.load_error)}'}), 500
+                logger.warning("Model is not ready yet")
+                return jsonify({'error': 'Model đang được tải, vui lòng thử lại sau'}), 503
             
             try:
-                file.save(filepath)
-                logger.info(f"File saved successfully: {filepath}")
-                
-                # Dự đoán
-                result = predictor.predict(filepath, record_history=True)
+                # Dự đoán trực tiếp từ stream upload, không ghi file tạm
+                result = predictor.predict_stream(file.stream, image_name=filename,
+                                                  record_history=True)
                 logger.info(f"Prediction successful: {result}")
                 
                 # Kiểm tra độ tin cậy của dự đoán
@@ -87,6 +180,7 @@ def predict():
                     'timestamp': result.get('timestamp', ''),
                     'duration': result.get('duration', 0),
                     'time_components': result.get('time_components', {}),
+                    'cached': result.get('cached', False),
                     'warning': 'Dự đoán có độ tin cậy thấp' if confidence < 0.4 else None
                 }
                 
@@ -95,14 +189,6 @@ def predict():
             except Exception as e:
                 logger.error(f"Error during prediction: {str(e)}")
                 return jsonify({'error': f'Lỗi khi dự đoán: {str(e)}'}), 500
-            finally:
-                # Xóa file tạm sau khi xử lý
-                if os.path.exists(filepath):
-                    try:
-                        os.remove(filepath)
-                        logger.info(f"Temporary file removed: {filepath}")
-                    except Exception as e:
-                        logger.warning(f"Could not remove temporary file: {str(e)}")
         
         logger.warning("Unsupported file type")
         return jsonify({'error': 'File không được hỗ trợ'}), 400
@@ -110,6 +196,59 @@ def predict():
         logger.error(f"Unexpected error: {str(e)}")
         return jsonify({'error': 'Lỗi hệ thống'}), 500
 
+@app.route('/api/health', methods=['GET'])
+def health():
+    """Trạng thái sẵn sàng của ứng dụng và model"""
+    return jsonify({
+        'success': True,
+        'model_ready': predictor.ready.is_set(),
+        'model_error': str(predictor.load_error) if predictor.load_error else None
+    })
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Thống kê cache kết quả dự đoán"""
+    return jsonify({
+        'success': True,
+        'cache': prediction_cache.stats()
+    })
+
+@app.route('/api/stats/batching', methods=['GET'])
+def get_batching_stats():
+    """Thống kê micro-batching (độ sâu hàng đợi, histogram kích thước batch)"""
+    scheduler = predictor.batch_scheduler
+    return jsonify({
+        'success': True,
+        'enabled': scheduler is not None,
+        'batching': scheduler.stats() if scheduler is not None else None
+    })
+
+@app.route('/api/stats/workers', methods=['GET'])
+def get_worker_stats():
+    """Trạng thái các process suy luận (chế độ INFERENCE_WORKERS > 0)"""
+    return jsonify({
+        'success': True,
+        'enabled': inference_pool is not None,
+        'workers': inference_pool.stats() if inference_pool is not None else None
+    })
+
+@app.route('/api/stats/history-writer', methods=['GET'])
+def get_history_writer_stats():
+    """Thống kê hàng đợi ghi lịch sử bất đồng bộ"""
+    return jsonify({
+        'success': True,
+        'enabled': history_writer is not None,
+        'writer': history_writer.stats() if history_writer is not None else None
+    })
+
+@app.route('/api/stats/history-stream', methods=['GET'])
+def get_history_stream_stats():
+    """Thống kê luồng lịch sử: số client đang kết nối, số bản ghi đã phát"""
+    return jsonify({
+        'success': True,
+        'stream': history_broadcaster.stats()
+    })
+
 @app.route('/api/history/date', methods=['GET'])
 def get_history_by_date():
     """Lấy lịch sử phân tích theo năm/tháng/ngày"""
@@ -158,6 +297,28 @@ def get_history_by_time_range():
         logger.error(f"Error getting history by time range: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/history/between', methods=['GET'])
+def get_history_between():
+    """Lấy lịch sử phân tích trong khoảng thời gian bất kỳ (start, end dạng ISO 8601)"""
+    try:
+        try:
+            start = datetime.fromisoformat(request.args['start'])
+            end = datetime.fromisoformat(request.args['end'])
+        except (KeyError, ValueError):
+            return jsonify({'error': 'start và end phải là thời gian ISO 8601'}), 400
+        limit = request.args.get('limit', type=int)
+        
+        records = time_extractor.get_analysis_between(start, end, limit)
+        
+        return jsonify({
+            'success': True,
+            'count': len(records),
+            'records': records
+        })
+    except Exception as e:
+        logger.error(f"Error getting history between: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/history/statistics', methods=['GET'])
 def get_statistics():
     """Lấy thống kê phân tích"""
@@ -202,20 +363,60 @@ def get_hourly_statistics():
 
 @app.route('/api/history/all', methods=['GET'])
 def get_all_history():
-    """Lấy toàn bộ lịch sử phân tích"""
+    """
+    Lấy lịch sử phân tích mới nhất, phân trang theo cursor
+    
+    Tham số: limit, cursor (next_cursor của trang trước) hoặc since_id (chỉ lấy bản ghi
+    có id lớn hơn, dùng để làm mới danh sách)
+    """
     try:
         limit = request.args.get('limit', 100, type=int)
-        records = time_extractor.get_all_history(limit)
+        since_id = request.args.get('since_id', type=int)
+        cursor = request.args.get('cursor')
+        try:
+            cursor = parse_history_cursor(cursor) if cursor else None
+        except ValueError:
+            return jsonify({'error': 'cursor không hợp lệ'}), 400
+        
+        records = time_extractor.get_all_history(limit, cursor=cursor, since_id=since_id)
         
         return jsonify({
             'success': True,
             'count': len(records),
-            'records': records
+            'records': records,
+            # Trang kế tiếp (cũ hơn); None khi đã hết dữ liệu
+            'next_cursor': make_history_cursor(records[-1]) if len(records) >= limit else None,
+            # id lớn nhất đã trả về, dùng làm since_id cho lần làm mới sau
+            'last_id': max([record['id'] for record in records], default=since_id)
         })
     except Exception as e:
         logger.error(f"Error getting all history: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/history/stream', methods=['GET'])
+def history_stream():
+    """
+    Luồng Server-Sent Events các bản ghi lịch sử mới (sự kiện 'analysis', id = id bản ghi)
+    
+    Khi kết nối lại, các bản ghi có id lớn hơn header Last-Event-ID (hoặc tham số last_id)
+    được phát lại trước
+    """
+    try:
+        last_id = request.headers.get('Last-Event-ID') or request.args.get('last_id')
+        try:
+            last_id = int(last_id) if last_id else None
+        except ValueError:
+            return jsonify({'error': 'last_id không hợp lệ'}), 400
+        
+        return Response(
+            stream_with_context(history_broadcaster.stream(last_id)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    except Exception as e:
+        logger.error(f"Error opening history stream: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/history/export', methods=['GET'])
 def export_history():
     """Xuất lịch sử phân tích ra file JSON"""
@@ -237,6 +438,28 @@ def export_history():
         logger.error(f"Error exporting history: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/history/export/stream', methods=['GET'])
+def export_history_stream():
+    """Tải lịch sử phân tích dạng NDJSON/CSV (tùy chọn gzip), truyền theo từng chunk"""
+    try:
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+        compress = request.args.get('gzip', '0').lower() in ('1', 'true', 'yes')
+        year = request.args.get('year', type=int)
+        month = request.args.get('month', type=int)
+        day = request.args.get('day', type=int)
+        
+        records = time_extractor.iter_history(year, month, day)
+        return Response(
+            stream_with_context(iter_export(records, fmt, compress)),
+            mimetype=export_mimetype(fmt, compress),
+            headers={'Content-Disposition': f'attachment; filename={export_filename(fmt, compress)}'}
+        )
+    except Exception as e:
+        logger.error(f"Error streaming history export: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/history/cleanup', methods=['POST'])
 def cleanup_old_records():
     """Xóa các bản ghi cũ"""
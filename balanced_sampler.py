@@ -0,0 +1,113 @@
+import math
+
+import numpy as np
+
+# Cách chọn tỉ lệ lấy mẫu theo lớp
+SAMPLING_STRATEGIES = ('natural', 'sqrt', 'balanced')
+
+def class_sampling_rates(labels, strategy='balanced', class_names=None):
+    """
+    Xác suất chọn mỗi lớp khi lấy mẫu một ảnh
+
+    Args:
+        labels: Mảng nhãn int của các ảnh được lấy mẫu
+        strategy: 'natural' (theo số ảnh, như xáo trộn thông thường), 'sqrt' (theo căn bậc hai
+            số ảnh), 'balanced' (mọi lớp như nhau) hoặc dict lớp -> trọng số (khóa là tên lớp
+            trong class_names hoặc chỉ số lớp)
+        class_names: Tên lớp theo thứ tự nhãn (cần khi strategy là dict theo tên lớp)
+
+    Returns:
+        np.ndarray: Xác suất (tổng bằng 1) theo thứ tự nhãn
+    """
+    labels = np.asarray(labels)
+    num_classes = len(class_names) if class_names is not None else int(labels.max()) + 1
+    counts = np.bincount(labels, minlength=num_classes).astype(np.float64)
+
+    if isinstance(strategy, dict):
+        weights = np.zeros(num_classes)
+        for key, weight in strategy.items():
+            weights[class_names.index(key) if isinstance(key, str) else key] = weight
+    elif strategy == 'natural':
+        weights = counts
+    elif strategy == 'sqrt':
+        weights = np.sqrt(counts)
+    elif strategy == 'balanced':
+        weights = np.ones(num_classes)
+    else:
+        raise ValueError(f"Unknown sampling strategy: {strategy}")
+
+    # Lớp không có ảnh nào thì không thể lấy mẫu
+    weights = np.where(counts > 0, weights, 0.)
+    if weights.sum() <= 0:
+        raise ValueError("Sampling weights must be positive for at least one non-empty class")
+    return weights / weights.sum()
+
+def parse_sampling(value):
+    """
+    Đọc tham số dòng lệnh --sampling: tên cách lấy mẫu hoặc 'Mưa=1,Nắng=0.5,Tuyết=1'
+
+    Returns:
+        str hoặc dict: Giá trị strategy cho class_sampling_rates
+    """
+    if value in SAMPLING_STRATEGIES:
+        return value
+    try:
+        return {name.strip(): float(weight)
+                for name, weight in (item.split('=') for item in value.split(','))}
+    except ValueError:
+        raise ValueError(f"Invalid sampling: {value} (expected {', '.join(SAMPLING_STRATEGIES)} "
+                         f"or class=weight,...)")
+
+class BalancedSampler:
+    """
+    Sinh chuỗi chỉ số ảnh theo tỉ lệ lớp cho trước, không nhân bản dữ liệu: mỗi lớp duyệt
+    lần lượt các ảnh của mình theo một hoán vị ngẫu nhiên, hết lượt thì xáo lại
+    """
+
+    def __init__(self, labels, indices, rates, seed=None):
+        """
+        Khởi tạo BalancedSampler
+
+        Args:
+            labels: Mảng nhãn của toàn bộ ảnh
+            indices: Chỉ số ảnh được phép lấy (ví dụ tập training)
+            rates: Xác suất chọn mỗi lớp (xem class_sampling_rates)
+            seed: Seed của bộ sinh số ngẫu nhiên
+        """
+        labels = np.asarray(labels)
+        indices = np.asarray(indices)
+        self.rates = np.asarray(rates, dtype=np.float64)
+        self._rng = np.random.default_rng(seed)
+        self._members = [indices[labels[indices] == label] for label in range(len(self.rates))]
+        for label, members in enumerate(self._members):
+            if self.rates[label] > 0 and len(members) == 0:
+                raise ValueError(f"Class {label} has a sampling rate but no images")
+        self._orders = [self._rng.permutation(members) for members in self._members]
+        self._positions = [0] * len(self._members)
+
+    def sample(self, count):
+        """Lấy count chỉ số ảnh tiếp theo"""
+        classes = self._rng.choice(len(self.rates), size=count, p=self.rates)
+        result = np.empty(count, dtype=np.int64)
+        for label in np.unique(classes):
+            slots = np.flatnonzero(classes == label)
+            result[slots] = self._next(label, len(slots))
+        return result
+
+    def _next(self, label, count):
+        """count chỉ số tiếp theo trong lượt duyệt của một lớp"""
+        taken = []
+        while count > 0:
+            order, position = self._orders[label], self._positions[label]
+            chunk = order[position:position + count]
+            taken.append(chunk)
+            count -= len(chunk)
+            self._positions[label] = position + len(chunk)
+            if self._positions[label] >= len(order):
+                self._orders[label] = self._rng.permutation(self._members[label])
+                self._positions[label] = 0
+        return np.concatenate(taken)
+
+def default_steps_per_epoch(num_samples, batch_size):
+    """Số bước mỗi epoch khi không chỉ định: bằng một lượt duyệt tập training thông thường"""
+    return math.ceil(num_samples / batch_size)
@@ -0,0 +1,194 @@
+import math
+
+import tensorflow as tf
+
+# fill_mode của ImageDataGenerator -> fill_mode của ImageProjectiveTransformV3
+FILL_MODES = {'nearest': 'NEAREST', 'constant': 'CONSTANT', 'reflect': 'REFLECT', 'wrap': 'WRAP'}
+
+class BatchAugmentation:
+    """
+    Augmentation của ImageDataGenerator (xoay, dịch, shear, zoom, lật, độ sáng) áp dụng cho
+    cả batch trong graph TensorFlow: mỗi ảnh có ma trận biến đổi riêng nhưng toàn bộ batch
+    được nội suy bằng một phép ImageProjectiveTransformV3 (chạy song song theo intra-op threads)
+    """
+
+    def __init__(self, rotation_range=0, width_shift_range=0., height_shift_range=0.,
+                 shear_range=0., zoom_range=0., horizontal_flip=False, vertical_flip=False,
+                 brightness_range=None, fill_mode='nearest', cval=0., rescale=None):
+        """
+        Khởi tạo BatchAugmentation, tham số có cùng ý nghĩa với ImageDataGenerator
+
+        Args:
+            rotation_range: Góc xoay tối đa (độ)
+            width_shift_range, height_shift_range: Độ dịch tối đa (< 1: tỉ lệ kích thước ảnh,
+                >= 1: số pixel)
+            shear_range: Góc shear tối đa (độ)
+            zoom_range: float z ([1 - z, 1 + z]) hoặc [min, max], zoom hai chiều độc lập
+            horizontal_flip, vertical_flip: Lật ngẫu nhiên (xác suất 0.5)
+            brightness_range: [min, max] hệ số độ sáng, hoặc None
+            fill_mode: 'nearest', 'constant', 'reflect' hoặc 'wrap'
+            cval: Giá trị điền khi fill_mode='constant'
+            rescale: Hệ số nhân sau augmentation (ví dụ 1/255), hoặc None
+        """
+        if fill_mode not in FILL_MODES:
+            raise ValueError(f"Unknown fill_mode: {fill_mode}")
+        if isinstance(zoom_range, (int, float)):
+            zoom_range = [1 - zoom_range, 1 + zoom_range]
+        self.rotation_range = rotation_range
+        self.width_shift_range = width_shift_range
+        self.height_shift_range = height_shift_range
+        self.shear_range = shear_range
+        self.zoom_range = list(zoom_range)
+        self.horizontal_flip = horizontal_flip
+        self.vertical_flip = vertical_flip
+        self.brightness_range = brightness_range
+        self.fill_mode = fill_mode
+        self.cval = cval
+        self.rescale = rescale
+
+    @classmethod
+    def from_image_data_generator(cls, image_data_generator):
+        """Tạo BatchAugmentation với cùng cấu hình augmentation của một ImageDataGenerator"""
+        gen = image_data_generator
+        unsupported = [name for name in ('featurewise_center', 'samplewise_center',
+                                         'featurewise_std_normalization',
+                                         'samplewise_std_normalization', 'zca_whitening',
+                                         'channel_shift_range', 'preprocessing_function')
+                       if getattr(gen, name, None)]
+        if unsupported:
+            raise ValueError(f"Unsupported ImageDataGenerator options: {', '.join(unsupported)}")
+        return cls(
+            rotation_range=gen.rotation_range,
+            width_shift_range=gen.width_shift_range,
+            height_shift_range=gen.height_shift_range,
+            shear_range=gen.shear_range,
+            zoom_range=gen.zoom_range,
+            horizontal_flip=gen.horizontal_flip,
+            vertical_flip=gen.vertical_flip,
+            brightness_range=gen.brightness_range,
+            fill_mode=gen.fill_mode,
+            cval=gen.cval,
+            rescale=gen.rescale
+        )
+
+    def sample_parameters(self, batch_size, height, width, seed):
+        """
+        Sinh tham số ngẫu nhiên cho từng ảnh (giống get_random_transform)
+
+        Args:
+            batch_size: Số ảnh
+            height, width: Kích thước ảnh
+            seed: Tensor int (2,) cho các phép random stateless
+
+        Returns:
+            dict: theta, tx, ty, shear (độ), zx, zy, flip_horizontal, flip_vertical, brightness
+        """
+        seeds = tf.random.experimental.stateless_split(tf.cast(seed, tf.int64), num=9)
+
+        def uniform(index, low, high):
+            return tf.random.stateless_uniform([batch_size], seeds[index], low, high)
+
+        def symmetric(index, limit, size=None):
+            # ImageDataGenerator: độ dịch < 1 là tỉ lệ theo kích thước ảnh
+            if not limit:
+                return tf.zeros([batch_size])
+            values = uniform(index, -limit, limit)
+            return values * size if size is not None and limit < 1 else values
+
+        def flip(index, enabled):
+            return uniform(index, 0., 1.) < 0.5 if enabled else tf.zeros([batch_size], tf.bool)
+
+        # Giống ImageDataGenerator: tx theo height_shift_range và chiều cao, ty theo width
+        return {
+            'theta': symmetric(0, self.rotation_range),
+            'tx': symmetric(1, self.height_shift_range, tf.cast(height, tf.float32)),
+            'ty': symmetric(2, self.width_shift_range, tf.cast(width, tf.float32)),
+            'shear': symmetric(3, self.shear_range),
+            'zx': (uniform(4, *self.zoom_range) if self.zoom_range != [1, 1]
+                   else tf.ones([batch_size])),
+            'zy': (uniform(5, *self.zoom_range) if self.zoom_range != [1, 1]
+                   else tf.ones([batch_size])),
+            'flip_horizontal': flip(6, self.horizontal_flip),
+            'flip_vertical': flip(7, self.vertical_flip),
+            'brightness': (uniform(8, *self.brightness_range) if self.brightness_range is not None
+                           else tf.ones([batch_size])),
+        }
+
+    def transform_matrices(self, parameters, height, width):
+        """
+        Ma trận ánh xạ điểm ảnh output -> input (tọa độ x = cột, y = hàng) cho từng ảnh,
+        theo đúng thứ tự của apply_affine_transform (xoay, dịch, shear, zoom quanh tâm ảnh),
+        lật ngang/dọc được gộp vào cùng ma trận
+
+        Returns:
+            Tensor float32 (B, 8) theo định dạng của ImageProjectiveTransformV3
+        """
+        theta = parameters['theta'] * (math.pi / 180)
+        shear = parameters['shear'] * (math.pi / 180)
+        zeros = tf.zeros_like(theta)
+        ones = tf.ones_like(theta)
+
+        def matrix(rows):
+            return tf.stack([tf.stack(row, axis=-1) for row in rows], axis=-2)
+
+        rotation = matrix([[tf.cos(theta), -tf.sin(theta), zeros],
+                           [tf.sin(theta), tf.cos(theta), zeros],
+                           [zeros, zeros, ones]])
+        shift = matrix([[ones, zeros, parameters['tx']],
+                        [zeros, ones, parameters['ty']],
+                        [zeros, zeros, ones]])
+        shear_matrix = matrix([[ones, -tf.sin(shear), zeros],
+                               [zeros, tf.cos(shear), zeros],
+                               [zeros, zeros, ones]])
+        zoom = matrix([[parameters['zx'], zeros, zeros],
+                       [zeros, parameters['zy'], zeros],
+                       [zeros, zeros, ones]])
+        transform = rotation @ shift @ shear_matrix @ zoom
+
+        # Dời tâm như transform_matrix_offset_center(matrix, h, w)
+        o_x = tf.cast(height, tf.float32) / 2 - 0.5
+        o_y = tf.cast(width, tf.float32) / 2 - 0.5
+        offset = matrix([[ones, zeros, ones * o_x], [zeros, ones, ones * o_y], [zeros, zeros, ones]])
+        reset = matrix([[ones, zeros, -ones * o_x], [zeros, ones, -ones * o_y], [zeros, zeros, ones]])
+        transform = offset @ transform @ reset
+
+        # Lật sau biến đổi affine: output(x, y) = affine(W - 1 - x, y)
+        x_sign = tf.where(parameters['flip_horizontal'], -ones, ones)
+        x_offset = tf.where(parameters['flip_horizontal'], ones * tf.cast(width - 1, tf.float32), zeros)
+        y_sign = tf.where(parameters['flip_vertical'], -ones, ones)
+        y_offset = tf.where(parameters['flip_vertical'], ones * tf.cast(height - 1, tf.float32), zeros)
+        flip = matrix([[x_sign, zeros, x_offset], [zeros, y_sign, y_offset], [zeros, zeros, ones]])
+        transform = transform @ flip
+
+        transform = tf.reshape(transform, [-1, 9])
+        return transform[:, :8] / transform[:, 8:]
+
+    def __call__(self, images, seed):
+        """
+        Augmentation cho một batch ảnh
+
+        Args:
+            images: Tensor (B, H, W, C) giá trị 0-255 (uint8 hoặc float)
+            seed: Tensor int (2,); cùng seed cho cùng kết quả
+
+        Returns:
+            Tensor float32 (B, H, W, C), đã nhân rescale nếu có
+        """
+        images = tf.cast(images, tf.float32)
+        shape = tf.shape(images)
+        batch_size, height, width = shape[0], shape[1], shape[2]
+
+        parameters = self.sample_parameters(batch_size, height, width, seed)
+        images = tf.raw_ops.ImageProjectiveTransformV3(
+            images=images,
+            transforms=self.transform_matrices(parameters, height, width),
+            output_shape=shape[1:3],
+            fill_value=tf.cast(self.cval, tf.float32),
+            interpolation='BILINEAR',
+            fill_mode=FILL_MODES[self.fill_mode]
+        )
+        if self.brightness_range is not None:
+            images = tf.clip_by_value(images * parameters['brightness'][:, None, None, None], 0., 255.)
+        if self.rescale:
+            images = images * self.rescale
+        return images
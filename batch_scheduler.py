@@ -0,0 +1,162 @@
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class MicroBatchScheduler:
+    """Gom các request dự đoán đồng thời thành batch cho một lần forward pass"""
+
+    def __init__(self, infer_fn, max_batch_size=32, max_wait_ms=5, max_queue_size=1024):
+        """
+        Khởi tạo MicroBatchScheduler
+
+        Args:
+            infer_fn: Hàm nhận batch (N, H, W, 3) float32, trả về mảng (N, số lớp)
+            max_batch_size: Số ảnh tối đa trong một batch
+            max_wait_ms: Thời gian tối đa chờ gom thêm ảnh sau ảnh đầu tiên (ms)
+            max_queue_size: Số ảnh tối đa đang chờ trong hàng đợi
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.infer_fn = infer_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop_event = threading.Event()
+        self._thread = None
+        # Khóa start/stop/submit: không có ảnh nào được đưa vào hàng đợi sau khi stop() bắt đầu
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._max_queue_depth = 0
+        self._total_wait = 0.0
+        self._total_items = 0
+
+    def start(self):
+        """Khởi động worker chạy nền"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='micro-batch-worker', daemon=True)
+            self._thread.start()
+        logger.info(f"Micro-batching started (max_batch_size={self.max_batch_size}, "
+                    f"max_wait_ms={self.max_wait_ms})")
+
+    def stop(self, timeout=5):
+        """
+        Dừng worker sau khi xử lý hết các ảnh đang chờ; ảnh còn lại trong hàng đợi
+        (khi worker không kịp dừng trong timeout) nhận RuntimeError
+        """
+        with self._lock:
+            self._stop_event.set()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout)
+
+        # Ảnh lấy ra khỏi hàng đợi ở đây không còn được worker xử lý
+        while True:
+            try:
+                _, future, _ = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if not future.done():
+                future.set_exception(RuntimeError("MicroBatchScheduler stopped"))
+
+    def submit(self, image):
+        """
+        Đưa một ảnh đã tiền xử lý vào hàng đợi
+
+        Args:
+            image: Mảng float32 kích thước (H, W, 3)
+
+        Returns:
+            Future: Kết quả là mảng đầu ra của model cho ảnh này
+        """
+        future = Future()
+        with self._lock:
+            if self._thread is None or self._stop_event.is_set():
+                raise RuntimeError("MicroBatchScheduler is not running")
+            self._queue.put((image, future, time.monotonic()))
+            depth = self._queue.qsize()
+        with self._stats_lock:
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+        return future
+
+    def predict(self, image):
+        """Gửi ảnh và chờ kết quả (tiện dụng cho code đồng bộ)"""
+        return self.submit(image).result()
+
+    def stats(self):
+        """
+        Thống kê hoạt động của scheduler
+
+        Returns:
+            dict: Độ sâu hàng đợi, histogram kích thước batch, thời gian chờ trung bình
+        """
+        with self._stats_lock:
+            batches = sum(self._batch_sizes.values())
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_queue_depth,
+                'batches': batches,
+                'items': self._total_items,
+                'average_batch_size': round(self._total_items / batches, 2) if batches else 0,
+                'average_wait_ms': (round(self._total_wait * 1000 / self._total_items, 3)
+                                    if self._total_items else 0),
+                'batch_size_histogram': dict(sorted(self._batch_sizes.items()))
+            }
+
+    def _collect_batch(self):
+        """Lấy tối đa max_batch_size ảnh, chờ tối đa max_wait_ms sau ảnh đầu tiên"""
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Vòng lặp của worker: gom batch, suy luận, trả kết quả cho từng Future"""
+        while not (self._stop_event.is_set() and self._queue.empty()):
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            started = time.monotonic()
+            futures = [future for _, future, _ in batch]
+            try:
+                images = np.stack([image for image, _, _ in batch]).astype(np.float32, copy=False)
+                outputs = self.infer_fn(images)
+                for future, output in zip(futures, outputs):
+                    future.set_result(output)
+            except Exception as e:
+                logger.error(f"Micro-batch inference failed: {str(e)}")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+            with self._stats_lock:
+                self._batch_sizes[len(batch)] += 1
+                self._total_items += len(batch)
+                self._total_wait += sum(started - enqueued for _, _, enqueued in batch)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+BENCHMARK - Augmentation từng ảnh (ImageDataGenerator) so với theo batch trong graph (BatchAugmentation)
+Đo ảnh/giây với cấu hình augmentation của các script training, và ghi ảnh lưới để kiểm tra
+bằng mắt (cột 1: ảnh gốc, tiếp theo: ImageDataGenerator, rồi BatchAugmentation)
+Ví dụ:
+    python benchmark_augmentation.py --size 224 --augmentation improved --dump augmentation_grid.png
+    python benchmark_augmentation.py --intra-op-threads 4
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+from tensorflow.keras.preprocessing.image import ImageDataGenerator
+
+from batch_augmentation import BatchAugmentation
+from benchmark_input_pipeline import AUGMENTATIONS
+from dataset_utils import list_image_files, load_image
+
+def sample_images(data_dir, count, size, seed=0):
+    """Đọc count ảnh ngẫu nhiên (chia đều giữa các lớp) thành mảng uint8 (N, size, size, 3)"""
+    filenames, labels, class_names = list_image_files(data_dir)
+    rng = np.random.default_rng(seed)
+    per_class = [rng.permutation(np.flatnonzero(labels == label)) for label in range(len(class_names))]
+    chosen = []
+    for i in range(count):
+        indices = per_class[i % len(per_class)]
+        chosen.append(indices[(i // len(per_class)) % len(indices)])
+    return np.stack([load_image(os.path.join(data_dir, filenames[i]), size) for i in chosen])
+
+def per_image_rate(data_gen, images, batch_size, repeats):
+    """ImageDataGenerator.random_transform + standardize từng ảnh, trả về ảnh/giây"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for offset in range(0, len(images), batch_size):
+            batch = images[offset:offset + batch_size].astype(np.float32)
+            for i in range(len(batch)):
+                batch[i] = data_gen.standardize(data_gen.random_transform(batch[i]))
+    return repeats * len(images) / (time.perf_counter() - start)
+
+def batch_rate(augmentation, images, batch_size, repeats):
+    """BatchAugmentation trong tf.function theo từng batch, trả về ảnh/giây"""
+    augment = tf.function(augmentation)
+    batches = [tf.constant(images[offset:offset + batch_size])
+               for offset in range(0, len(images), batch_size)]
+    augment(batches[0], tf.constant([0, 0], tf.int64)).numpy()  # trace + warmup
+
+    start = time.perf_counter()
+    for step in range(repeats):
+        for i, batch in enumerate(batches):
+            augment(batch, tf.constant([step, i], tf.int64)).numpy()
+    return repeats * len(images) / (time.perf_counter() - start)
+
+def dump_grid(path, images, data_gen, augmentation, variants=3):
+    """Ghi ảnh lưới: mỗi hàng một ảnh, gồm ảnh gốc, variants ảnh của mỗi cách augmentation"""
+    rescale = data_gen.rescale or 1.
+    rows = []
+    for index, image in enumerate(images):
+        columns = [image.astype(np.float32)]
+        columns += [data_gen.standardize(data_gen.random_transform(image.astype(np.float32))) / rescale
+                    for _ in range(variants)]
+        repeated = tf.constant(np.repeat(image[None], variants, axis=0))
+        columns += list(augmentation(repeated, tf.constant([index, 0], tf.int64)).numpy() / rescale)
+        rows.append(np.concatenate(columns, axis=1))
+    grid = np.clip(np.concatenate(rows, axis=0), 0, 255).astype(np.uint8)
+    Image.fromarray(grid).save(path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark augmentation từng ảnh và theo batch')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--size', type=int, default=224)
+    parser.add_argument('--augmentation', choices=list(AUGMENTATIONS), default='improved')
+    parser.add_argument('--images', type=int, default=256, help='Số ảnh dùng để đo')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--intra-op-threads', type=int, default=0,
+                        help='Số thread intra-op của TensorFlow (0 = mặc định, theo số CPU)')
+    parser.add_argument('--dump', help='Ghi ảnh lưới kiểm tra vào file PNG này')
+    args = parser.parse_args()
+
+    if args.intra_op_threads:
+        tf.config.threading.set_intra_op_parallelism_threads(args.intra_op_threads)
+
+    data_gen = ImageDataGenerator(**AUGMENTATIONS[args.augmentation])
+    augmentation = BatchAugmentation.from_image_data_generator(data_gen)
+    images = sample_images(args.data_dir, args.images, args.size)
+
+    print("\n" + "="*70)
+    print(f"AUGMENTATION - {args.size}px, cấu hình '{args.augmentation}', batch {args.batch_size}, "
+          f"{os.cpu_count()} CPU, intra-op threads {args.intra_op_threads or 'mặc định'}")
+    print("="*70)
+    old = per_image_rate(data_gen, images, args.batch_size, args.repeats)
+    new = batch_rate(augmentation, images, args.batch_size, args.repeats)
+    print(f"{'cách':32} | {'ảnh/giây':>10} | {'so với cũ':>9}")
+    print(f"{'ImageDataGenerator (từng ảnh)':32} | {old:>10.1f} | {1:>8.2f}x")
+    print(f"{'BatchAugmentation (batch, graph)':32} | {new:>10.1f} | {new / old:>8.2f}x")
+
+    if args.dump:
+        dump_grid(args.dump, images[:6], data_gen, augmentation)
+        print(f"✅ Đã ghi ảnh kiểm tra vào {args.dump}")
+
+if __name__ == '__main__':
+    main()
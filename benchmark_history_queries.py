@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+BENCHMARK - Thời gian truy vấn lịch sử phân tích trước/sau khi có index và bảng tổng hợp
+Tạo cơ sở dữ liệu giả lập với 100k/1M/10M bản ghi, đo các truy vấn của TimeExtractor
+khi chưa có index (schema cũ) và sau khi migration nâng cấp tại chỗ.
+Trước migration, thống kê được tính trực tiếp trên analysis_history (chưa có bảng tổng hợp)
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from time_extractor import (TimeExtractor, _epoch_ms, _format_hourly_statistics, _format_statistics,
+                            _utc_timestamp)
+
+PREDICTIONS = ['Mưa', 'Nắng', 'Tuyết']
+# Index (migration v2, v4), bảng tổng hợp (v3) và trigger (v4), xóa đi để mô phỏng cơ sở dữ liệu cũ
+LEGACY_INDEXES = ['idx_history_date', 'idx_history_timestamp', 'idx_history_hour',
+                  'idx_history_epoch']
+LEGACY_TABLES = ['analysis_rollup_hourly']
+LEGACY_TRIGGERS = ['trg_history_epoch_ms']
+
+def generate_rows(count, days=730, seed=0):
+    """Sinh các bản ghi giả lập phân bố đều trong `days` ngày gần nhất"""
+    rng = random.Random(seed)
+    end = datetime.now()
+    span = days * 86400
+    for i in range(count):
+        dt = end - timedelta(seconds=rng.randrange(span))
+        yield (_utc_timestamp(dt), _epoch_ms(dt), dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second,
+               f'image_{i}.jpg', rng.choice(PREDICTIONS), rng.random(), rng.random())
+
+def populate(db_path, count):
+    """Ghi `count` bản ghi giả lập bằng một transaction lớn"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executemany('''
+        INSERT INTO analysis_history
+        (timestamp, epoch_ms, year, month, day, hour, minute, second, image_name, prediction, confidence, duration)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', generate_rows(count))
+    conn.commit()
+    conn.close()
+
+def make_legacy(db_path):
+    """Xóa index, bảng tổng hợp, trigger và hạ user_version về 1 để mô phỏng cơ sở dữ liệu trước migration v2"""
+    conn = sqlite3.connect(db_path)
+    for index in LEGACY_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {index}")
+    for table in LEGACY_TABLES:
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+    for trigger in LEGACY_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+def raw_statistics(db_path, year, month):
+    """Thống kê một tháng gộp trực tiếp trên analysis_history (trước bảng tổng hợp)"""
+    conn = sqlite3.connect(db_path)
+    groups = conn.execute('''
+        SELECT prediction, COUNT(*), SUM(confidence),
+               MAX(CASE WHEN confidence != 0 THEN confidence END),
+               MIN(CASE WHEN confidence != 0 THEN confidence END),
+               SUM(duration)
+        FROM analysis_history WHERE year = ? AND month = ?
+        GROUP BY prediction
+    ''', [year, month]).fetchall()
+    conn.close()
+    return _format_statistics(groups)
+
+def raw_hourly_statistics(db_path, year, month, day):
+    """Thống kê theo giờ gộp trực tiếp trên analysis_history (trước bảng tổng hợp)"""
+    conn = sqlite3.connect(db_path)
+    groups = conn.execute('''
+        SELECT hour, prediction, COUNT(*), SUM(confidence), SUM(duration)
+        FROM analysis_history WHERE year = ? AND month = ? AND day = ?
+        GROUP BY hour, prediction
+    ''', [year, month, day]).fetchall()
+    conn.close()
+    return _format_hourly_statistics(groups)
+
+def time_queries(extractor, repeat, legacy=False):
+    """Đo thời gian tốt nhất (ms) của các truy vấn thường dùng"""
+    today = datetime.now() - timedelta(days=1)
+    if legacy:
+        statistics = lambda: raw_statistics(extractor.db_path, today.year, today.month)
+        hourly = lambda: raw_hourly_statistics(extractor.db_path, today.year, today.month, today.day)
+    else:
+        statistics = lambda: extractor.get_statistics_by_date(today.year, today.month)
+        hourly = lambda: extractor.get_hourly_statistics(today.year, today.month, today.day)
+    queries = {
+        'get_analysis_by_date (1 ngày)':
+            lambda: extractor.get_analysis_by_date(today.year, today.month, today.day),
+        'get_analysis_by_time_range (2 giờ, 1 ngày)':
+            lambda: extractor.get_analysis_by_time_range(10, 11, today.year, today.month, today.day),
+        'get_statistics_by_date (1 tháng)': statistics,
+        'get_hourly_statistics (1 ngày)': hourly,
+        'get_analysis_between (22h - 2h, qua nửa đêm)':
+            lambda: extractor.get_analysis_between(today.replace(hour=22, minute=0),
+                                                   today.replace(hour=2, minute=0) + timedelta(days=1)),
+        'get_all_history (100 mới nhất)':
+            lambda: extractor.get_all_history(100),
+    }
+    results = {}
+    for name, query in queries.items():
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            query()
+            best = min(best, time.perf_counter() - start)
+        results[name] = best * 1000
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark truy vấn lịch sử')
+    parser.add_argument('--sizes', default='100000,1000000,10000000',
+                        help='Số bản ghi, phân tách bởi dấu phẩy')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for size in [int(value) for value in args.sizes.split(',')]:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, 'history.db')
+            extractor = TimeExtractor(db_path)
+
+            start = time.perf_counter()
+            populate(db_path, size)
+            make_legacy(db_path)
+            print(f"\n{'='*72}\n{size:,} bản ghi (tạo dữ liệu: {time.perf_counter() - start:.1f}s)"
+                  f"\n{'='*72}")
+
+            before = time_queries(extractor, args.repeat, legacy=True)
+
+            start = time.perf_counter()
+            extractor.init_database()
+            migration_time = time.perf_counter() - start
+
+            after = time_queries(extractor, args.repeat)
+
+            print(f"Migration lên phiên bản {extractor.get_schema_version()}: {migration_time:.2f}s")
+            print(f"{'truy vấn':44} | {'trước (ms)':>10} | {'sau (ms)':>10}")
+            for name in before:
+                print(f"{name:44} | {before[name]:>10.1f} | {after[name]:>10.1f}")
+
+if __name__ == '__main__':
+    main()
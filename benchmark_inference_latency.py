@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+BENCHMARK - Độ trễ suy luận một ảnh
+So sánh p50/p99 giữa model.predict (cách cũ) và hàm tf.function đã warm up
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from predict_simple import WeatherPredictor
+
+def percentiles(samples):
+    """Trả về (p50, p99) tính bằng mili giây"""
+    samples_ms = np.asarray(samples) * 1000
+    return np.percentile(samples_ms, 50), np.percentile(samples_ms, 99)
+
+def measure(fn, batch, runs):
+    """Đo thời gian từng lần gọi fn(batch)"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(batch)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark inference latency')
+    parser.add_argument('--model', default='checkpoints/model.h5')
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+
+    # Đo thời gian khởi tạo (bao gồm warm up) riêng
+    start = time.perf_counter()
+    predictor = WeatherPredictor(args.model)
+    init_time = time.perf_counter() - start
+
+    batch = np.random.rand(1, predictor.img_size, predictor.img_size, 3).astype(np.float32)
+
+    # Lần gọi đầu tiên của model.predict (chưa warm up)
+    start = time.perf_counter()
+    predictor.model.predict(batch, verbose=0)
+    first_predict = time.perf_counter() - start
+
+    before = measure(lambda x: predictor.model.predict(x, verbose=0), batch, args.runs)
+    after = measure(predictor.infer, batch, args.runs)
+
+    print("\n" + "="*60)
+    print(f"ĐỘ TRỄ SUY LUẬN 1 ẢNH - {args.runs} lần chạy")
+    print("="*60)
+    print(f"Khởi tạo WeatherPredictor (có warm up): {init_time * 1000:.1f} ms")
+    print(f"Lần gọi model.predict đầu tiên: {first_predict * 1000:.1f} ms")
+    print(f"{'':24} | {'p50 (ms)':>9} | {'p99 (ms)':>9}")
+    for name, samples in (('model.predict (trước)', before),
+                          ('tf.function (sau)', after)):
+        p50, p99 = percentiles(samples)
+        print(f"{name:24} | {p50:>9.2f} | {p99:>9.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+BENCHMARK - Tốc độ nạp dữ liệu training (ảnh/giây)
+So sánh ImageDataGenerator.flow_from_directory (cách cũ), cache memmap của prepare_dataset.py
+và pipeline tf.data (tf_data_pipeline.py, augmentation từng ảnh hoặc BatchAugmentation trong graph)
+với cùng cấu hình augmentation của các script training
+"""
+
+import argparse
+import os
+import time
+
+from tensorflow.keras.preprocessing.image import ImageDataGenerator
+
+from tf_data_pipeline import make_dataset
+
+# Cấu hình ImageDataGenerator của các script training
+AUGMENTATIONS = {
+    'none': dict(rescale=1./255, validation_split=0.2),
+    'simple': dict(  # train_simple.py, train_quick.py
+        rescale=1./255,
+        validation_split=0.2,
+        rotation_range=20,
+        horizontal_flip=True,
+        brightness_range=[0.8, 1.2]
+    ),
+    'improved': dict(  # train_improved.py
+        rescale=1./255,
+        validation_split=0.2,
+        rotation_range=30,
+        horizontal_flip=True,
+        vertical_flip=True,
+        brightness_range=[0.7, 1.3],
+        width_shift_range=0.2,
+        height_shift_range=0.2,
+        shear_range=0.2,
+        zoom_range=0.2,
+        fill_mode='nearest'
+    ),
+}
+
+def images_per_second(batches, num_batches):
+    """Lấy num_batches batch đầu tiên, trả về số ảnh/giây"""
+    start = time.perf_counter()
+    images = 0
+    for i, (batch_x, _) in enumerate(batches):
+        if i >= num_batches:
+            break
+        images += len(batch_x)
+    return images / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark tốc độ nạp dữ liệu training')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--size', type=int, default=128, help='Kích thước ảnh (128: train_simple, 224: train_improved)')
+    parser.add_argument('--augmentation', choices=list(AUGMENTATIONS), default='simple')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--batches', type=int, default=50, help='Số batch đo cho mỗi loader')
+    parser.add_argument('--cache-dir', default='dataset_cache',
+                        help='Cache của prepare_dataset.py (bỏ qua memmap nếu chưa có)')
+    args = parser.parse_args()
+
+    image_size = (args.size, args.size)
+    data_gen = ImageDataGenerator(**AUGMENTATIONS[args.augmentation])
+
+    print("\n" + "="*70)
+    print(f"NẠP DỮ LIỆU TRAINING - {args.size}px, augmentation '{args.augmentation}', "
+          f"batch {args.batch_size}, {os.cpu_count()} CPU")
+    print("="*70)
+
+    results = {}
+    directory = data_gen.flow_from_directory(args.data_dir, target_size=image_size,
+                                             batch_size=args.batch_size, subset='training',
+                                             shuffle=True)
+    results['flow_from_directory'] = images_per_second(
+        (directory[i] for i in range(len(directory))), args.batches)
+
+    if os.path.exists(os.path.join(args.cache_dir, 'index.json')):
+        from memmap_dataset import memmap_generators
+        memmap, _ = memmap_generators(args.cache_dir, image_size, args.batch_size, data_gen,
+                                      data_dir=args.data_dir)
+        results['memmap'] = images_per_second(
+            (memmap[i] for i in range(len(memmap))), args.batches)
+
+    # Epoch đầu giải mã song song và điền cache; các epoch sau đọc ảnh đã giải mã từ bộ nhớ
+    dataset = make_dataset(args.data_dir, image_size, args.batch_size, 'training',
+                           image_data_generator=data_gen, seed=0)
+    results['tf.data (epoch đầu)'] = images_per_second(dataset, len(dataset))
+    results['tf.data (đã cache)'] = images_per_second(dataset, args.batches)
+
+    if args.augmentation != 'none':
+        dataset = make_dataset(args.data_dir, image_size, args.batch_size, 'training',
+                               image_data_generator=data_gen, seed=0, in_graph_augmentation=True)
+        images_per_second(dataset, len(dataset))
+        results['tf.data + graph aug.'] = images_per_second(dataset, args.batches)
+
+    baseline = results['flow_from_directory']
+    print(f"{'loader':22} | {'ảnh/giây':>10} | {'so với cũ':>9}")
+    for name, rate in results.items():
+        print(f"{name:22} | {rate:>10.1f} | {rate / baseline:>8.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+BENCHMARK - Micro-batching với nhiều client đồng thời
+So sánh thông lượng và độ trễ khi mỗi request tự chạy forward pass
+và khi các request được gom batch bởi MicroBatchScheduler
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from predict_simple import WeatherPredictor
+
+def run_clients(predict_one, num_clients, requests_per_client, image):
+    """Chạy nhiều thread client, trả về (ảnh/giây, danh sách độ trễ)"""
+    latencies = []
+    lock = threading.Lock()
+
+    def client():
+        local = []
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            predict_one(image)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(num_clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, np.asarray(latencies) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark micro-batching')
+    parser.add_argument('--model', default='checkpoints/model.h5')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=20, help='Số request mỗi client')
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    args = parser.parse_args()
+
+    predictor = WeatherPredictor(args.model)
+    image = np.random.rand(1, predictor.img_size, predictor.img_size, 3).astype(np.float32)
+
+    print("\n" + "="*64)
+    print(f"MICRO-BATCHING - {args.clients} client x {args.requests} request")
+    print("="*64)
+    print(f"{'chế độ':22} | {'ảnh/giây':>9} | {'p50 (ms)':>9} | {'p99 (ms)':>9}")
+
+    throughput, latencies = run_clients(predictor._infer_single, args.clients,
+                                        args.requests, image)
+    print(f"{'trực tiếp':22} | {throughput:>9.1f} | {np.percentile(latencies, 50):>9.2f} | "
+          f"{np.percentile(latencies, 99):>9.2f}")
+
+    scheduler = predictor.start_micro_batching(args.max_batch_size, args.max_wait_ms)
+    throughput, latencies = run_clients(predictor._infer_single, args.clients,
+                                        args.requests, image)
+    label = f"micro-batch ({args.max_batch_size}, {args.max_wait_ms:g}ms)"
+    print(f"{label:22} | {throughput:>9.1f} | {np.percentile(latencies, 50):>9.2f} | "
+          f"{np.percentile(latencies, 99):>9.2f}")
+
+    stats = scheduler.stats()
+    predictor.stop_micro_batching()
+    print(f"\nKích thước batch trung bình: {stats['average_batch_size']}")
+    print(f"Histogram kích thước batch: {stats['batch_size_histogram']}")
+    print(f"Độ sâu hàng đợi lớn nhất: {stats['max_queue_depth']}")
+
+if __name__ == '__main__':
+    main()
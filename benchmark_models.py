@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+BENCHMARK - Các kiến trúc của simple_model.create_model
+Với mỗi kiến trúc và width multiplier: số tham số, FLOPs, dung lượng checkpoint .h5 và độ trễ
+suy luận 1 ảnh trên CPU; --budget-ms lọc các model đáp ứng ngân sách độ trễ (theo p99)
+Ví dụ:
+    python benchmark_models.py --size 224 --width-multipliers 0.5 1.0 --budget-ms 20
+"""
+
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import tensorflow as tf
+
+from benchmark_inference_latency import measure, percentiles
+from simple_model import ARCHITECTURES, create_model
+
+def model_flops(model):
+    """
+    Số phép tính dấu phẩy động (1 phép nhân-cộng = 2 FLOPs) cho một ảnh, tính theo kích thước
+    output của các lớp Conv2D, DepthwiseConv2D và Dense (bỏ qua BatchNormalization, activation,
+    pooling vì không đáng kể)
+    """
+    flops = 0
+    for layer in model.layers:
+        if isinstance(layer, tf.keras.layers.DepthwiseConv2D):
+            _, height, width, channels = layer.output.shape
+            kernel_h, kernel_w = layer.kernel_size
+            flops += 2 * height * width * channels * kernel_h * kernel_w
+        elif isinstance(layer, tf.keras.layers.Conv2D):
+            _, height, width, filters = layer.output.shape
+            kernel_h, kernel_w = layer.kernel_size
+            in_channels = layer.input.shape[-1] // layer.groups
+            flops += 2 * height * width * filters * kernel_h * kernel_w * in_channels
+        elif isinstance(layer, tf.keras.layers.Dense):
+            flops += 2 * layer.input.shape[-1] * layer.units
+    return flops
+
+def checkpoint_size(model):
+    """Dung lượng (byte) của model khi lưu thành file .h5 như các script training"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.h5')
+        model.save(path)
+        return os.path.getsize(path)
+
+def latency_samples(model, size, runs):
+    """Thời gian suy luận từng lần cho 1 ảnh bằng tf.function đã warm up (như WeatherPredictor.infer)"""
+    infer = tf.function(
+        lambda x: model(x, training=False),
+        input_signature=[tf.TensorSpec(shape=(None, size, size, 3), dtype=tf.float32)]
+    )
+    batch = np.random.rand(1, size, size, 3).astype(np.float32)
+    for _ in range(5):
+        infer(batch).numpy()
+    return measure(lambda x: infer(x).numpy(), batch, runs)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark các kiến trúc model')
+    parser.add_argument('--size', type=int, default=224)
+    parser.add_argument('--architectures', nargs='+', choices=ARCHITECTURES, default=list(ARCHITECTURES))
+    parser.add_argument('--width-multipliers', nargs='+', type=float, default=[0.5, 1.0])
+    parser.add_argument('--runs', type=int, default=100)
+    parser.add_argument('--budget-ms', type=float, help='Ngân sách độ trễ mỗi ảnh (p99, ms)')
+    parser.add_argument('--intra-op-threads', type=int, default=0,
+                        help='Số thread intra-op của TensorFlow (0 = mặc định, theo số CPU)')
+    args = parser.parse_args()
+
+    if args.intra_op_threads:
+        tf.config.threading.set_intra_op_parallelism_threads(args.intra_op_threads)
+
+    print("\n" + "="*70)
+    print(f"KIẾN TRÚC MODEL - {args.size}px, 1 ảnh, {args.runs} lần chạy, {os.cpu_count()} CPU")
+    print("="*70)
+    print(f"{'kiến trúc':16} | {'tham số':>10} | {'MFLOPs':>8} | {'.h5 (MB)':>8} | "
+          f"{'p50 (ms)':>8} | {'p99 (ms)':>8}")
+
+    results = []
+    for architecture in args.architectures:
+        for width_multiplier in args.width_multipliers:
+            model = create_model((args.size, args.size, 3), architecture=architecture,
+                                 width_multiplier=width_multiplier)
+            name = f"{architecture} x{width_multiplier:g}"
+            params = model.count_params()
+            flops = model_flops(model)
+            size_mb = checkpoint_size(model) / 2**20
+            p50, p99 = percentiles(latency_samples(model, args.size, args.runs))
+            results.append((name, flops, p99))
+            print(f"{name:16} | {params:>10,} | {flops / 1e6:>8.1f} | {size_mb:>8.2f} | "
+                  f"{p50:>8.2f} | {p99:>8.2f}")
+            tf.keras.backend.clear_session()
+
+    if args.budget_ms is not None:
+        within = sorted((r for r in results if r[2] <= args.budget_ms), key=lambda r: -r[1])
+        print(f"\nNgân sách {args.budget_ms:g} ms/ảnh (p99):")
+        if not within:
+            print("   ❌ Không có model nào đáp ứng")
+        for name, flops, p99 in within:
+            print(f"   ✅ {name:16} {p99:>8.2f} ms, {flops / 1e6:.1f} MFLOPs")
+        if within:
+            print(f"   → Model lớn nhất (nhiều FLOPs nhất) trong ngân sách: {within[0][0]}")
+
+if __name__ == '__main__':
+    main()
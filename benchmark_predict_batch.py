@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+BENCHMARK - So sánh tốc độ dự đoán theo batch
+Đo số ảnh/giây của WeatherPredictor.predict_batch với batch size 1/8/32/128
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from predict_simple import WeatherPredictor
+
+BATCH_SIZES = [1, 8, 32, 128]
+
+def collect_images(image_dir, limit):
+    """Lấy danh sách ảnh dùng để benchmark"""
+    images = sorted(str(p) for p in Path(image_dir).rglob('*')
+                    if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    return images[:limit]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark predict_batch')
+    parser.add_argument('--model', default='checkpoints/model.h5')
+    parser.add_argument('--images', default='test')
+    parser.add_argument('--limit', type=int, default=256)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    images = collect_images(args.images, args.limit)
+    if not images:
+        print(f"❌ Không tìm thấy ảnh trong {args.images}")
+        return
+
+    predictor = WeatherPredictor(args.model)
+
+    # Tiền xử lý trước để chỉ đo phần forward pass + tạo kết quả
+    batch = predictor.preprocess_batch(images)
+    predictor.predict_batch(batch[:max(BATCH_SIZES)], batch_size=max(BATCH_SIZES),
+                            record_history=False)
+
+    print("\n" + "="*60)
+    print(f"BENCHMARK predict_batch - {len(images)} ảnh, {args.repeat} lần lặp")
+    print("="*60)
+    print(f"{'batch_size':>10} | {'ảnh/giây':>10} | {'ms/ảnh':>8}")
+
+    for batch_size in BATCH_SIZES:
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            predictor.predict_batch(batch, batch_size=batch_size, record_history=False)
+            best = min(best, time.perf_counter() - start)
+        print(f"{batch_size:>10} | {len(images) / best:>10.1f} | "
+              f"{best * 1000 / len(images):>8.2f}")
+
+    # Bao gồm cả đọc và giải mã ảnh từ đĩa
+    start = time.perf_counter()
+    predictor.predict_batch(images, batch_size=32, record_history=False)
+    elapsed = time.perf_counter() - start
+    print(f"\nĐầu vào là đường dẫn (có giải mã ảnh), batch_size=32: "
+          f"{len(images) / elapsed:.1f} ảnh/giây")
+
+if __name__ == '__main__':
+    main()
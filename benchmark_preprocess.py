@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+BENCHMARK - So sánh các chế độ tiền xử lý ảnh
+Đo độ trễ tiền xử lý và khác biệt dự đoán giữa chế độ 'quality' (LANCZOS)
+và chế độ 'fast' (giải mã JPEG thu nhỏ + bộ lọc rẻ hơn) trên tập test/
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from predict_simple import WeatherPredictor
+
+# Nhãn thư mục test/ tương ứng với tên lớp của model (thư mục data/ dùng trực tiếp tên lớp)
+LABEL_MAP = {'sunny': 'Nắng', 'rain': 'Mưa', 'rainy': 'Mưa', 'snow': 'Tuyết', 'snowy': 'Tuyết'}
+
+def collect_images(image_dir):
+    """Lấy danh sách (đường dẫn, nhãn thư mục) của các ảnh"""
+    images = []
+    for path in sorted(Path(image_dir).rglob('*')):
+        if path.suffix.lower() in ('.jpg', '.jpeg', '.png'):
+            images.append((str(path), path.parent.name))
+    return images
+
+def run_mode(predictor, images):
+    """Tiền xử lý + dự đoán toàn bộ ảnh, trả về (độ trễ từng ảnh, xác suất)"""
+    latencies = []
+    batch = np.empty((len(images), predictor.img_size, predictor.img_size, 3), dtype=np.float32)
+    for i, (path, _) in enumerate(images):
+        start = time.perf_counter()
+        batch[i] = predictor.preprocess_image(path)[0]
+        latencies.append(time.perf_counter() - start)
+
+    scores = np.concatenate([predictor.infer(batch[i:i + 64])
+                             for i in range(0, len(batch), 64)])
+    return np.asarray(latencies), scores
+
+def main():
+    parser = argparse.ArgumentParser(description='So sánh chế độ tiền xử lý')
+    parser.add_argument('--model', default='checkpoints/model.h5')
+    parser.add_argument('--images', default='test')
+    parser.add_argument('--filters', default='bilinear,bicubic,nearest',
+                        help='Các bộ lọc dùng cho chế độ fast')
+    args = parser.parse_args()
+
+    images = collect_images(args.images)
+    if not images:
+        print(f"❌ Không tìm thấy ảnh trong {args.images}")
+        return
+
+    configs = [('quality', 'lanczos')] + [('fast', name) for name in args.filters.split(',')]
+    predictor = WeatherPredictor(args.model)
+
+    results = {}
+    for mode, resample in configs:
+        predictor.set_preprocessing(mode, resample)
+        results[(mode, resample)] = run_mode(predictor, images)
+
+    class_names = predictor.class_names
+    labels = [LABEL_MAP.get(label, label) for _, label in images]
+    labeled = [i for i, label in enumerate(labels) if label in class_names]
+    _, reference_scores = results[('quality', 'lanczos')]
+    reference_pred = reference_scores.argmax(axis=1)
+
+    print("\n" + "="*78)
+    print(f"SO SÁNH TIỀN XỬ LÝ - {len(images)} ảnh từ {args.images}/ "
+          f"({len(labeled)} ảnh có nhãn khớp với các lớp của model)")
+    print("="*78)
+    print(f"{'chế độ':18} | {'p50 (ms)':>8} | {'p99 (ms)':>8} | {'khớp LANCZOS':>12} | "
+          f"{'Δ xác suất':>10} | {'accuracy':>8}")
+    for (mode, resample), (latencies, scores) in results.items():
+        pred = scores.argmax(axis=1)
+        agreement = float(np.mean(pred == reference_pred))
+        prob_diff = float(np.mean(np.abs(scores - reference_scores)))
+        if labeled:
+            correct = [class_names[pred[i]] == labels[i] for i in labeled]
+            accuracy = f"{np.mean(correct):.2%}"
+        else:
+            accuracy = 'n/a'
+        print(f"{mode + '/' + resample:18} | {np.percentile(latencies, 50) * 1000:>8.2f} | "
+              f"{np.percentile(latencies, 99) * 1000:>8.2f} | {agreement:>12.2%} | "
+              f"{prob_diff:>10.4f} | {accuracy:>8}")
+
+if __name__ == '__main__':
+    main()
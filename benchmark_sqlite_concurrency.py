@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+BENCHMARK - Ghi và đọc lịch sử đồng thời trên SQLite
+So sánh cấu hình cũ (mở kết nối mới cho mỗi lần gọi, rollback journal, synchronous=FULL)
+với pool kết nối + WAL + synchronous=NORMAL của TimeExtractor
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from time_extractor import TimeExtractor
+
+PREDICTIONS = ['Mưa', 'Nắng', 'Tuyết']
+
+# Cấu hình tương đương TimeExtractor trước khi có pool kết nối
+CONFIGS = {
+    'kết nối mỗi lần gọi': dict(journal_mode='DELETE', synchronous='FULL', max_idle_connections=0),
+    'pool + WAL': dict(journal_mode='WAL', synchronous='NORMAL', max_idle_connections=8),
+}
+
+def run_workers(extractor, writers, readers, seconds):
+    """Chạy các thread ghi/đọc trong `seconds` giây, trả về độ trễ (ms) và số lỗi theo loại"""
+    now = datetime.now()
+    latencies = {'ghi': [], 'đọc': []}
+    errors = {'ghi': 0, 'đọc': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(kind, seed):
+        rng = random.Random(seed)
+        local = []
+        failed = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                if kind == 'ghi':
+                    extractor.record_analysis(f'image_{seed}.jpg', rng.choice(PREDICTIONS),
+                                              rng.random(), rng.random())
+                elif rng.random() < 0.5:
+                    extractor.get_all_history(100)
+                else:
+                    extractor.get_hourly_statistics(now.year, now.month, now.day)
+            except Exception:
+                failed += 1
+                continue
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies[kind].extend(local)
+            errors[kind] += failed
+
+    threads = [threading.Thread(target=worker, args=('ghi', i)) for i in range(writers)]
+    threads += [threading.Thread(target=worker, args=('đọc', writers + i)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SQLite ghi/đọc đồng thời')
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    print("\n" + "="*78)
+    print(f"SQLITE ĐỒNG THỜI - {args.writers} thread ghi, {args.readers} thread đọc, {args.seconds:g}s")
+    print("="*78)
+    print(f"{'cấu hình':20} | {'loại':5} | {'thao tác/giây':>13} | {'p50 (ms)':>9} | "
+          f"{'p99 (ms)':>9} | {'lỗi':>5}")
+
+    for name, config in CONFIGS.items():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            extractor = TimeExtractor(os.path.join(tmp_dir, 'history.db'), **config)
+            latencies, errors = run_workers(extractor, args.writers, args.readers, args.seconds)
+            extractor.close()
+
+        for kind, values in latencies.items():
+            values = np.asarray(values) if values else np.zeros(1)
+            print(f"{name:20} | {kind:5} | {len(latencies[kind]) / args.seconds:>13.1f} | "
+                  f"{np.percentile(values, 50):>9.2f} | {np.percentile(values, 99):>9.2f} | "
+                  f"{errors[kind]:>5}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+BENCHMARK - Thời gian khởi động ứng dụng
+Đo thời gian import app_simple, phản hồi đầu tiên của trang chủ và /api/history/all,
+và thời gian tới khi model sẵn sàng, với LAZY_MODEL_LOAD bật và tắt
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+# Chạy trong process mới để đo đúng chi phí import (kể cả TensorFlow)
+PROBE = r'''
+import json, time
+start = time.perf_counter()
+import app_simple
+imported = time.perf_counter() - start
+client = app_simple.app.test_client()
+client.get('/')
+index = time.perf_counter() - start
+client.get('/api/history/all?limit=10')
+history = time.perf_counter() - start
+app_simple.predictor.wait_until_ready()
+ready = time.perf_counter() - start
+print(json.dumps({
+    'import': imported,
+    'index': index,
+    'history': history,
+    'ready': ready
+}))
+'''
+
+def run_probe(lazy):
+    """Chạy probe trong process con, trả về dict thời gian (giây)"""
+    env = dict(os.environ, LAZY_MODEL_LOAD='1' if lazy else '0', TF_CPP_MIN_LOG_LEVEL='3')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    print("\n" + "="*64)
+    print("THỜI GIAN KHỞI ĐỘNG APP (tính từ lúc bắt đầu import)")
+    print("="*64)
+    print(f"{'chế độ':16} | {'import':>9} | {'trang chủ':>9} | {'lịch sử':>9} | {'model sẵn sàng':>14}")
+    for lazy in (False, True):
+        timings = run_probe(lazy)
+        name = 'tải nền (lazy)' if lazy else 'tải đồng bộ'
+        print(f"{name:16} | {timings['import'] * 1000:>7.0f}ms | {timings['index'] * 1000:>7.0f}ms | "
+              f"{timings['history'] * 1000:>7.0f}ms | {timings['ready'] * 1000:>12.0f}ms")
+
+if __name__ == '__main__':
+    main()
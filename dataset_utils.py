@@ -0,0 +1,188 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from PIL import Image
+
+# Phần mở rộng ảnh được flow_from_directory chấp nhận
+IMAGE_EXTENSIONS = ('png', 'jpg', 'jpeg', 'bmp', 'ppm', 'tif', 'tiff')
+
+# Phiên bản định dạng thư mục cache
+DATASET_CACHE_VERSION = 1
+
+INDEX_FILE = 'index.json'
+
+# Kích thước ảnh của các script training (train_simple/train_quick: 128, train_improved: 224)
+DEFAULT_IMAGE_SIZES = (128, 224)
+
+def list_image_files(data_dir='data'):
+    """
+    Liệt kê ảnh theo đúng thứ tự của ImageDataGenerator.flow_from_directory
+    (lớp theo thứ tự tên thư mục, file trong mỗi lớp theo thứ tự tên)
+
+    Args:
+        data_dir: Thư mục dữ liệu, mỗi thư mục con là một lớp
+
+    Returns:
+        tuple: (list đường dẫn tương đối từ data_dir, mảng nhãn int, list tên lớp)
+    """
+    class_names = sorted(name for name in os.listdir(data_dir)
+                         if os.path.isdir(os.path.join(data_dir, name)))
+    filenames = []
+    labels = []
+    for label, class_name in enumerate(class_names):
+        class_dir = os.path.join(data_dir, class_name)
+        for root, _, files in sorted(os.walk(class_dir), key=lambda entry: entry[0]):
+            for fname in sorted(files):
+                if fname.lower().endswith(IMAGE_EXTENSIONS):
+                    filenames.append(os.path.relpath(os.path.join(root, fname), data_dir))
+                    labels.append(label)
+    return filenames, np.asarray(labels, dtype=np.int64), class_names
+
+def subset_indices(labels, validation_split=0.2, subset='training'):
+    """
+    Chỉ số ảnh của tập training/validation, chia giống flow_from_directory:
+    int(validation_split * n) ảnh đầu tiên của mỗi lớp là validation, phần còn lại là training
+
+    Args:
+        labels: Mảng nhãn theo thứ tự của list_image_files
+        validation_split: Tỉ lệ validation của mỗi lớp
+        subset: 'training' hoặc 'validation'
+
+    Returns:
+        np.ndarray: Chỉ số (int64) tăng dần
+    """
+    if subset not in ('training', 'validation'):
+        raise ValueError(f"Unknown subset: {subset}")
+    labels = np.asarray(labels)
+    indices = []
+    for label in np.unique(labels):
+        class_indices = np.flatnonzero(labels == label)
+        split_at = int(validation_split * len(class_indices))
+        indices.append(class_indices[:split_at] if subset == 'validation'
+                       else class_indices[split_at:])
+    return np.sort(np.concatenate(indices)) if indices else np.empty(0, dtype=np.int64)
+
+def load_image(path, image_size):
+    """
+    Đọc ảnh thành mảng uint8 (H, W, 3), giống load_img của Keras
+    (chuyển sang RGB, resize 'nearest')
+
+    Args:
+        path: Đường dẫn ảnh
+        image_size: int hoặc (chiều cao, chiều rộng)
+    """
+    return load_image_sizes(path, [image_size])[0]
+
+def load_image_sizes(path, image_sizes):
+    """Giải mã ảnh một lần và resize ra nhiều kích thước, trả về list mảng uint8"""
+    with Image.open(path) as img:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        arrays = []
+        for image_size in image_sizes:
+            height, width = _size_tuple(image_size)
+            resized = img if img.size == (width, height) else img.resize((width, height), Image.NEAREST)
+            arrays.append(np.asarray(resized, dtype=np.uint8))
+        return arrays
+
+def build_dataset_cache(data_dir='data', cache_dir='dataset_cache',
+                        image_sizes=DEFAULT_IMAGE_SIZES, workers=None, progress=None):
+    """
+    Giải mã và resize toàn bộ ảnh trong data_dir một lần, ghi mỗi kích thước thành một
+    mảng uint8 (N, H, W, 3) dạng .npy đọc được bằng memory-map, kèm index.json
+    (tên file, nhãn, tên lớp)
+
+    Args:
+        data_dir: Thư mục dữ liệu
+        cache_dir: Thư mục output (được tạo nếu chưa có)
+        image_sizes: Các kích thước ảnh vuông cần tạo
+        workers: Số thread giải mã (None = số CPU)
+        progress: Hàm progress(số ảnh đã xử lý, tổng số ảnh) (tùy chọn)
+
+    Returns:
+        dict: Nội dung index.json đã ghi
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    filenames, labels, class_names = list_image_files(data_dir)
+    image_sizes = sorted(set(int(size) for size in image_sizes))
+
+    arrays = {
+        size: open_memmap(os.path.join(cache_dir, _images_file(size)), mode='w+',
+                          dtype=np.uint8, shape=(len(filenames), size, size, 3))
+        for size in image_sizes
+    }
+
+    def decode(i):
+        for size, array in zip(image_sizes,
+                               load_image_sizes(os.path.join(data_dir, filenames[i]), image_sizes)):
+            arrays[size][i] = array
+
+    # PIL nhả GIL khi giải mã/resize nên thread tận dụng được nhiều nhân
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for done, _ in enumerate(executor.map(decode, range(len(filenames))), 1):
+            if progress and (done % 500 == 0 or done == len(filenames)):
+                progress(done, len(filenames))
+
+    for array in arrays.values():
+        array.flush()
+    del arrays
+
+    index = {
+        'format_version': DATASET_CACHE_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'data_dir': os.path.abspath(data_dir),
+        'class_names': class_names,
+        'image_sizes': {str(size): _images_file(size) for size in image_sizes},
+        'filenames': filenames,
+        'labels': labels.tolist(),
+    }
+    with open(os.path.join(cache_dir, INDEX_FILE), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+
+    return index
+
+def load_dataset_cache(cache_dir='dataset_cache', image_size=128, data_dir=None, mmap_mode='r'):
+    """
+    Đọc cache do build_dataset_cache tạo ra
+
+    Args:
+        cache_dir: Thư mục cache
+        image_size: Kích thước ảnh cần đọc (phải có trong cache)
+        data_dir: Nếu có, kiểm tra danh sách ảnh hiện tại khớp với cache
+        mmap_mode: Chế độ memory-map của np.load ('r' = chỉ đọc, None = nạp vào bộ nhớ)
+
+    Returns:
+        tuple: (mảng ảnh uint8 (N, H, W, 3), mảng nhãn, index)
+    """
+    with open(os.path.join(cache_dir, INDEX_FILE), encoding='utf-8') as f:
+        index = json.load(f)
+    if index.get('format_version') != DATASET_CACHE_VERSION:
+        raise ValueError(f"Unsupported dataset cache version: {index.get('format_version')}")
+
+    height, width = _size_tuple(image_size)
+    if height != width or str(height) not in index['image_sizes']:
+        raise ValueError(f"Image size {image_size} not in dataset cache "
+                         f"(available: {', '.join(index['image_sizes'])})")
+
+    if data_dir is not None:
+        filenames, _, class_names = list_image_files(data_dir)
+        if filenames != index['filenames'] or class_names != index['class_names']:
+            raise ValueError(f"Dataset cache {cache_dir} is stale for {data_dir}; "
+                             f"run prepare_dataset.py again")
+
+    images = np.load(os.path.join(cache_dir, index['image_sizes'][str(height)]), mmap_mode=mmap_mode)
+    return images, np.asarray(index['labels'], dtype=np.int64), index
+
+def _images_file(size):
+    """Tên file .npy của một kích thước ảnh"""
+    return f'images_{size}.npy'
+
+def _size_tuple(image_size):
+    """int hoặc (H, W) -> (H, W)"""
+    if isinstance(image_size, int):
+        return image_size, image_size
+    return tuple(image_size)
@@ -0,0 +1,145 @@
+import json
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+class _Subscriber:
+    """Hàng đợi sự kiện của một kết nối SSE"""
+
+    def __init__(self, queue_size):
+        self.queue = queue.Queue(maxsize=queue_size)
+        # Bị ngắt vì hàng đợi đầy hoặc broadcaster đóng; client tự kết nối lại với Last-Event-ID
+        self.dropped = False
+
+class HistoryBroadcaster:
+    """Phát các bản ghi lịch sử mới tới các client Server-Sent Events trong cùng process"""
+
+    def __init__(self, time_extractor, queue_size=256, heartbeat_seconds=15,
+                 replay_limit=1000, retry_ms=3000):
+        """
+        Khởi tạo HistoryBroadcaster
+
+        Args:
+            time_extractor: TimeExtractor (hoặc PartitionedTimeExtractor) dùng để phát lại
+                các bản ghi client bỏ lỡ khi kết nối lại
+            queue_size: Số lần ghi tối đa chờ gửi cho mỗi client; client chậm hơn bị ngắt
+            heartbeat_seconds: Khoảng gửi comment giữ kết nối khi không có bản ghi mới (giây)
+            replay_limit: Số bản ghi đọc mỗi lần khi phát lại từ cơ sở dữ liệu lúc kết nối lại
+            retry_ms: Thời gian trình duyệt chờ trước khi kết nối lại (ms)
+        """
+        self.time_extractor = time_extractor
+        self.queue_size = queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self.replay_limit = replay_limit
+        self.retry_ms = retry_ms
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, records):
+        """
+        Đưa các bản ghi vừa ghi vào hàng đợi của mọi client (dùng làm listener của
+        TimeExtractor.add_listener); không bao giờ chặn thread ghi
+        """
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.published += len(records)
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(records)
+            except queue.Full:
+                self._drop(subscriber)
+
+    def subscribe(self):
+        """Đăng ký một client mới"""
+        subscriber = _Subscriber(self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Hủy đăng ký client"""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _drop(self, subscriber):
+        """Ngắt client không theo kịp; các bản ghi bị bỏ được phát lại khi client kết nối lại"""
+        with self._lock:
+            if subscriber not in self._subscribers:
+                return
+            self._subscribers.discard(subscriber)
+            self.dropped += 1
+        subscriber.dropped = True
+        logger.warning("History stream subscriber dropped (queue full)")
+
+    def stream(self, last_id=None):
+        """
+        Luồng text/event-stream cho một client
+
+        Args:
+            last_id: id bản ghi cuối client đã nhận (Last-Event-ID); các bản ghi mới hơn
+                được phát lại từ cơ sở dữ liệu trước khi gửi bản ghi mới
+
+        Yields:
+            str: Các sự kiện SSE ('analysis', id = id bản ghi) và comment heartbeat
+        """
+        # Đăng ký trước khi đọc cơ sở dữ liệu để không bỏ lỡ bản ghi ghi xen giữa
+        subscriber = self.subscribe()
+        try:
+            yield f"retry: {self.retry_ms}\n\n"
+
+            sent_id = last_id
+            # Phát lại từng trang (id tăng dần) cho tới khi bắt kịp, không bỏ sót bản ghi nào
+            while sent_id is not None and not self._closed.is_set():
+                records = self.time_extractor.get_all_history(self.replay_limit, since_id=sent_id)
+                for record in sorted(records, key=lambda record: record['id']):
+                    yield _format_event(record)
+                    sent_id = record['id']
+                if len(records) < self.replay_limit:
+                    break
+
+            while not self._closed.is_set() and not subscriber.dropped:
+                try:
+                    records = subscriber.queue.get(timeout=self.heartbeat_seconds)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+                if records is None:
+                    break
+                for record in records:
+                    # Bỏ các bản ghi đã gửi trong phần phát lại
+                    if sent_id is not None and record['id'] <= sent_id:
+                        continue
+                    yield _format_event(record)
+                    sent_id = record['id']
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        """Số client đang kết nối, số bản ghi đã phát và số client bị ngắt"""
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self.published,
+                'dropped': self.dropped,
+                'closed': self._closed.is_set()
+            }
+
+    def close(self):
+        """Kết thúc mọi luồng đang mở"""
+        self._closed.set()
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(None)
+            except queue.Full:
+                subscriber.dropped = True
+
+def _format_event(record):
+    """Mã hóa một bản ghi thành sự kiện SSE"""
+    return f"id: {record['id']}\nevent: analysis\ndata: {json.dumps(record, ensure_ascii=False)}\n\n"
@@ -0,0 +1,126 @@
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from time_extractor import TimeExtractor
+
+# Phiên bản định dạng thư mục xuất
+COLUMNAR_FORMAT_VERSION = 1
+
+SCHEMA_FILE = 'schema.json'
+
+# Cột xuất: tên -> (biểu thức SQL, dtype, mô tả)
+COLUMNS = {
+    'id': ('id', 'int64', 'id bản ghi trong analysis_history'),
+    'epoch_ms': ('epoch_ms', 'int64',
+                 'Thời điểm phân tích, mili giây kể từ 1970-01-01 UTC'),
+    'hour': ('hour', 'int8', 'Giờ địa phương (0-23)'),
+    'prediction': ('prediction', 'int16',
+                   'Mã lớp dự đoán (chỉ số trong prediction_codes, -1 nếu rỗng)'),
+    'confidence': ('confidence', 'float32', 'Độ tin cậy (0-1), NaN nếu rỗng'),
+    'duration': ('duration', 'float32', 'Thời gian xử lý (giây), NaN nếu rỗng'),
+}
+
+# Số bản ghi đọc mỗi lần fetchmany
+FETCH_CHUNK_SIZE = 100000
+
+def export_columnar(db_path, output_dir, chunk_size=FETCH_CHUNK_SIZE):
+    """
+    Xuất analysis_history thành thư mục các file .npy (mỗi cột một file) kèm schema.json,
+    đọc lại được bằng np.load(..., mmap_mode='r') mà không cần nạp toàn bộ vào bộ nhớ
+
+    Args:
+        db_path: Đường dẫn cơ sở dữ liệu SQLite (được nâng cấp schema trước khi xuất)
+        output_dir: Thư mục output (được tạo nếu chưa có)
+        chunk_size: Số bản ghi đọc và ghi mỗi lần
+
+    Returns:
+        dict: Schema đã ghi (số bản ghi, cột, bảng mã lớp dự đoán)
+    """
+    # Nâng cấp lên schema mới nhất để có các cột được xuất (ví dụ epoch_ms)
+    TimeExtractor(db_path).close()
+    os.makedirs(output_dir, exist_ok=True)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        # Đếm và đọc trong cùng một transaction để số bản ghi khớp với dữ liệu đọc được
+        conn.execute("BEGIN")
+        rows = conn.execute("SELECT COUNT(*) FROM analysis_history").fetchone()[0]
+        prediction_codes = [row[0] for row in conn.execute(
+            "SELECT DISTINCT prediction FROM analysis_history "
+            "WHERE prediction IS NOT NULL ORDER BY prediction"
+        )]
+        code_of = {prediction: code for code, prediction in enumerate(prediction_codes)}
+
+        arrays = {
+            name: open_memmap(os.path.join(output_dir, f'{name}.npy'), mode='w+',
+                              dtype=dtype, shape=(rows,))
+            for name, (_, dtype, _) in COLUMNS.items()
+        }
+
+        select = ', '.join(expression for expression, _, _ in COLUMNS.values())
+        cursor = conn.execute(f"SELECT {select} FROM analysis_history ORDER BY id")
+        offset = 0
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            end = offset + len(chunk)
+            ids, epoch_ms, hours, predictions, confidences, durations = zip(*chunk)
+            arrays['id'][offset:end] = ids
+            arrays['epoch_ms'][offset:end] = [value or 0 for value in epoch_ms]
+            arrays['hour'][offset:end] = [value or 0 for value in hours]
+            arrays['prediction'][offset:end] = [code_of.get(value, -1) for value in predictions]
+            # None -> NaN khi chuyển sang mảng float
+            arrays['confidence'][offset:end] = np.array(confidences, dtype=np.float64)
+            arrays['duration'][offset:end] = np.array(durations, dtype=np.float64)
+            offset = end
+    finally:
+        conn.rollback()
+        conn.close()
+
+    for array in arrays.values():
+        array.flush()
+    del arrays
+
+    schema = {
+        'format_version': COLUMNAR_FORMAT_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'source': os.path.abspath(db_path),
+        'rows': rows,
+        'columns': {
+            name: {'file': f'{name}.npy', 'dtype': dtype, 'description': description}
+            for name, (_, dtype, description) in COLUMNS.items()
+        },
+        'prediction_codes': prediction_codes,
+    }
+    with open(os.path.join(output_dir, SCHEMA_FILE), 'w', encoding='utf-8') as f:
+        json.dump(schema, f, indent=2, ensure_ascii=False)
+
+    return schema
+
+def load_columnar(output_dir, mmap_mode='r'):
+    """
+    Đọc thư mục do export_columnar tạo ra
+
+    Args:
+        output_dir: Thư mục chứa các file .npy và schema.json
+        mmap_mode: Chế độ memory-map của np.load ('r' = chỉ đọc, None = nạp vào bộ nhớ)
+
+    Returns:
+        tuple: (dict tên cột -> mảng NumPy, schema)
+    """
+    with open(os.path.join(output_dir, SCHEMA_FILE), encoding='utf-8') as f:
+        schema = json.load(f)
+    if schema.get('format_version') != COLUMNAR_FORMAT_VERSION:
+        raise ValueError(f"Unsupported columnar format version: {schema.get('format_version')}")
+
+    columns = {
+        name: np.load(os.path.join(output_dir, column['file']), mmap_mode=mmap_mode)
+        for name, column in schema['columns'].items()
+    }
+    return columns, schema
@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+import zlib
+
+# Định dạng xuất: tên -> (MIME type, phần mở rộng file)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+}
+
+# Kích thước tối thiểu của mỗi khối byte được trả ra (trước khi nén)
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+def export_filename(fmt='ndjson', compress=False, prefix='analysis_history'):
+    """Tên file tải xuống tương ứng với định dạng và chế độ nén"""
+    extension = EXPORT_FORMATS[fmt][1]
+    return f"{prefix}.{extension}.gz" if compress else f"{prefix}.{extension}"
+
+def export_mimetype(fmt='ndjson', compress=False):
+    """MIME type của dữ liệu xuất"""
+    return 'application/gzip' if compress else EXPORT_FORMATS[fmt][0]
+
+def iter_export(records, fmt='ndjson', compress=False, buffer_size=EXPORT_BUFFER_SIZE):
+    """
+    Mã hóa các bản ghi thành NDJSON hoặc CSV theo từng khối byte, không giữ toàn bộ
+    dữ liệu trong bộ nhớ
+
+    Args:
+        records: Iterable các dict bản ghi (ví dụ TimeExtractor.iter_history())
+        fmt: 'ndjson' (mỗi dòng một object JSON) hoặc 'csv' (dòng đầu là tên cột)
+        compress: Nén gzip dạng luồng
+        buffer_size: Số byte tối thiểu gom lại trước khi trả ra một khối
+
+    Yields:
+        bytes: Các khối dữ liệu liên tiếp của file xuất
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    # wbits=31: định dạng gzip (header + CRC32), giải nén được bằng gzip/gunzip
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = io.StringIO()
+    writer = None
+
+    def drain():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    for record in records:
+        if fmt == 'ndjson':
+            buffer.write(json.dumps(record, ensure_ascii=False))
+            buffer.write('\n')
+        else:
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=list(record), lineterminator='\n')
+                writer.writeheader()
+            writer.writerow(record)
+
+        if buffer.tell() >= buffer_size:
+            chunk = drain()
+            if chunk:
+                yield chunk
+
+    chunk = drain()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+def export_history(time_extractor, output_path, fmt='ndjson', compress=False,
+                   year=None, month=None, day=None):
+    """
+    Xuất lịch sử phân tích ra file theo luồng
+
+    Args:
+        time_extractor: TimeExtractor chứa lịch sử
+        output_path: Đường dẫn file output
+        fmt: 'ndjson' hoặc 'csv'
+        compress: Nén gzip
+        year, month, day: Bộ lọc ngày (tùy chọn, giống get_analysis_by_date)
+
+    Returns:
+        str: Đường dẫn file được tạo
+    """
+    records = time_extractor.iter_history(year, month, day)
+    with open(output_path, 'wb') as f:
+        for chunk in iter_export(records, fmt, compress):
+            f.write(chunk)
+    return output_path
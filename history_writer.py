@@ -0,0 +1,221 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Chính sách khi hàng đợi đầy
+FULL_POLICIES = ('block', 'drop')
+
+class HistoryQueueFull(Exception):
+    """Bản ghi bị bỏ qua vì hàng đợi ghi lịch sử đã đầy (chính sách 'drop')"""
+
+class HistoryWriter:
+    """Ghi lịch sử phân tích bất đồng bộ (write-behind) theo từng batch"""
+
+    def __init__(self, time_extractor, max_queue_size=10000, batch_size=256,
+                 max_latency_ms=200, full_policy='block', put_timeout=None):
+        """
+        Khởi tạo HistoryWriter
+
+        Args:
+            time_extractor: TimeExtractor dùng để ghi vào SQLite
+            max_queue_size: Số bản ghi tối đa đang chờ ghi
+            batch_size: Số bản ghi tối đa trong một transaction
+            max_latency_ms: Thời gian tối đa một bản ghi nằm trong hàng đợi trước khi ghi (ms)
+            full_policy: 'block' (chờ chỗ trống) hoặc 'drop' (bỏ bản ghi) khi hàng đợi đầy
+            put_timeout: Thời gian chờ tối đa với chính sách 'block' (giây, None = chờ mãi)
+        """
+        if full_policy not in FULL_POLICIES:
+            raise ValueError(f"Unknown full_policy: {full_policy}")
+        self.time_extractor = time_extractor
+        self.batch_size = batch_size
+        self.max_latency_ms = max_latency_ms
+        self.full_policy = full_policy
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._closed = threading.Event()
+        self._thread = None
+        # Khóa giữa submit_many và close: không bản ghi nào vào hàng đợi sau khi close() bắt đầu
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self):
+        """Khởi động thread ghi nền và đăng ký flush khi thoát chương trình"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._closed.clear()
+            self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+        return self
+
+    def submit(self, image_name, prediction, confidence, duration=None, notes=None,
+               from_cache=False, callback=None):
+        """
+        Đưa một bản ghi vào hàng đợi
+
+        Args:
+            image_name, prediction, confidence, duration, notes, from_cache:
+                Giống TimeExtractor.record_analysis
+            callback: Hàm được gọi với dict bản ghi (có 'id') sau khi ghi xong
+
+        Returns:
+            Future: Kết quả là dict bản ghi giống record_analysis
+        """
+        return self.submit_many([{
+            'image_name': image_name,
+            'prediction': prediction,
+            'confidence': confidence,
+            'duration': duration,
+            'notes': notes,
+            'from_cache': from_cache
+        }], callback=callback)[0]
+
+    def submit_many(self, analyses, callback=None):
+        """Đưa nhiều bản ghi (dict như record_analyses) vào hàng đợi, trả về list Future"""
+        now = datetime.now()
+        futures = []
+        with self._lock:
+            if self._closed.is_set() or self._thread is None:
+                raise RuntimeError("HistoryWriter is not running")
+
+            for analysis in analyses:
+                # Giữ thời điểm phân tích, không phải thời điểm ghi
+                analysis = dict(analysis, dt=analysis.get('dt') or now)
+                future = Future()
+                if callback is not None:
+                    future.add_done_callback(_callback_adapter(callback))
+                try:
+                    if self.full_policy == 'block':
+                        self._queue.put((analysis, future), timeout=self.put_timeout)
+                    else:
+                        self._queue.put_nowait((analysis, future))
+                except queue.Full:
+                    with self._stats_lock:
+                        self.dropped += 1
+                    logger.warning(f"History queue full, dropping record for {analysis['image_name']}")
+                    future.set_exception(HistoryQueueFull("History queue is full"))
+                futures.append(future)
+        return futures
+
+    def flush(self, timeout=None):
+        """
+        Chờ tới khi mọi bản ghi đang chờ đã được ghi
+
+        Returns:
+            bool: True nếu hàng đợi đã được ghi hết trong thời gian chờ
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        """
+        Ngừng nhận bản ghi mới, ghi hết hàng đợi rồi dừng thread; bản ghi còn lại
+        sau khi thread dừng (nếu có) nhận RuntimeError
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._closed.set()
+        thread.join(timeout)
+        if thread.is_alive():
+            return
+
+        with self._lock:
+            self._thread = None
+        atexit.unregister(self.close)
+        while True:
+            try:
+                _, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            with self._stats_lock:
+                self.failed += 1
+            future.set_exception(RuntimeError("HistoryWriter closed before the record was written"))
+            self._queue.task_done()
+
+    def stats(self):
+        """Thống kê hàng đợi và số bản ghi đã ghi/bỏ qua"""
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_size': self._queue.maxsize,
+                'batch_size': self.batch_size,
+                'max_latency_ms': self.max_latency_ms,
+                'full_policy': self.full_policy,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'batches': self.batches
+            }
+
+    def _collect_batch(self):
+        """Lấy tối đa batch_size bản ghi, chờ tối đa max_latency_ms sau bản ghi đầu tiên"""
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_latency_ms / 1000.0
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0 and not self._closed.is_set():
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Vòng lặp ghi: gom batch và ghi trong một transaction"""
+        while not (self._closed.is_set() and self._queue.empty()):
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            try:
+                records = self.time_extractor.record_analyses([item for item, _ in batch])
+                with self._stats_lock:
+                    self.written += len(records)
+                    self.batches += 1
+                for (_, future), record in zip(batch, records):
+                    future.set_result(record)
+            except Exception as e:
+                logger.error(f"Error writing history batch: {str(e)}")
+                with self._stats_lock:
+                    self.failed += len(batch)
+                for _, future in batch:
+                    future.set_exception(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+def _callback_adapter(callback):
+    """Gọi callback với bản ghi khi Future hoàn thành thành công"""
+    def on_done(future):
+        if future.exception() is None:
+            try:
+                callback(future.result())
+            except Exception as e:
+                logger.error(f"History callback failed: {str(e)}")
+    return on_done
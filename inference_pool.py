@@ -0,0 +1,371 @@
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Số lần một ảnh được gửi lại khi worker xử lý nó bị crash
+MAX_TASK_RETRIES = 2
+
+class InferencePool:
+    """Nhóm process suy luận, mỗi process có model riêng, nhận ảnh qua shared memory"""
+
+    def __init__(self, model_path, num_workers=None, num_slots=None, img_size=224,
+                 intra_op_threads=1, inter_op_threads=1, max_batch_size=32,
+                 data_dir='data', ready_timeout=300):
+        """
+        Khởi tạo InferencePool
+
+        Args:
+            model_path: Đường dẫn file checkpoint .h5
+            num_workers: Số process suy luận (mặc định: số CPU)
+            num_slots: Số slot ảnh trong vùng shared memory (mặc định 4 x max_batch_size)
+            img_size: Kích thước ảnh đầu vào của model
+            intra_op_threads: Số thread TF intra-op của mỗi worker
+            inter_op_threads: Số thread TF inter-op của mỗi worker
+            max_batch_size: Số ảnh tối đa một worker gom lại cho một forward pass
+            data_dir: Thư mục dữ liệu (để worker lấy tên lớp)
+            ready_timeout: Thời gian tối đa chờ worker tải xong model (giây)
+        """
+        self.model_path = model_path
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.num_slots = num_slots or 4 * max_batch_size
+        self.img_size = img_size
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.max_batch_size = max_batch_size
+        self.data_dir = data_dir
+        self.ready_timeout = ready_timeout
+
+        self._ctx = mp.get_context('spawn')
+        self._shm = None
+        self._slots = None
+        self._free_slots = queue.Queue()
+        self._result_queue = None
+        self._workers = {}
+        self._inflight = {}
+        self._task_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._ready = {}
+        # Tăng mỗi lần reload: chỉ worker khởi động sau reload mới được coi là sẵn sàng
+        self._model_generation = 0
+        self._stopping = threading.Event()
+        self._threads = []
+        self.restarts = 0
+
+    def start(self, wait=True):
+        """Tạo vùng shared memory, khởi động các worker và thread quản lý"""
+        slot_shape = (self.num_slots, self.img_size, self.img_size, 3)
+        nbytes = int(np.prod(slot_shape)) * np.dtype(np.float32).itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self._slots = np.ndarray(slot_shape, dtype=np.float32, buffer=self._shm.buf)
+        for slot in range(self.num_slots):
+            self._free_slots.put(slot)
+
+        self._result_queue = self._ctx.Queue()
+        self._stopping.clear()
+        for worker_id in range(self.num_workers):
+            self._spawn_worker(worker_id)
+
+        self._threads = [
+            threading.Thread(target=self._collect_results, name='inference-pool-results',
+                             daemon=True),
+            threading.Thread(target=self._monitor_workers, name='inference-pool-monitor',
+                             daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+        if wait:
+            self.wait_ready(self.ready_timeout)
+        logger.info(f"Inference pool started with {self.num_workers} workers, "
+                    f"{self.num_slots} shared-memory slots")
+        return self
+
+    def wait_ready(self, timeout=None):
+        """Chờ tất cả worker tải xong model"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if all(self._ready.get(worker_id) for worker_id in self._workers):
+                    return True
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("Inference workers did not become ready in time")
+            time.sleep(0.05)
+
+    def stop(self, timeout=10):
+        """Dừng các worker và giải phóng shared memory"""
+        self._stopping.set()
+        with self._lock:
+            workers = list(self._workers.values())
+        for worker in workers:
+            worker['queue'].put(None)
+        for worker in workers:
+            worker['process'].join(timeout)
+            if worker['process'].is_alive():
+                worker['process'].terminate()
+
+        self._result_queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+
+        with self._lock:
+            pending = list(self._inflight.values())
+            self._inflight.clear()
+        for task in pending:
+            if not task['future'].done():
+                task['future'].set_exception(RuntimeError("Inference pool stopped"))
+
+        self._slots = None
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def reload(self, model_path=None, wait=True):
+        """
+        Tải lại model trên từng worker (worker thoát và được monitor khởi động lại)
+
+        Args:
+            model_path: Checkpoint mới (mặc định giữ đường dẫn hiện tại)
+            wait: Chờ tới khi mọi worker mới đã tải xong model; sau đó không còn
+                ảnh nào được suy luận bằng model cũ
+        """
+        with self._lock:
+            if model_path is not None:
+                self.model_path = model_path
+            self._model_generation += 1
+            for worker_id in self._workers:
+                self._ready[worker_id] = False
+            workers = list(self._workers.values())
+        for worker in workers:
+            worker['queue'].put(None)
+        if wait:
+            self.wait_ready(self.ready_timeout)
+
+    def submit(self, image):
+        """
+        Gửi một ảnh đã tiền xử lý tới worker rảnh nhất
+
+        Args:
+            image: Mảng float32 kích thước (img_size, img_size, 3)
+
+        Returns:
+            Future: Kết quả là mảng đầu ra của model cho ảnh này
+        """
+        if self._shm is None:
+            raise RuntimeError("InferencePool is not running")
+
+        # Chờ slot trống, tạo backpressure khi các worker quá tải
+        slot = self._free_slots.get()
+        self._slots[slot] = image
+        task_id = next(self._task_ids)
+        future = Future()
+        with self._lock:
+            self._inflight[task_id] = {'slot': slot, 'future': future,
+                                       'worker': None, 'retries': 0}
+            self._dispatch(task_id)
+        return future
+
+    def infer(self, batch):
+        """
+        Suy luận một batch (N, H, W, 3), chia cho các worker
+
+        Returns:
+            np.ndarray: Đầu ra của model kích thước (N, số lớp)
+        """
+        futures = [self.submit(image) for image in batch]
+        return np.stack([future.result() for future in futures])
+
+    def stats(self):
+        """Trạng thái các worker và số ảnh đang xử lý"""
+        with self._lock:
+            return {
+                'num_workers': self.num_workers,
+                'num_slots': self.num_slots,
+                'free_slots': self._free_slots.qsize(),
+                'inflight': len(self._inflight),
+                'restarts': self.restarts,
+                'workers': [{
+                    'id': worker_id,
+                    'pid': worker['process'].pid,
+                    'alive': worker['process'].is_alive(),
+                    'ready': bool(self._ready.get(worker_id)),
+                    'inflight': len(worker['tasks'])
+                } for worker_id, worker in sorted(self._workers.items())]
+            }
+
+    def _spawn_worker(self, worker_id):
+        """Khởi động (lại) process worker với hàng đợi task mới"""
+        with self._lock:
+            # Đặt trước khi start để thông báo 'ready' của process mới không bị ghi đè
+            self._ready[worker_id] = False
+            model_path, model_generation = self.model_path, self._model_generation
+        task_queue = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            name=f'inference-worker-{worker_id}',
+            args=(worker_id, model_path, model_generation, self.data_dir,
+                  self._shm.name, self._slots.shape, task_queue, self._result_queue,
+                  self.intra_op_threads, self.inter_op_threads, self.max_batch_size),
+            daemon=True
+        )
+        process.start()
+        with self._lock:
+            old = self._workers.get(worker_id)
+            self._workers[worker_id] = {
+                'process': process,
+                'queue': task_queue,
+                'tasks': old['tasks'] if old else set()
+            }
+
+    def _dispatch(self, task_id):
+        """Gửi task tới worker có ít task nhất (gọi khi đang giữ lock)"""
+        # Ưu tiên worker đã sẵn sàng, tránh gửi ảnh vào worker đang tải model hoặc đã chết
+        candidates = [wid for wid, worker in self._workers.items()
+                      if self._ready.get(wid) and worker['process'].is_alive()]
+        worker_id = min(candidates or self._workers,
+                        key=lambda wid: len(self._workers[wid]['tasks']))
+        worker = self._workers[worker_id]
+        task = self._inflight[task_id]
+        task['worker'] = worker_id
+        worker['tasks'].add(task_id)
+        worker['queue'].put((task_id, task['slot']))
+
+    def _finish_task(self, task_id):
+        """Gỡ task khỏi danh sách đang xử lý và trả slot (gọi khi đang giữ lock)"""
+        task = self._inflight.pop(task_id, None)
+        if task is None:
+            return None
+        self._workers[task['worker']]['tasks'].discard(task_id)
+        self._free_slots.put(task['slot'])
+        return task
+
+    def _collect_results(self):
+        """Nhận kết quả từ các worker và hoàn thành Future tương ứng"""
+        while True:
+            message = self._result_queue.get()
+            if message is None:
+                return
+            kind, worker_id, payload = message
+
+            if kind == 'ready':
+                pid, model_generation = payload
+                with self._lock:
+                    current = model_generation == self._model_generation
+                    if current:
+                        self._ready[worker_id] = True
+                    elif worker_id in self._workers:
+                        # Worker khởi động trước lần reload gần nhất (ví dụ được monitor
+                        # khởi động lại đúng lúc reload): cho thoát để tải model mới
+                        self._workers[worker_id]['queue'].put(None)
+                if current:
+                    logger.info(f"Inference worker {worker_id} ready (pid={pid})")
+            elif kind == 'result':
+                with self._lock:
+                    done = [(self._finish_task(task_id), output) for task_id, output in payload]
+                for task, output in done:
+                    if task is not None and not task['future'].done():
+                        task['future'].set_result(output)
+            elif kind == 'error':
+                task_ids, error = payload
+                with self._lock:
+                    done = [self._finish_task(task_id) for task_id in task_ids]
+                for task in done:
+                    if task is not None and not task['future'].done():
+                        task['future'].set_exception(RuntimeError(error))
+
+    def _monitor_workers(self):
+        """Khởi động lại worker bị crash và gửi lại các ảnh nó đang giữ"""
+        while not self._stopping.wait(0.5):
+            with self._lock:
+                dead = [(worker_id, worker) for worker_id, worker in self._workers.items()
+                        if not worker['process'].is_alive()]
+            for worker_id, worker in dead:
+                if self._stopping.is_set():
+                    return
+                exitcode = worker['process'].exitcode
+                if exitcode != 0:
+                    logger.error(f"Inference worker {worker_id} died (exitcode={exitcode}), "
+                                 f"restarting")
+                else:
+                    logger.info(f"Inference worker {worker_id} exited, restarting")
+                self._spawn_worker(worker_id)
+
+                with self._lock:
+                    self.restarts += 1
+                    orphaned = list(self._workers[worker_id]['tasks'])
+                    self._workers[worker_id]['tasks'] = set()
+                    failed = []
+                    for task_id in orphaned:
+                        task = self._inflight.get(task_id)
+                        if task is None:
+                            continue
+                        if exitcode != 0:
+                            task['retries'] += 1
+                        if task['retries'] > MAX_TASK_RETRIES:
+                            failed.append(self._finish_task(task_id))
+                        else:
+                            self._dispatch(task_id)
+                for task in failed:
+                    if not task['future'].done():
+                        task['future'].set_exception(
+                            RuntimeError("Inference worker crashed while processing image"))
+
+def _worker_main(worker_id, model_path, model_generation, data_dir, shm_name, slots_shape,
+                 task_queue, result_queue, intra_op_threads, inter_op_threads, max_batch_size):
+    """Vòng lặp của process worker: đọc slot từ shared memory, suy luận, trả kết quả"""
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+    from predict_simple import WeatherPredictor
+    from time_extractor import TimeExtractor
+
+    # Worker chỉ gọi infer(): không mở cơ sở dữ liệu lịch sử
+    predictor = WeatherPredictor(model_path, data_dir=data_dir,
+                                 warmup_batch_sizes=(1, max_batch_size),
+                                 time_extractor=TimeExtractor(db_path=None))
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slots = np.ndarray(slots_shape, dtype=np.float32, buffer=shm.buf)
+    result_queue.put(('ready', worker_id, (os.getpid(), model_generation)))
+
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                return
+            tasks = [task]
+
+            # Gom thêm các task đang chờ để chạy một forward pass
+            stop_after_batch = False
+            while len(tasks) < max_batch_size:
+                try:
+                    task = task_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if task is None:
+                    stop_after_batch = True
+                    break
+                tasks.append(task)
+
+            task_ids = [task_id for task_id, _ in tasks]
+            try:
+                outputs = predictor.infer(slots[[slot for _, slot in tasks]])
+                result_queue.put(('result', worker_id, list(zip(task_ids, outputs))))
+            except Exception as e:
+                result_queue.put(('error', worker_id, (task_ids, str(e))))
+
+            if stop_after_batch:
+                return
+    finally:
+        del slots
+        shm.close()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+QUẢN LÝ LỊCH SỬ PHÂN TÍCH - Các lệnh bảo trì cơ sở dữ liệu lịch sử
+Ví dụ:
+    python manage_history.py rebuild-rollups
+    python manage_history.py backfill results.csv
+    python manage_history.py export history.csv.gz --format csv --gzip
+    python manage_history.py export-columnar history_columns/
+    python manage_history.py split-partitions history_partitions/
+    python manage_history.py --db analysis_history.db info
+"""
+
+import argparse
+import csv
+import sqlite3
+import time
+from datetime import datetime
+
+from history_columnar import export_columnar
+from history_export import EXPORT_FORMATS, export_history
+from partitioned_history import split_history
+from time_extractor import BATCH_CHUNK_SIZE, TimeExtractor
+
+def cmd_info(extractor, args):
+    """In phiên bản schema, số bản ghi và số bucket tổng hợp"""
+    conn = sqlite3.connect(extractor.db_path)
+    records = conn.execute("SELECT COUNT(*) FROM analysis_history").fetchone()[0]
+    buckets = conn.execute("SELECT COUNT(*) FROM analysis_rollup_hourly").fetchone()[0]
+    conn.close()
+    print(f"Cơ sở dữ liệu: {extractor.db_path}")
+    print(f"Phiên bản schema: {extractor.get_schema_version()}")
+    print(f"Số bản ghi: {records:,}")
+    print(f"Số bucket tổng hợp: {buckets:,}")
+
+def cmd_rebuild_rollups(extractor, args):
+    """Tính lại bảng tổng hợp theo giờ từ toàn bộ analysis_history"""
+    start = time.perf_counter()
+    buckets = extractor.rebuild_rollups()
+    print(f"✅ Đã tính lại {buckets:,} bucket tổng hợp trong {time.perf_counter() - start:.2f}s")
+
+def read_backfill_csv(path):
+    """
+    Đọc file CSV kết quả phân loại offline theo từng dòng
+    Cột: image_name, prediction, confidence, duration, notes, timestamp (ISO 8601, giờ địa phương)
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            duration = row.get('duration')
+            timestamp = row.get('timestamp')
+            yield (
+                row['image_name'],
+                row['prediction'],
+                float(row['confidence']),
+                float(duration) if duration else None,
+                row.get('notes') or None,
+                datetime.fromisoformat(timestamp) if timestamp else None
+            )
+
+def cmd_backfill(extractor, args):
+    """Nhập hàng loạt kết quả phân loại offline từ file CSV"""
+    start = time.perf_counter()
+    id_range = extractor.record_analyses_batch(read_backfill_csv(args.csv_path), args.chunk_size)
+    if id_range is None:
+        print("⚠️  Không có bản ghi nào trong file")
+        return
+    first_id, last_id = id_range
+    print(f"✅ Đã ghi {last_id - first_id + 1:,} bản ghi (id {first_id} - {last_id}) "
+          f"trong {time.perf_counter() - start:.2f}s")
+
+def cmd_export(extractor, args):
+    """Xuất lịch sử ra file NDJSON/CSV theo luồng"""
+    start = time.perf_counter()
+    export_history(extractor, args.output_path, args.format, args.gzip,
+                   args.year, args.month, args.day)
+    print(f"✅ Đã xuất {args.output_path} trong {time.perf_counter() - start:.2f}s")
+
+def cmd_export_columnar(extractor, args):
+    """Xuất lịch sử thành các cột NumPy (.npy) đọc được bằng memory-map"""
+    start = time.perf_counter()
+    schema = export_columnar(extractor.db_path, args.output_dir)
+    print(f"✅ Đã xuất {schema['rows']:,} bản ghi vào {args.output_dir} "
+          f"trong {time.perf_counter() - start:.2f}s")
+
+def cmd_split_partitions(extractor, args):
+    """Tách cơ sở dữ liệu thành các file phân vùng theo tháng"""
+    start = time.perf_counter()
+    counts = split_history(extractor.db_path, args.partition_dir, args.chunk_size)
+    for (year, month), count in sorted(counts.items()):
+        print(f"  {year:04d}-{month:02d}: {count:,} bản ghi")
+    print(f"✅ Đã tách {sum(counts.values()):,} bản ghi thành {len(counts)} phân vùng "
+          f"trong {args.partition_dir} ({time.perf_counter() - start:.2f}s)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Quản lý lịch sử phân tích')
+    parser.add_argument('--db', default='analysis_history.db', help='Đường dẫn cơ sở dữ liệu SQLite')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    info = subparsers.add_parser('info', help='Thông tin cơ sở dữ liệu')
+    info.set_defaults(func=cmd_info)
+
+    rebuild = subparsers.add_parser('rebuild-rollups', help='Tính lại bảng tổng hợp theo giờ')
+    rebuild.set_defaults(func=cmd_rebuild_rollups)
+
+    backfill = subparsers.add_parser('backfill', help='Nhập kết quả phân loại offline từ CSV')
+    backfill.add_argument('csv_path', help='File CSV (image_name, prediction, confidence, '
+                                           'duration, notes, timestamp)')
+    backfill.add_argument('--chunk-size', type=int, default=BATCH_CHUNK_SIZE,
+                          help='Số bản ghi mỗi transaction')
+    backfill.set_defaults(func=cmd_backfill)
+
+    export = subparsers.add_parser('export', help='Xuất lịch sử ra NDJSON/CSV (theo luồng)')
+    export.add_argument('output_path', help='File output')
+    export.add_argument('--format', choices=list(EXPORT_FORMATS), default='ndjson')
+    export.add_argument('--gzip', action='store_true', help='Nén gzip')
+    export.add_argument('--year', type=int)
+    export.add_argument('--month', type=int)
+    export.add_argument('--day', type=int)
+    export.set_defaults(func=cmd_export)
+
+    columnar = subparsers.add_parser('export-columnar',
+                                     help='Xuất lịch sử thành các cột NumPy (.npy + schema.json)')
+    columnar.add_argument('output_dir', help='Thư mục output')
+    columnar.set_defaults(func=cmd_export_columnar)
+
+    split = subparsers.add_parser('split-partitions',
+                                  help='Tách lịch sử thành một file SQLite mỗi tháng')
+    split.add_argument('partition_dir', help='Thư mục phân vùng (HISTORY_PARTITION_DIR)')
+    split.add_argument('--chunk-size', type=int, default=BATCH_CHUNK_SIZE,
+                       help='Số bản ghi mỗi lần đọc/ghi')
+    split.set_defaults(func=cmd_split_partitions)
+
+    args = parser.parse_args()
+
+    # Khởi tạo TimeExtractor cũng nâng cấp schema (migration) nếu cần
+    extractor = TimeExtractor(args.db)
+    args.func(extractor, args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import math
+
+import numpy as np
+import tensorflow as tf
+
+from balanced_sampler import BalancedSampler, class_sampling_rates, default_steps_per_epoch
+from dataset_utils import load_dataset_cache, subset_indices
+
+class MemmapImageSequence(tf.keras.utils.Sequence):
+    """
+    Sinh batch từ mảng ảnh uint8 đã giải mã sẵn (memory-map), thay cho flow_from_directory:
+    không đọc/giải mã JPEG trong lúc training, augmentation vẫn do ImageDataGenerator thực hiện
+    """
+
+    def __init__(self, images, labels, indices, num_classes, batch_size=32, shuffle=True,
+                 image_data_generator=None, class_names=None, seed=None, sampler=None,
+                 steps_per_epoch=None, **kwargs):
+        """
+        Khởi tạo MemmapImageSequence
+
+        Args:
+            images: Mảng uint8 (N, H, W, 3), thường là kết quả np.load(..., mmap_mode='r')
+            labels: Mảng nhãn int (N,)
+            indices: Chỉ số ảnh thuộc tập này (xem dataset_utils.subset_indices)
+            num_classes: Số lớp (nhãn được mã hóa one-hot)
+            batch_size: Số ảnh mỗi batch
+            shuffle: Xáo trộn thứ tự ảnh sau mỗi epoch
+            image_data_generator: ImageDataGenerator dùng cho augmentation và rescale
+                (None = chỉ chuyển sang float32)
+            class_names: Tên lớp theo thứ tự nhãn (cho thuộc tính class_indices)
+            seed: Seed xáo trộn
+            sampler: BalancedSampler chọn ảnh cho mỗi epoch thay vì duyệt hết indices
+            steps_per_epoch: Số batch mỗi epoch khi dùng sampler (mặc định: một lượt indices)
+            **kwargs: Tham số của keras.utils.PyDataset (workers, use_multiprocessing, ...)
+        """
+        super().__init__(**kwargs)
+        self.images = images
+        self.labels = np.asarray(labels)
+        self.indices = np.asarray(indices)
+        self.num_classes = num_classes
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.image_data_generator = image_data_generator
+        self.sampler = sampler
+        self.steps_per_epoch = None
+        if sampler is not None:
+            self.steps_per_epoch = steps_per_epoch or default_steps_per_epoch(len(self.indices), batch_size)
+        # Cùng thuộc tính với DirectoryIterator để các script training dùng chung
+        self.samples = len(self.indices)
+        self.class_indices = {name: i for i, name in enumerate(class_names or [])}
+        self.classes = self.labels[self.indices]
+        self._rng = np.random.default_rng(seed)
+        self._order = self.indices
+        self.on_epoch_end()
+
+    def __len__(self):
+        if self.sampler is not None:
+            return self.steps_per_epoch
+        return math.ceil(len(self.indices) / self.batch_size)
+
+    def __getitem__(self, index):
+        # Đọc memmap theo thứ tự tăng dần để truy cập đĩa tuần tự hơn
+        batch_indices = np.sort(self._order[index * self.batch_size:(index + 1) * self.batch_size])
+        batch_x = self.images[batch_indices].astype(np.float32)
+        if self.image_data_generator is not None:
+            for i in range(len(batch_x)):
+                x = self.image_data_generator.random_transform(batch_x[i])
+                batch_x[i] = self.image_data_generator.standardize(x)
+        batch_y = np.eye(self.num_classes, dtype=np.float32)[self.labels[batch_indices]]
+        return batch_x, batch_y
+
+    def on_epoch_end(self):
+        if self.sampler is not None:
+            # Chọn trước toàn bộ ảnh của epoch để __getitem__ không phụ thuộc thứ tự gọi
+            self._order = self.sampler.sample(self.steps_per_epoch * self.batch_size)
+        elif self.shuffle:
+            self._order = self._rng.permutation(self.indices)
+
+def memmap_generators(cache_dir, image_size, batch_size, image_data_generator, data_dir='data',
+                      seed=None, sampling=None, steps_per_epoch=None, **kwargs):
+    """
+    Tạo cặp (training, validation) từ cache của prepare_dataset.py, chia giống
+    flow_from_directory(subset='training'/'validation') với validation_split của
+    image_data_generator
+
+    Args:
+        cache_dir: Thư mục cache
+        image_size: (chiều cao, chiều rộng) ảnh đầu vào
+        batch_size: Số ảnh mỗi batch
+        image_data_generator: ImageDataGenerator của script training
+        data_dir: Thư mục dữ liệu gốc (để kiểm tra cache còn khớp)
+        seed: Seed xáo trộn tập training
+        sampling: Cách lấy mẫu theo lớp cho tập training (xem class_sampling_rates),
+            None = duyệt toàn bộ tập training mỗi epoch
+        steps_per_epoch: Số batch mỗi epoch khi có sampling
+        **kwargs: Tham số của keras.utils.PyDataset (workers, use_multiprocessing, ...)
+
+    Returns:
+        tuple: (MemmapImageSequence training, MemmapImageSequence validation)
+    """
+    images, labels, index = load_dataset_cache(cache_dir, image_size, data_dir=data_dir)
+    validation_split = image_data_generator._validation_split
+    num_classes = len(index['class_names'])
+    train_indices = subset_indices(labels, validation_split, 'training')
+
+    sampler = None
+    if sampling is not None:
+        rates = class_sampling_rates(labels[train_indices], sampling, index['class_names'])
+        sampler = BalancedSampler(labels, train_indices, rates, seed=seed)
+
+    train_gen = MemmapImageSequence(
+        images, labels, train_indices, num_classes,
+        batch_size=batch_size, shuffle=True, image_data_generator=image_data_generator,
+        class_names=index['class_names'], seed=seed, sampler=sampler,
+        steps_per_epoch=steps_per_epoch, **kwargs
+    )
+    valid_gen = MemmapImageSequence(
+        images, labels, subset_indices(labels, validation_split, 'validation'), num_classes,
+        batch_size=batch_size, shuffle=False, image_data_generator=image_data_generator,
+        class_names=index['class_names'], **kwargs
+    )
+    return train_gen, valid_gen
@@ -0,0 +1,404 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from itertools import chain, islice
+
+from time_extractor import (BATCH_CHUNK_SIZE, SCHEMA_VERSION, TimeExtractor, _batch_analysis,
+                            _format_hourly_statistics, _format_statistics)
+
+logger = logging.getLogger(__name__)
+
+# Tên file của phân vùng tháng: analysis_history_<năm>_<tháng>.db
+PARTITION_FILE_FORMAT = 'analysis_history_{year:04d}_{month:02d}.db'
+PARTITION_FILE_PATTERN = re.compile(r'^analysis_history_(\d{4})_(\d{2})\.db$')
+
+# Mỗi tháng có một khoảng id riêng: id = (năm * 100 + tháng) * PARTITION_ID_SPACE + số thứ tự,
+# nên id vẫn duy nhất trên mọi phân vùng
+PARTITION_ID_SPACE = 10 ** 9
+
+def partition_id_base(year, month):
+    """id nhỏ nhất (không tính) của bản ghi mới trong phân vùng tháng"""
+    return (year * 100 + month) * PARTITION_ID_SPACE
+
+class PartitionedTimeExtractor:
+    """
+    Lưu lịch sử phân tích thành một file SQLite cho mỗi tháng (theo giờ địa phương).
+    Có cùng API với TimeExtractor; truy vấn chỉ mở các tháng liên quan và việc xóa
+    dữ liệu cũ là xóa nguyên file của các tháng đã hết hạn
+    """
+
+    # Không phụ thuộc cơ sở dữ liệu, dùng chung với TimeExtractor
+    extract_time_components = TimeExtractor.extract_time_components
+
+    def __init__(self, partition_dir='history_partitions', **extractor_options):
+        """
+        Khởi tạo PartitionedTimeExtractor
+
+        Args:
+            partition_dir: Thư mục chứa các file phân vùng tháng
+            **extractor_options: Tham số cho TimeExtractor của từng phân vùng
+                (journal_mode, synchronous, busy_timeout, max_idle_connections)
+        """
+        self.partition_dir = partition_dir
+        self.extractor_options = extractor_options
+        self._partitions = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        os.makedirs(partition_dir, exist_ok=True)
+
+    def partition_path(self, year, month):
+        """Đường dẫn file của phân vùng tháng"""
+        return os.path.join(self.partition_dir, PARTITION_FILE_FORMAT.format(year=year, month=month))
+
+    def list_partitions(self):
+        """
+        Các phân vùng đang có trên đĩa
+
+        Returns:
+            list: Các bộ (year, month), mới nhất trước
+        """
+        partitions = []
+        for name in os.listdir(self.partition_dir):
+            match = PARTITION_FILE_PATTERN.match(name)
+            if match:
+                partitions.append((int(match.group(1)), int(match.group(2))))
+        return sorted(partitions, reverse=True)
+
+    def _partition(self, year, month, create=True):
+        """TimeExtractor của phân vùng tháng, mở khi cần (None nếu chưa có và create=False)"""
+        key = (year, month)
+        with self._lock:
+            extractor = self._partitions.get(key)
+            if extractor is not None:
+                return extractor
+
+            path = self.partition_path(year, month)
+            exists = os.path.exists(path)
+            if not create and not exists:
+                return None
+            extractor = TimeExtractor(path, **self.extractor_options)
+            if not exists:
+                # Chỉ phân vùng vừa tạo cần đặt bộ đếm id; mở phân vùng có sẵn không ghi gì
+                _seed_id_sequence(extractor, year, month)
+            for listener in self._listeners:
+                extractor.add_listener(listener)
+            self._partitions[key] = extractor
+            return extractor
+
+    def add_listener(self, listener):
+        """Đăng ký listener cho mọi phân vùng, kể cả phân vùng mở sau này (xem TimeExtractor.add_listener)"""
+        with self._lock:
+            self._listeners.append(listener)
+            extractors = list(self._partitions.values())
+        for extractor in extractors:
+            extractor.add_listener(listener)
+
+    def remove_listener(self, listener):
+        """Hủy đăng ký listener ở mọi phân vùng"""
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+            extractors = list(self._partitions.values())
+        for extractor in extractors:
+            extractor.remove_listener(listener)
+
+    def _select_partitions(self, year=None, month=None):
+        """Các TimeExtractor của phân vùng khớp bộ lọc năm/tháng, mới nhất trước"""
+        extractors = []
+        for partition_year, partition_month in self.list_partitions():
+            if year is not None and partition_year != year:
+                continue
+            if month is not None and partition_month != month:
+                continue
+            extractor = self._partition(partition_year, partition_month, create=False)
+            if extractor is not None:
+                extractors.append(extractor)
+        return extractors
+
+    def _drop_partition(self, year, month):
+        """Đóng và xóa file của một phân vùng, trả về số bản ghi đã xóa"""
+        extractor = self._partition(year, month, create=False)
+        if extractor is None:
+            return 0
+        with extractor._connection() as conn:
+            count = conn.execute(
+                "SELECT COALESCE(SUM(count), 0) FROM analysis_rollup_hourly"
+            ).fetchone()[0]
+
+        with self._lock:
+            self._partitions.pop((year, month), None)
+        extractor.close()
+
+        path = self.partition_path(year, month)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        logger.info(f"Dropped history partition {year:04d}-{month:02d} ({count} records)")
+        return count
+
+    def get_schema_version(self):
+        """
+        Lấy phiên bản schema thấp nhất trong các phân vùng
+
+        Returns:
+            int: Phiên bản schema (SCHEMA_VERSION nếu chưa có phân vùng nào)
+        """
+        versions = [extractor.get_schema_version() for extractor in self._select_partitions()]
+        return min(versions) if versions else SCHEMA_VERSION
+
+    def record_analysis(self, image_name, prediction, confidence, duration=None, notes=None,
+                        from_cache=False):
+        """Ghi lại kết quả phân tích vào phân vùng của tháng hiện tại (giống TimeExtractor)"""
+        return self.record_analyses([{
+            'image_name': image_name,
+            'prediction': prediction,
+            'confidence': confidence,
+            'duration': duration,
+            'notes': notes,
+            'from_cache': from_cache
+        }])[0]
+
+    def record_analyses(self, analyses):
+        """Ghi lại nhiều kết quả phân tích, mỗi phân vùng tháng một transaction (giống TimeExtractor)"""
+        now = datetime.now()
+        groups = {}
+        for index, analysis in enumerate(analyses):
+            # Cố định thời điểm để bản ghi nằm đúng phân vùng của nó
+            analysis = dict(analysis, dt=analysis.get('dt') or now)
+            groups.setdefault((analysis['dt'].year, analysis['dt'].month), []).append((index, analysis))
+
+        results = {}
+        for (year, month), group in groups.items():
+            records = self._partition(year, month).record_analyses([analysis for _, analysis in group])
+            for (index, _), record in zip(group, records):
+                results[index] = record
+        return [results[index] for index in range(len(results))]
+
+    def record_analyses_batch(self, records, chunk_size=BATCH_CHUNK_SIZE):
+        """
+        Ghi hàng loạt kết quả phân tích (giống TimeExtractor.record_analyses_batch)
+
+        Returns:
+            tuple: (id nhỏ nhất, id lớn nhất) đã được gán, hoặc None nếu không có bản ghi;
+                id chỉ liên tiếp trong cùng một tháng
+        """
+        now = datetime.now()
+        records = iter(records)
+        first_id = last_id = None
+
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+
+            groups = {}
+            for record in chunk:
+                # Cố định thời điểm để bản ghi nằm đúng phân vùng của nó
+                analysis = _batch_analysis(record)
+                analysis = dict(analysis, dt=analysis.get('dt') or now)
+                groups.setdefault((analysis['dt'].year, analysis['dt'].month), []).append(analysis)
+
+            for (year, month), group in groups.items():
+                id_range = self._partition(year, month).record_analyses_batch(group, chunk_size)
+                if id_range is None:
+                    continue
+                first_id = id_range[0] if first_id is None else min(first_id, id_range[0])
+                last_id = id_range[1] if last_id is None else max(last_id, id_range[1])
+
+        if first_id is None:
+            return None
+        return first_id, last_id
+
+    def get_analysis_by_date(self, year, month=None, day=None):
+        """Lấy lịch sử phân tích theo năm/tháng/ngày, chỉ đọc các phân vùng liên quan"""
+        records = []
+        for extractor in self._select_partitions(year, month):
+            records.extend(extractor.get_analysis_by_date(year, month, day))
+        return _sort_newest_first(records)
+
+    def get_analysis_by_time_range(self, start_hour, end_hour, year=None, month=None, day=None):
+        """Lấy lịch sử phân tích trong khoảng giờ, chỉ đọc các phân vùng liên quan"""
+        records = []
+        for extractor in self._select_partitions(year, month):
+            records.extend(extractor.get_analysis_by_time_range(start_hour, end_hour,
+                                                                year, month, day))
+        return _sort_newest_first(records)
+
+    def get_analysis_between(self, start, end, limit=None):
+        """Lấy lịch sử phân tích trong khoảng [start, end), chỉ đọc các tháng giao với khoảng này"""
+        records = []
+        for year, month in self.list_partitions():
+            month_start = datetime(year, month, 1)
+            month_end = datetime(year + month // 12, month % 12 + 1, 1)
+            if month_end <= _local(start) or month_start >= _local(end):
+                continue
+            extractor = self._partition(year, month, create=False)
+            if extractor is not None:
+                records.extend(extractor.get_analysis_between(start, end, limit))
+        records = sorted(records, key=lambda record: (record['epoch_ms'], record['id']), reverse=True)
+        return records if limit is None else records[:limit]
+
+    def get_statistics_by_date(self, year, month=None, day=None):
+        """Lấy thống kê theo ngày/tháng/năm, gộp bảng tổng hợp của các phân vùng liên quan"""
+        groups = []
+        for extractor in self._select_partitions(year, month):
+            groups.extend(extractor._statistics_groups(year, month, day))
+        return _format_statistics(groups)
+
+    def get_hourly_statistics(self, year, month, day):
+        """Lấy thống kê theo từng giờ trong ngày (chỉ đọc phân vùng của tháng đó)"""
+        groups = []
+        for extractor in self._select_partitions(year, month):
+            groups.extend(extractor._hourly_statistics_groups(year, month, day))
+        return _format_hourly_statistics(groups)
+
+    def rebuild_rollups(self):
+        """Tính lại bảng tổng hợp của mọi phân vùng, trả về tổng số bucket"""
+        return sum(extractor.rebuild_rollups() for extractor in self._select_partitions())
+
+    def iter_history(self, year=None, month=None, day=None, chunk_size=None):
+        """Duyệt lịch sử phân tích theo từng phân vùng, tháng mới nhất trước"""
+        options = {} if chunk_size is None else {'chunk_size': chunk_size}
+        return chain.from_iterable(
+            extractor.iter_history(year, month, day, **options)
+            for extractor in self._select_partitions(year, month)
+        )
+
+    def export_history_to_json(self, output_path='analysis_history.json',
+                               year=None, month=None, day=None):
+        """Xuất lịch sử phân tích ra file JSON (giống TimeExtractor)"""
+        records = list(self.iter_history(year, month, day))
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, indent=2, ensure_ascii=False)
+        return output_path
+
+    def get_all_history(self, limit=100, cursor=None, since_id=None):
+        """Lấy các bản ghi mới nhất (giống TimeExtractor), chỉ đọc các phân vùng gần nhất cần thiết"""
+        records = []
+        extractors = []
+        for year, month in self.list_partitions():
+            # Mọi id của một tháng nhỏ hơn khoảng id của tháng kế tiếp
+            next_month_base = partition_id_base(year + month // 12, month % 12 + 1)
+            if since_id is not None and since_id >= next_month_base:
+                break
+            extractor = self._partition(year, month, create=False)
+            if extractor is not None:
+                extractors.append(extractor)
+
+        if since_id is not None:
+            # limit bản ghi có id nhỏ nhất sau since_id (giống TimeExtractor); id của bản ghi
+            # tách từ cơ sở dữ liệu cũ không theo khoảng id của tháng nên gộp mọi phân vùng
+            for extractor in extractors:
+                records.extend(extractor.get_all_history(limit, since_id=since_id))
+            return _sort_newest_first(sorted(records, key=lambda record: record['id'])[:limit])
+
+        for index, extractor in enumerate(extractors):
+            records.extend(extractor.get_all_history(limit, cursor))
+            if len(records) >= limit:
+                # timestamp là giờ UTC còn phân vùng theo giờ địa phương: đọc thêm
+                # tháng liền trước để không bỏ sót bản ghi ở ranh giới hai tháng
+                if index + 1 < len(extractors):
+                    records.extend(extractors[index + 1].get_all_history(limit, cursor))
+                break
+        return _sort_newest_first(records)[:limit]
+
+    def clear_old_records(self, days_old=30):
+        """
+        Xóa các bản ghi cũ hơn số ngày chỉ định: các tháng đã hết hạn hoàn toàn bị xóa
+        nguyên file, chỉ tháng chứa mốc cắt cần DELETE
+
+        Returns:
+            int: Số bản ghi đã xóa
+        """
+        cutoff = datetime.now() - timedelta(days=days_old)
+        deleted_count = 0
+        for year, month in self.list_partitions():
+            if (year, month) < (cutoff.year, cutoff.month):
+                deleted_count += self._drop_partition(year, month)
+            elif (year, month) == (cutoff.year, cutoff.month):
+                deleted_count += self._partition(year, month).clear_old_records(days_old)
+        return deleted_count
+
+    def close(self):
+        """Đóng kết nối của mọi phân vùng đang mở"""
+        with self._lock:
+            extractors = list(self._partitions.values())
+        for extractor in extractors:
+            extractor.close()
+
+def split_history(source_path, partition_dir, chunk_size=BATCH_CHUNK_SIZE):
+    """
+    Tách một analysis_history.db thành các phân vùng tháng, giữ nguyên id và timestamp.
+    Chạy lại nhiều lần được (bản ghi đã có trong phân vùng được bỏ qua)
+
+    Args:
+        source_path: Cơ sở dữ liệu nguồn (được nâng cấp schema trước khi tách)
+        partition_dir: Thư mục đích của PartitionedTimeExtractor
+        chunk_size: Số bản ghi đọc và ghi mỗi lần
+
+    Returns:
+        dict: Số bản ghi đã đọc cho mỗi tháng {(year, month): count}
+    """
+    # Nâng cấp nguồn lên schema mới nhất để cột khớp với phân vùng
+    TimeExtractor(source_path).close()
+    target = PartitionedTimeExtractor(partition_dir)
+    counts = {}
+
+    conn = sqlite3.connect(source_path)
+    try:
+        cursor = conn.execute("SELECT * FROM analysis_history ORDER BY id")
+        columns = [description[0] for description in cursor.description]
+        year_index, month_index = columns.index('year'), columns.index('month')
+        insert = (f"INSERT OR IGNORE INTO analysis_history ({', '.join(columns)}) "
+                  f"VALUES ({', '.join('?' * len(columns))})")
+
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            groups = {}
+            for row in rows:
+                if row[year_index] is None or row[month_index] is None:
+                    logger.warning(f"Skipping history record without date (id={row[0]})")
+                    continue
+                groups.setdefault((row[year_index], row[month_index]), []).append(row)
+
+            for (year, month), group in groups.items():
+                extractor = target._partition(year, month)
+                with extractor._connection() as partition_conn:
+                    partition_conn.executemany(insert, group)
+                    partition_conn.commit()
+                counts[(year, month)] = counts.get((year, month), 0) + len(group)
+    finally:
+        conn.close()
+
+    # Bảng tổng hợp được tính lại một lần cho mỗi phân vùng thay vì theo từng chunk
+    for year, month in counts:
+        target._partition(year, month).rebuild_rollups()
+    target.close()
+    return counts
+
+def _seed_id_sequence(extractor, year, month):
+    """Đặt bộ đếm AUTOINCREMENT của phân vùng vào khoảng id riêng của tháng"""
+    base = partition_id_base(year, month)
+    with extractor._connection() as conn:
+        updated = conn.execute(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'analysis_history'",
+            [base]
+        ).rowcount
+        if not updated:
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('analysis_history', ?)",
+                         [base])
+        conn.commit()
+
+def _local(dt):
+    """datetime giờ địa phương không có múi giờ, để so sánh với ranh giới tháng của phân vùng"""
+    return dt.astimezone().replace(tzinfo=None) if dt.tzinfo is not None else dt
+
+def _sort_newest_first(records):
+    """Sắp xếp bản ghi từ nhiều phân vùng theo timestamp giảm dần (giống ORDER BY timestamp DESC)"""
+    return sorted(records, key=lambda record: (record['timestamp'] or '', record['id']), reverse=True)
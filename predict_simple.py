@@ -1,29 +1,67 @@
-import tensorflow as tf
 import numpy as np
 from PIL import Image
+import io
 import os
 import datetime
 import logging
+import threading
 import time
 from time_extractor import TimeExtractor
+from batch_scheduler import MicroBatchScheduler
 
 # Cấu hình logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Kích thước batch được chạy thử khi khởi tạo để tránh trễ ở request đầu tiên
+WARMUP_BATCH_SIZES = (1, 8, 32)
+
+# Chế độ tiền xử lý: 'quality' giải mã đầy đủ + LANCZOS,
+# 'fast' giải mã JPEG thu nhỏ (DCT) + bộ lọc rẻ hơn
+PREPROCESS_MODES = ('quality', 'fast')
+DEFAULT_RESAMPLE = {
+    'quality': Image.Resampling.LANCZOS,
+    'fast': Image.Resampling.BILINEAR
+}
+
 class WeatherPredictor:
-    def __init__(self, model_path, data_dir='data'):
-        """Khởi tạo model dự đoán"""
+    def __init__(self, model_path, data_dir='data', warmup_batch_sizes=WARMUP_BATCH_SIZES,
+                 cache=None, preprocess_mode='quality', resample=None, inference_pool=None,
+                 lazy_load=False, history_writer=None, time_extractor=None):
+        """
+        Khởi tạo model dự đoán
+        
+        Args:
+            model_path: Đường dẫn file checkpoint .h5
+            data_dir: Thư mục dữ liệu dùng để lấy tên các lớp
+            warmup_batch_sizes: Các kích thước batch chạy thử khi tải model
+            cache: PredictionCache (tùy chọn) để dùng lại kết quả cho ảnh trùng lặp
+            preprocess_mode: 'quality' (mặc định) hoặc 'fast'
+            resample: Bộ lọc resize của PIL hoặc tên ('bilinear', 'bicubic', ...),
+                mặc định theo preprocess_mode
+            inference_pool: InferencePool (tùy chọn); khi có, forward pass chạy trên
+                các process worker và process hiện tại không tải model
+            lazy_load: Không tải model (và TensorFlow) trong __init__; model được tải
+                ở lần suy luận đầu tiên hoặc bởi load_in_background()
+            history_writer: HistoryWriter (tùy chọn) để ghi lịch sử bất đồng bộ,
+                không chặn việc trả kết quả dự đoán
+            time_extractor: TimeExtractor (hoặc PartitionedTimeExtractor) dùng để ghi
+                lịch sử, mặc định TimeExtractor() với cơ sở dữ liệu mặc định
+        """
         try:
-            # Khởi tạo time extractor
-            self.time_extractor = TimeExtractor()
+            self.set_preprocessing(preprocess_mode, resample)
             
-            # Kiểm tra và tải model
-            if not os.path.exists(model_path):
-                raise FileNotFoundError(f"Model file not found: {model_path}")
-            
-            logger.info(f"Loading model from {model_path}")
-            self.model = tf.keras.models.load_model(model_path)
+            # Khởi tạo time extractor
+            self.time_extractor = time_extractor or TimeExtractor()
+            self.cache = cache
+            self.warmup_batch_sizes = warmup_batch_sizes
+            self.batch_scheduler = None
+            self.inference_pool = inference_pool
+            self.history_writer = history_writer
+            self.ready = threading.Event()
+            self.load_error = None
+            self._load_finished = threading.Event()
+            self._load_lock = threading.Lock()
             
             # Lấy tên classes từ thư mục data để đảm bảo thứ tự nhất quán
             if os.path.exists(data_dir):
@@ -35,98 +73,521 @@ class WeatherPredictor:
             
             # Cấu hình model
             self.img_size = 224
-            logger.info("Model initialized successfully")
+            
+            if lazy_load:
+                self._set_model_identity(model_path)
+                logger.info("Model loading deferred until first use")
+            else:
+                self.load_model(model_path)
+                self._mark_loaded()
+                logger.info("Model initialized successfully")
             
         except Exception as e:
             logger.error(f"Error initializing model: {str(e)}")
             raise
 
+    def set_preprocessing(self, preprocess_mode='quality', resample=None):
+        """Chọn chế độ tiền xử lý ('quality' hoặc 'fast') và bộ lọc resize"""
+        if preprocess_mode not in PREPROCESS_MODES:
+            raise ValueError(f"Unknown preprocess_mode: {preprocess_mode}")
+        self.preprocess_mode = preprocess_mode
+        self.resample = _resolve_resample(resample, preprocess_mode)
+
+    def _set_model_identity(self, model_path):
+        """Kiểm tra file checkpoint và ghi nhận định danh của nó"""
+        # Kiểm tra file model
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+        
+        stat = os.stat(model_path)
+        self.model_path = model_path
+        # Định danh checkpoint, là một phần của khóa cache
+        self.model_id = f"{os.path.abspath(model_path)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+    def load_model(self, model_path):
+        """Tải checkpoint, tạo hàm suy luận và warm up"""
+        self._set_model_identity(model_path)
+        
+        if self.inference_pool is not None:
+            # Model được tải trong các process worker của pool
+            self.model = None
+            self._infer_fn = None
+            if self.inference_pool.model_path != model_path:
+                self.inference_pool.reload(model_path)
+            self.inference_pool.wait_ready(self.inference_pool.ready_timeout)
+            return
+        
+        # Import TensorFlow tại đây để module có thể import nhanh khi chưa cần model
+        import tensorflow as tf
+        
+        logger.info(f"Loading model from {model_path}")
+        self.model = tf.keras.models.load_model(model_path)
+        
+        # Hàm suy luận đã biên dịch, thay cho model.predict ở mỗi lần gọi
+        self._infer_fn = self._build_inference_function()
+        self.warmup(self.warmup_batch_sizes)
+
+    def _mark_loaded(self):
+        """Đánh dấu model đã sẵn sàng"""
+        self.load_error = None
+        self.ready.set()
+        self._load_finished.set()
+
+    def ensure_loaded(self):
+        """Tải model nếu chưa tải (an toàn khi gọi từ nhiều thread)"""
+        if self.ready.is_set():
+            return
+        with self._load_lock:
+            if self.ready.is_set():
+                return
+            try:
+                self.load_model(self.model_path)
+            except Exception as e:
+                self.load_error = e
+                self._load_finished.set()
+                raise
+            self._mark_loaded()
+            logger.info("Model initialized successfully")
+
+    def load_in_background(self):
+        """
+        Tải model trong thread nền; dùng ready / wait_until_ready() để chờ
+        
+        Returns:
+            threading.Thread: Thread đang tải model
+        """
+        def load():
+            try:
+                self.ensure_loaded()
+            except Exception as e:
+                logger.error(f"Error loading model in background: {str(e)}")
+        
+        thread = threading.Thread(target=load, name='model-loader', daemon=True)
+        thread.start()
+        return thread
+
+    def wait_until_ready(self, timeout=None):
+        """
+        Chờ model tải xong
+        
+        Returns:
+            bool: True nếu model sẵn sàng, False nếu hết thời gian chờ hoặc tải lỗi
+        """
+        self._load_finished.wait(timeout)
+        return self.ready.is_set()
+
+    def reload_model(self, model_path=None):
+        """Tải lại model (mặc định cùng đường dẫn) và làm mất hiệu lực cache"""
+        if self.inference_pool is not None and model_path in (None, self.model_path):
+            self.inference_pool.reload()
+        with self._load_lock:
+            self.load_model(model_path or self.model_path)
+            self._mark_loaded()
+        if self.cache is not None:
+            self.cache.clear()
+            logger.info("Prediction cache invalidated after model reload")
+
+    def _build_inference_function(self):
+        """Tạo tf.function với input signature cố định cho forward pass"""
+        import tensorflow as tf
+        
+        model = self.model
+        
+        @tf.function(input_signature=[
+            tf.TensorSpec(shape=(None, self.img_size, self.img_size, 3), dtype=tf.float32)
+        ])
+        def infer(images):
+            return model(images, training=False)
+        
+        return infer
+
+    def warmup(self, batch_sizes=WARMUP_BATCH_SIZES):
+        """Chạy thử hàm suy luận với batch giả để trace và cấp phát trước"""
+        for batch_size in batch_sizes or ():
+            dummy = np.zeros((batch_size, self.img_size, self.img_size, 3), dtype=np.float32)
+            self._infer_fn(dummy)
+        if batch_sizes:
+            logger.info(f"Inference function warmed up for batch sizes {tuple(batch_sizes)}")
+
+    def infer(self, batch):
+        """
+        Chạy một forward pass trên batch đã tiền xử lý
+        
+        Args:
+            batch: Mảng float32 kích thước (N, img_size, img_size, 3)
+            
+        Returns:
+            np.ndarray: Đầu ra của model kích thước (N, số lớp)
+        """
+        self.ensure_loaded()
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        if self.inference_pool is not None:
+            return self.inference_pool.infer(batch)
+        return self._infer_fn(batch).numpy()
+
+    def start_micro_batching(self, max_batch_size=32, max_wait_ms=5):
+        """
+        Bật micro-batching: các request đồng thời được gom thành một forward pass
+        
+        Args:
+            max_batch_size: Số ảnh tối đa trong một batch
+            max_wait_ms: Thời gian tối đa chờ gom thêm ảnh (ms)
+            
+        Returns:
+            MicroBatchScheduler: Scheduler đang chạy
+        """
+        self.stop_micro_batching()
+        self.batch_scheduler = MicroBatchScheduler(
+            self.infer, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        self.batch_scheduler.start()
+        return self.batch_scheduler
+
+    def stop_micro_batching(self):
+        """Tắt micro-batching, quay lại suy luận trực tiếp"""
+        if self.batch_scheduler is not None:
+            self.batch_scheduler.stop()
+            self.batch_scheduler = None
+
+    def _infer_single(self, processed_image):
+        """Suy luận một ảnh (1, H, W, 3), qua micro-batching nếu đã bật"""
+        if self.inference_pool is not None:
+            # Các worker của pool tự gom batch
+            return self.inference_pool.submit(processed_image[0]).result()[np.newaxis, ...]
+        scheduler = self.batch_scheduler
+        if scheduler is not None:
+            return scheduler.predict(processed_image[0])[np.newaxis, ...]
+        return self.infer(processed_image)
+
+    def _load_image(self, image_path):
+        """Đọc ảnh từ đĩa và chuyển sang RGB"""
+        # Kiểm tra file tồn tại
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"Image file not found: {image_path}")
+
+        # Đọc và kiểm tra ảnh
+        img = Image.open(image_path)
+        if img is None:
+            raise ValueError("Failed to load image")
+
+        return self._to_rgb(img)
+
+    def _decode_stream(self, stream):
+        """Giải mã ảnh trực tiếp từ stream/BytesIO, không ghi ra đĩa"""
+        # PIL cần stream có thể seek; stream mạng được đọc vào bộ nhớ
+        if not (hasattr(stream, 'seekable') and stream.seekable()):
+            stream = io.BytesIO(stream.read())
+        img = Image.open(stream)
+        return self._to_rgb(img)
+
+    def _to_rgb(self, img):
+        """Giải mã ảnh đã mở và chuyển sang RGB"""
+        if self.preprocess_mode == 'fast':
+            # JPEG: giải mã ở tỉ lệ 1/2, 1/4 hoặc 1/8 nhưng vẫn >= kích thước đích
+            img.draft('RGB', (self.img_size, self.img_size))
+
+        # Chuyển đổi sang RGB
+        return img.convert('RGB')
+
+    def _image_to_array(self, img):
+        """Resize ảnh PIL và chuyển thành mảng float32 đã chuẩn hóa (H, W, 3)"""
+        size = (self.img_size, self.img_size)
+        if self.preprocess_mode == 'fast':
+            # Thu nhỏ bằng box filter trước, rồi mới dùng bộ lọc cuối
+            img = img.resize(size, self.resample, reducing_gap=3.0)
+        else:
+            # Resize với chất lượng cao
+            img = img.resize(size, self.resample)
+
+        # Chuyển đổi sang array và chuẩn hóa
+        img_array = np.asarray(img, dtype=np.float32)
+        return img_array / 255.0
+
+    def _item_to_array(self, item):
+        """
+        Chuyển một phần tử đầu vào của predict_batch thành mảng (H, W, 3)
+
+        Chấp nhận đường dẫn ảnh, mảng float đã tiền xử lý đúng kích thước
+        (giá trị trong [0, 1]) hoặc mảng ảnh RGB uint8 bất kỳ kích thước.
+        Mảng float khác kích thước bị từ chối: không đoán được thang giá trị
+        ([0, 1] hay [0, 255]) để chuyển sang ảnh.
+        """
+        if isinstance(item, (str, os.PathLike)):
+            return self._image_to_array(self._load_image(item))
+
+        array = np.asarray(item)
+        expected_shape = (self.img_size, self.img_size, 3)
+        if array.dtype != np.uint8 and array.shape == expected_shape:
+            return array.astype(np.float32, copy=False)
+        if array.ndim != 3 or array.shape[-1] != 3:
+            raise ValueError(f"Expected an RGB image array, got shape {array.shape}")
+        if array.dtype != np.uint8:
+            raise ValueError(f"Float image arrays must already be preprocessed to shape "
+                             f"{expected_shape} with values in [0, 1], got shape {array.shape}; "
+                             f"pass uint8 RGB arrays for other sizes")
+        img = Image.fromarray(array, mode='RGB')
+        return self._image_to_array(img)
+
     def preprocess_image(self, image_path):
         """Tiền xử lý ảnh đầu vào"""
         try:
-            # Kiểm tra file tồn tại
-            if not os.path.exists(image_path):
-                raise FileNotFoundError(f"Image file not found: {image_path}")
-
-            # Đọc và kiểm tra ảnh
-            img = Image.open(image_path)
-            if img is None:
-                raise ValueError("Failed to load image")
-                
-            # Chuyển đổi sang RGB
-            img = img.convert('RGB')
-            
-            # Resize với chất lượng cao
-            img = img.resize((self.img_size, self.img_size), Image.Resampling.LANCZOS)
-            
-            # Chuyển đổi sang array và chuẩn hóa
-            img_array = tf.keras.preprocessing.image.img_to_array(img)
-            img_array = tf.expand_dims(img_array, 0)
-            img_array = img_array / 255.0
-            
-            return img_array
+            img_array = self._image_to_array(self._load_image(image_path))
+            return img_array[np.newaxis, ...]
             
         except Exception as e:
             raise Exception(f"Error preprocessing image: {str(e)}")
 
+    def preprocess_stream(self, stream):
+        """Tiền xử lý ảnh đọc từ stream (file upload, BytesIO)"""
+        try:
+            img_array = self._image_to_array(self._decode_stream(stream))
+            return img_array[np.newaxis, ...]
+
+        except Exception as e:
+            raise Exception(f"Error preprocessing image: {str(e)}")
+
+    def preprocess_batch(self, paths_or_arrays):
+        """
+        Tiền xử lý nhiều ảnh vào một batch NumPy liên tục
+
+        Args:
+            paths_or_arrays: Danh sách đường dẫn ảnh hoặc mảng ảnh
+
+        Returns:
+            np.ndarray: Mảng float32 kích thước (N, img_size, img_size, 3)
+        """
+        batch = np.empty((len(paths_or_arrays), self.img_size, self.img_size, 3),
+                         dtype=np.float32)
+        for i, item in enumerate(paths_or_arrays):
+            try:
+                batch[i] = self._item_to_array(item)
+            except Exception as e:
+                raise Exception(f"Error preprocessing image #{i}: {str(e)}")
+        return batch
+
+    def _build_result(self, scores, duration, time_components=None):
+        """Tạo dict kết quả từ đầu ra của model cho một ảnh"""
+        # Chuẩn hóa độ tin cậy bằng softmax
+        confidences = _softmax(scores)
+        predicted_class_index = int(np.argmax(confidences))
+        confidence = float(confidences[predicted_class_index])
+
+        # Tính toán độ tin cậy cho từng lớp
+        class_confidences = {class_name: float(conf)
+                             for class_name, conf in zip(self.class_names, confidences)}
+
+        return {
+            'class': self.class_names[predicted_class_index],
+            'confidence': confidence,
+            'confidences': class_confidences,
+            'timestamp': datetime.datetime.now().isoformat(),
+            'duration': duration,
+            'time_components': time_components or self.time_extractor.extract_time_components(),
+            'cached': False
+        }
+
+    def _predict_processed(self, processed_image, image_name, start_time, record_history):
+        """Dự đoán từ ảnh đã tiền xử lý và ghi lịch sử nếu cần"""
+        # Dự đoán bằng hàm suy luận đã biên dịch
+        predictions = self._infer_single(processed_image)
+        
+        # Tính thời gian xử lý
+        duration = time.time() - start_time
+        result = self._build_result(predictions[0], duration)
+        confidence = result['confidence']
+        
+        # In thông tin debug
+        print(f"Debug - all confidences: {result['confidences']}")
+        
+        # Kiểm tra độ tin cậy
+        if confidence < 0.4:
+            print(f"Warning: Low confidence prediction ({confidence:.2%})")
+        
+        # Ghi lại lịch sử phân tích nếu được yêu cầu
+        if record_history:
+            self._record_history(result, image_name)
+        
+        # Trả về kết quả với thông tin chi tiết
+        return result
+
+    def _record_history(self, result, image_name):
+        """
+        Ghi kết quả dự đoán vào lịch sử phân tích
+        
+        Returns:
+            dict hoặc Future: Bản ghi đã ghi, hoặc Future của nó khi ghi bất đồng bộ
+        """
+        if self.history_writer is not None:
+            return self.history_writer.submit(
+                image_name=image_name,
+                prediction=result['class'],
+                confidence=result['confidence'],
+                duration=result['duration'],
+                notes=None,
+                from_cache=result.get('cached', False),
+                callback=lambda record: logger.info(f"Analysis recorded: ID={record['id']}")
+            )
+        
+        analysis_record = self.time_extractor.record_analysis(
+            image_name=image_name,
+            prediction=result['class'],
+            confidence=result['confidence'],
+            duration=result['duration'],
+            notes=None,
+            from_cache=result.get('cached', False)
+        )
+        logger.info(f"Analysis recorded: ID={analysis_record['id']}")
+        return analysis_record
+
+    def _predict_cached(self, data, image_name, start_time, record_history):
+        """Dự đoán từ bytes gốc của ảnh, dùng lại kết quả trong cache nếu có"""
+        # Cấu hình tiền xử lý ảnh hưởng tới kết quả nên cũng là một phần của khóa
+        key = self.cache.make_key(
+            data, f"{self.model_id}:{self.preprocess_mode}:{int(self.resample)}")
+        cached_result = self.cache.get(key)
+        
+        if cached_result is not None:
+            duration = time.time() - start_time
+            result = dict(
+                cached_result,
+                timestamp=datetime.datetime.now().isoformat(),
+                duration=duration,
+                time_components=self.time_extractor.extract_time_components(),
+                cached=True
+            )
+            if record_history:
+                self._record_history(result, image_name)
+            return result
+        
+        processed_image = self.preprocess_stream(io.BytesIO(data))
+        result = self._predict_processed(processed_image, image_name,
+                                         start_time, record_history)
+        self.cache.put(key, result)
+        return result
+
     def predict(self, image_path, record_history=True):
         """Dự đoán thời tiết từ ảnh"""
         try:
             start_time = time.time()
+            image_name = os.path.basename(image_path)
+            
+            if self.cache is not None:
+                with open(image_path, 'rb') as f:
+                    data = f.read()
+                return self._predict_cached(data, image_name, start_time, record_history)
             
             # Tiền xử lý ảnh
             processed_image = self.preprocess_image(image_path)
             
-            # Dự đoán với timeout
-            predictions = self.model.predict(processed_image, verbose=0)
-            
-            # Lấy kết quả và độ tin cậy
-            predicted_class_index = np.argmax(predictions[0])
-            confidences = predictions[0]
-            
-            # Chuẩn hóa độ tin cậy bằng softmax
-            confidences = tf.nn.softmax(confidences).numpy()
-            confidence = float(confidences[predicted_class_index])
-            
-            # Tính toán độ tin cậy cho từng lớp
-            class_confidences = {class_name: float(conf) 
-                               for class_name, conf in zip(self.class_names, confidences)}
+            return self._predict_processed(processed_image, image_name,
+                                           start_time, record_history)
             
-            # In thông tin debug
-            print(f"Debug - all confidences: {class_confidences}")
-            
-            # Kiểm tra độ tin cậy
-            if confidence < 0.4:
-                print(f"Warning: Low confidence prediction ({confidence:.2%})")
-            
-            # Tính thời gian xử lý
-            duration = time.time() - start_time
+        except Exception as e:
+            raise Exception(f"Error during prediction: {str(e)}")
+
+    def predict_stream(self, stream, image_name='upload', record_history=True):
+        """
+        Dự đoán thời tiết từ stream ảnh (ví dụ request.files['file'].stream)
+        
+        Args:
+            stream: File-like object chứa dữ liệu ảnh
+            image_name: Tên ảnh dùng khi ghi lịch sử
+            record_history: Ghi lịch sử phân tích
             
-            # Ghi lại lịch sử phân tích nếu được yêu cầu
-            prediction_class = self.class_names[predicted_class_index]
-            if record_history:
-                analysis_record = self.time_extractor.record_analysis(
-                    image_name=os.path.basename(image_path),
-                    prediction=prediction_class,
-                    confidence=confidence,
-                    duration=duration,
-                    notes=None
-                )
-                logger.info(f"Analysis recorded: ID={analysis_record['id']}")
+        Returns:
+            dict: Kết quả dự đoán, cùng định dạng với predict()
+        """
+        try:
+            start_time = time.time()
+            if self.cache is not None:
+                return self._predict_cached(stream.read(), image_name,
+                                            start_time, record_history)
             
-            # Trả về kết quả với thông tin chi tiết
-            return {
-                'class': prediction_class,
-                'confidence': confidence,
-                'confidences': class_confidences,
-                'timestamp': datetime.datetime.now().isoformat(),
-                'duration': duration,
-                'time_components': self.time_extractor.extract_time_components()
-            }
+            processed_image = self.preprocess_stream(stream)
+            return self._predict_processed(processed_image, image_name,
+                                           start_time, record_history)
             
         except Exception as e:
             raise Exception(f"Error during prediction: {str(e)}")
 
+    def predict_bytes(self, data, image_name='upload', record_history=True):
+        """Dự đoán thời tiết từ dữ liệu ảnh dạng bytes"""
+        return self.predict_stream(io.BytesIO(data), image_name=image_name,
+                                   record_history=record_history)
+
+    def predict_batch(self, paths_or_arrays, batch_size=32, record_history=True):
+        """
+        Dự đoán thời tiết cho nhiều ảnh, mỗi chunk chỉ một lần forward pass
+
+        Args:
+            paths_or_arrays: Danh sách đường dẫn ảnh hoặc mảng ảnh RGB
+            batch_size: Số ảnh tối đa trong một lần forward pass
+            record_history: Ghi lịch sử (một transaction cho cả batch)
+
+        Returns:
+            list: Danh sách dict kết quả, cùng định dạng với predict()
+        """
+        try:
+            if batch_size < 1:
+                raise ValueError("batch_size must be >= 1")
+
+            items = list(paths_or_arrays)
+            if not items:
+                return []
+
+            start_time = time.time()
+            batch = self.preprocess_batch(items)
+
+            scores = np.empty((len(items), len(self.class_names)), dtype=np.float32)
+            for start in range(0, len(items), batch_size):
+                chunk = batch[start:start + batch_size]
+                scores[start:start + len(chunk)] = self.infer(chunk)
+
+            # Thời gian xử lý được chia đều cho mỗi ảnh trong batch
+            duration = (time.time() - start_time) / len(items)
+            time_components = self.time_extractor.extract_time_components()
+            results = [self._build_result(row, duration, time_components) for row in scores]
+
+            if record_history:
+                analyses = [{
+                    'image_name': _image_name(item, i),
+                    'prediction': result['class'],
+                    'confidence': result['confidence'],
+                    'duration': duration,
+                    'notes': None,
+                    'from_cache': False
+                } for i, (item, result) in enumerate(zip(items, results))]
+                if self.history_writer is not None:
+                    self.history_writer.submit_many(analyses)
+                else:
+                    records = self.time_extractor.record_analyses(analyses)
+                    logger.info(f"Batch analysis recorded: {len(records)} rows "
+                                f"(IDs {records[0]['id']}-{records[-1]['id']})")
+
+            return results
+
+        except Exception as e:
+            raise Exception(f"Error during batch prediction: {str(e)}")
+
+def _softmax(scores):
+    """Softmax ổn định số học trên trục cuối"""
+    scores = np.asarray(scores, dtype=np.float32)
+    exps = np.exp(scores - np.max(scores, axis=-1, keepdims=True))
+    return exps / np.sum(exps, axis=-1, keepdims=True)
+
+def _resolve_resample(resample, preprocess_mode):
+    """Chuyển tên/hằng số bộ lọc resize thành Image.Resampling"""
+    if resample is None:
+        return DEFAULT_RESAMPLE[preprocess_mode]
+    if isinstance(resample, str):
+        return Image.Resampling[resample.upper()]
+    return Image.Resampling(resample)
+
+def _image_name(item, index):
+    """Tên ảnh dùng khi ghi lịch sử cho một phần tử của batch"""
+    if isinstance(item, (str, os.PathLike)):
+        return os.path.basename(item)
+    return f"array_{index}"
+
 if __name__ == "__main__":
     # Ví dụ sử dụng
     predictor = WeatherPredictor('checkpoints/simple_model_best.h5')
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+class PredictionCache:
+    """Cache kết quả dự đoán theo nội dung ảnh (LRU + TTL)"""
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024, ttl=300):
+        """
+        Khởi tạo PredictionCache
+
+        Args:
+            max_entries: Số kết quả tối đa được giữ trong cache
+            max_bytes: Dung lượng ước tính tối đa của các kết quả (byte)
+            ttl: Thời gian sống của một kết quả (giây), None để không hết hạn
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(data, model_id):
+        """
+        Tạo khóa cache từ bytes gốc của ảnh và định danh checkpoint
+
+        Args:
+            data: Bytes gốc của file ảnh
+            model_id: Chuỗi định danh model (đường dẫn, mtime, kích thước)
+
+        Returns:
+            str: Khóa SHA-256 dạng hex
+        """
+        digest = hashlib.sha256()
+        digest.update(model_id.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(data)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Lấy kết quả từ cache, trả về None nếu không có hoặc đã hết hạn"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return _copy_result(value)
+
+    def put(self, key, value):
+        """Thêm kết quả vào cache và loại bỏ các mục ít dùng nhất nếu vượt giới hạn"""
+        size = len(key) + len(json.dumps(value, ensure_ascii=False, default=str))
+        if size > self.max_bytes:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (_copy_result(value), size, expires_at)
+            self._total_bytes += size
+
+            while (len(self._entries) > self.max_entries
+                   or self._total_bytes > self.max_bytes):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def clear(self):
+        """Xóa toàn bộ cache (ví dụ khi model được tải lại)"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """
+        Thống kê hoạt động của cache
+
+        Returns:
+            dict: Số mục, dung lượng, hit/miss, tỉ lệ hit
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0
+            }
+
+    def _remove(self, key):
+        """Xóa một mục (gọi khi đang giữ lock)"""
+        _, size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+
+def _copy_result(result):
+    """Sao chép kết quả để tránh chia sẻ dict giữa các request"""
+    copied = dict(result)
+    if isinstance(copied.get('confidences'), dict):
+        copied['confidences'] = dict(copied['confidences'])
+    return copied
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+CHUẨN BỊ DỮ LIỆU TRAINING - Giải mã ảnh trong data/ một lần thành mảng uint8 memory-map
+Các script training đọc cache này với --loader memmap thay vì giải mã JPEG mỗi epoch
+Ví dụ:
+    python prepare_dataset.py
+    python prepare_dataset.py --sizes 128 --output dataset_cache
+    python train_simple.py --loader memmap
+"""
+
+import argparse
+import time
+
+from dataset_utils import DEFAULT_IMAGE_SIZES, build_dataset_cache
+
+def main():
+    parser = argparse.ArgumentParser(description='Giải mã và resize ảnh training thành cache memory-map')
+    parser.add_argument('--data-dir', default='data', help='Thư mục dữ liệu (mỗi thư mục con là một lớp)')
+    parser.add_argument('--output', default='dataset_cache', help='Thư mục cache')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_IMAGE_SIZES),
+                        help='Các kích thước ảnh (vuông) cần tạo')
+    parser.add_argument('--workers', type=int, help='Số thread giải mã (mặc định: số CPU)')
+    args = parser.parse_args()
+
+    def progress(done, total):
+        print(f"  {done:,}/{total:,} ảnh")
+
+    start = time.perf_counter()
+    index = build_dataset_cache(args.data_dir, args.output, args.sizes, args.workers, progress)
+    print(f"✅ Đã ghi {len(index['filenames']):,} ảnh ({', '.join(index['class_names'])}) "
+          f"kích thước {', '.join(index['image_sizes'])} vào {args.output} "
+          f"trong {time.perf_counter() - start:.2f}s")
+
+if __name__ == '__main__':
+    main()
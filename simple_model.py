@@ -2,21 +2,55 @@ import tensorflow as tf
 from tensorflow.keras import layers, models
 import matplotlib.pyplot as plt
 
-def create_model(input_shape=(224, 224, 3), num_classes=3):
-    """Tạo mô hình CNN đơn giản cho phân loại thời tiết"""
+# Các kiến trúc chọn được theo tên trong create_model
+ARCHITECTURES = ('baseline', 'gap', 'separable')
+
+def scaled_filters(filters, width_multiplier, divisor=8):
+    """Số filter sau khi nhân width_multiplier, làm tròn tới bội số của divisor (như MobileNet)"""
+    scaled = max(divisor, int(filters * width_multiplier + divisor / 2) // divisor * divisor)
+    # Không giảm quá 10% so với giá trị mong muốn do làm tròn
+    if scaled < 0.9 * filters * width_multiplier:
+        scaled += divisor
+    return scaled
+
+def create_model(input_shape=(224, 224, 3), num_classes=3, architecture='baseline', width_multiplier=1.0):
+    """
+    Tạo mô hình CNN cho phân loại thời tiết
+
+    Args:
+        input_shape: Kích thước ảnh đầu vào (cao, rộng, kênh)
+        num_classes: Số lớp
+        architecture: 'baseline' (3 block Conv2D + Flatten + Dense(128)), 'gap' (cùng các block
+            Conv2D nhưng GlobalAveragePooling2D thay cho Flatten + Dense) hoặc 'separable'
+            (block depthwise-separable kiểu MobileNet + GlobalAveragePooling2D)
+        width_multiplier: Hệ số nhân số filter của các lớp tích chập
+
+    Returns:
+        tf.keras.Model: Model chưa compile
+    """
+    if architecture == 'baseline':
+        return _baseline_model(input_shape, num_classes, width_multiplier)
+    if architecture == 'gap':
+        return _gap_model(input_shape, num_classes, width_multiplier)
+    if architecture == 'separable':
+        return _separable_model(input_shape, num_classes, width_multiplier)
+    raise ValueError(f"Unknown architecture: {architecture} (expected {', '.join(ARCHITECTURES)})")
+
+def _baseline_model(input_shape, num_classes, width_multiplier):
+    """Mô hình CNN đơn giản, phần lớn tham số nằm ở lớp Dense sau Flatten"""
     model = models.Sequential([
         # Block 1
-        layers.Conv2D(32, (3, 3), activation='relu', input_shape=input_shape),
+        layers.Conv2D(scaled_filters(32, width_multiplier), (3, 3), activation='relu', input_shape=input_shape),
         layers.MaxPooling2D((2, 2)),
         layers.BatchNormalization(),
         
         # Block 2
-        layers.Conv2D(64, (3, 3), activation='relu'),
+        layers.Conv2D(scaled_filters(64, width_multiplier), (3, 3), activation='relu'),
         layers.MaxPooling2D((2, 2)),
         layers.BatchNormalization(),
         
         # Block 3
-        layers.Conv2D(128, (3, 3), activation='relu'),
+        layers.Conv2D(scaled_filters(128, width_multiplier), (3, 3), activation='relu'),
         layers.MaxPooling2D((2, 2)),
         layers.BatchNormalization(),
         
@@ -29,6 +63,41 @@ def create_model(input_shape=(224, 224, 3), num_classes=3):
     
     return model
 
+def _gap_model(input_shape, num_classes, width_multiplier):
+    """Các block Conv2D của baseline, head GlobalAveragePooling2D: số tham số không phụ thuộc kích thước ảnh"""
+    model = models.Sequential([layers.Input(shape=input_shape)])
+    for filters in (32, 64, 128):
+        model.add(layers.Conv2D(scaled_filters(filters, width_multiplier), (3, 3), activation='relu'))
+        model.add(layers.MaxPooling2D((2, 2)))
+        model.add(layers.BatchNormalization())
+    model.add(layers.GlobalAveragePooling2D())
+    model.add(layers.Dropout(0.5))
+    model.add(layers.Dense(num_classes, activation='softmax'))
+    return model
+
+# (số filter, stride) của các block depthwise-separable
+SEPARABLE_BLOCKS = ((64, 1), (128, 2), (128, 1), (256, 2), (256, 1), (512, 2))
+
+def _separable_model(input_shape, num_classes, width_multiplier):
+    """Conv2D stride 2 rồi các block DepthwiseConv2D 3x3 + Conv2D 1x1 (như MobileNet), head GlobalAveragePooling2D"""
+    model = models.Sequential([
+        layers.Input(shape=input_shape),
+        layers.Conv2D(scaled_filters(32, width_multiplier), (3, 3), strides=2, padding='same', use_bias=False),
+        layers.BatchNormalization(),
+        layers.ReLU(6.)
+    ])
+    for filters, strides in SEPARABLE_BLOCKS:
+        model.add(layers.DepthwiseConv2D((3, 3), strides=strides, padding='same', use_bias=False))
+        model.add(layers.BatchNormalization())
+        model.add(layers.ReLU(6.))
+        model.add(layers.Conv2D(scaled_filters(filters, width_multiplier), (1, 1), use_bias=False))
+        model.add(layers.BatchNormalization())
+        model.add(layers.ReLU(6.))
+    model.add(layers.GlobalAveragePooling2D())
+    model.add(layers.Dropout(0.2))
+    model.add(layers.Dense(num_classes, activation='softmax'))
+    return model
+
 def plot_training_history(history):
     """Vẽ đồ thị lịch sử huấn luyện"""
     plt.figure(figsize=(12, 4))
@@ -0,0 +1,48 @@
+import sqlite3
+
+import pytest
+
+# Schema analysis_history gốc (trước các migration)
+BASELINE_SCHEMA = '''
+    CREATE TABLE analysis_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        year INTEGER,
+        month INTEGER,
+        day INTEGER,
+        hour INTEGER,
+        minute INTEGER,
+        second INTEGER,
+        image_name TEXT,
+        prediction TEXT,
+        confidence REAL,
+        duration REAL,
+        notes TEXT
+    )
+'''
+
+BASELINE_INSERT = (
+    "INSERT INTO analysis_history (timestamp, year, month, day, hour, minute, second, "
+    "image_name, prediction, confidence, duration, notes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+def baseline_row(timestamp, prediction='Nắng', confidence=0.9, duration=0.1, image_name='a.jpg'):
+    """Bộ tham số BASELINE_INSERT từ chuỗi timestamp 'YYYY-MM-DD HH:MM:SS'"""
+    date, time = timestamp.split(' ')
+    year, month, day = (int(part) for part in date.split('-'))
+    hour, minute, second = (int(part) for part in time.split(':'))
+    return (timestamp, year, month, day, hour, minute, second, image_name, prediction,
+            confidence, duration, None)
+
+@pytest.fixture
+def baseline_history_db(tmp_path):
+    """Tạo cơ sở dữ liệu với schema gốc và các dòng cho trước (xem baseline_row)"""
+    def create(rows, name='analysis_history.db'):
+        path = str(tmp_path / name)
+        conn = sqlite3.connect(path)
+        conn.execute(BASELINE_SCHEMA)
+        conn.executemany(BASELINE_INSERT, rows)
+        conn.commit()
+        conn.close()
+        return path
+    return create
@@ -0,0 +1,82 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from balanced_sampler import BalancedSampler, class_sampling_rates, default_steps_per_epoch, parse_sampling
+
+CLASS_NAMES = ['Mưa', 'Nắng', 'Tuyết']
+# 9 ảnh Mưa, 4 ảnh Nắng, 1 ảnh Tuyết
+LABELS = np.array([0] * 9 + [1] * 4 + [2] * 1)
+
+@pytest.mark.parametrize('strategy, expected', [
+    ('natural', [9 / 14, 4 / 14, 1 / 14]),
+    ('sqrt', [3 / 6, 2 / 6, 1 / 6]),
+    ('balanced', [1 / 3, 1 / 3, 1 / 3]),
+    ({'Mưa': 1, 'Nắng': 0.5, 'Tuyết': 0.5}, [0.5, 0.25, 0.25]),
+    ({0: 2, 2: 2}, [0.5, 0, 0.5]),
+])
+def test_class_sampling_rates(strategy, expected):
+    rates = class_sampling_rates(LABELS, strategy, CLASS_NAMES)
+    np.testing.assert_allclose(rates, expected)
+
+def test_empty_class_is_never_sampled():
+    labels = np.array([0, 0, 2])
+    np.testing.assert_allclose(class_sampling_rates(labels, 'balanced', CLASS_NAMES), [0.5, 0, 0.5])
+    with pytest.raises(ValueError):
+        class_sampling_rates(labels, {'Nắng': 1}, CLASS_NAMES)
+    with pytest.raises(ValueError):
+        class_sampling_rates(labels, 'uniform', CLASS_NAMES)
+
+def test_parse_sampling():
+    assert parse_sampling('sqrt') == 'sqrt'
+    assert parse_sampling('Mưa=1, Nắng=0.5,Tuyết=2') == {'Mưa': 1.0, 'Nắng': 0.5, 'Tuyết': 2.0}
+    with pytest.raises(ValueError):
+        parse_sampling('Mưa:1')
+
+@pytest.mark.parametrize('strategy', ['natural', 'sqrt', 'balanced', {'Mưa': 1, 'Nắng': 3, 'Tuyết': 0}])
+def test_sampler_follows_class_rates(strategy):
+    rates = class_sampling_rates(LABELS, strategy, CLASS_NAMES)
+    sampler = BalancedSampler(LABELS, np.arange(len(LABELS)), rates, seed=0)
+    samples = np.concatenate([sampler.sample(1000) for _ in range(30)])
+    frequencies = np.bincount(LABELS[samples], minlength=len(CLASS_NAMES)) / len(samples)
+    np.testing.assert_allclose(frequencies, rates, atol=0.01)
+
+def test_sampler_only_uses_given_indices():
+    indices = np.array([0, 2, 4, 9, 10, 13])
+    rates = class_sampling_rates(LABELS[indices], 'balanced', CLASS_NAMES)
+    sampler = BalancedSampler(LABELS, indices, rates, seed=1)
+    samples = sampler.sample(5000)
+    assert set(samples) == set(indices)
+
+def test_sampler_cycles_through_each_class():
+    rates = class_sampling_rates(LABELS, 'balanced', CLASS_NAMES)
+    sampler = BalancedSampler(LABELS, np.arange(len(LABELS)), rates, seed=2)
+    samples = sampler.sample(3000)
+    for label in range(len(CLASS_NAMES)):
+        members = np.flatnonzero(LABELS == label)
+        drawn = samples[LABELS[samples] == label]
+        # Mỗi lượt duyệt hết các ảnh của lớp trước khi lặp lại (không nhân bản dữ liệu)
+        for start in range(0, len(drawn) - len(members) + 1, len(members)):
+            assert sorted(drawn[start:start + len(members)]) == list(members)
+
+def test_sampler_is_deterministic_with_seed():
+    rates = class_sampling_rates(LABELS, 'sqrt', CLASS_NAMES)
+    first = BalancedSampler(LABELS, np.arange(len(LABELS)), rates, seed=42)
+    second = BalancedSampler(LABELS, np.arange(len(LABELS)), rates, seed=42)
+    for count in (7, 50, 3):
+        np.testing.assert_array_equal(first.sample(count), second.sample(count))
+    third = BalancedSampler(LABELS, np.arange(len(LABELS)), rates, seed=43)
+    assert not np.array_equal(third.sample(57), BalancedSampler(
+        LABELS, np.arange(len(LABELS)), rates, seed=42).sample(57))
+
+def test_sampler_rejects_rate_without_images():
+    with pytest.raises(ValueError):
+        BalancedSampler(LABELS, np.arange(13), [0.5, 0.25, 0.25], seed=0)
+
+def test_default_steps_per_epoch():
+    assert default_steps_per_epoch(100, 32) == 4
+    assert default_steps_per_epoch(96, 32) == 3
@@ -0,0 +1,104 @@
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_scheduler import MicroBatchScheduler
+
+def _image(value):
+    return np.full((4, 4, 3), value, dtype=np.float32)
+
+def _mean_infer(batch):
+    """Đầu ra mỗi ảnh là giá trị trung bình của nó, để kiểm tra kết quả đúng ảnh"""
+    return batch.reshape(len(batch), -1).mean(axis=1, keepdims=True)
+
+def test_concurrent_requests_are_batched():
+    release = threading.Event()
+    batch_sizes = []
+
+    def infer(batch):
+        batch_sizes.append(len(batch))
+        release.wait(5)
+        return _mean_infer(batch)
+
+    scheduler = MicroBatchScheduler(infer, max_batch_size=8, max_wait_ms=50)
+    scheduler.start()
+    try:
+        # Batch đầu giữ worker bận để các ảnh sau dồn lại trong hàng đợi
+        first = scheduler.submit(_image(0))
+        while not batch_sizes:
+            threading.Event().wait(0.001)
+        futures = [scheduler.submit(_image(i)) for i in range(1, 11)]
+        release.set()
+
+        assert first.result(5)[0] == 0
+        for i, future in enumerate(futures, start=1):
+            assert future.result(5)[0] == i
+    finally:
+        scheduler.stop()
+
+    assert batch_sizes[0] == 1
+    assert batch_sizes[1:] == [8, 2]
+    stats = scheduler.stats()
+    assert stats['items'] == 11
+    assert stats['batch_size_histogram'] == {1: 1, 2: 1, 8: 1}
+
+def test_inference_error_fails_whole_batch():
+    def infer(batch):
+        raise ValueError("boom")
+
+    scheduler = MicroBatchScheduler(infer, max_batch_size=4, max_wait_ms=1)
+    scheduler.start()
+    try:
+        with pytest.raises(ValueError):
+            scheduler.predict(_image(1))
+    finally:
+        scheduler.stop()
+
+def test_stop_drains_queue_and_rejects_new_requests():
+    scheduler = MicroBatchScheduler(_mean_infer, max_batch_size=4, max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        scheduler.submit(_image(1))
+
+    scheduler.start()
+    futures = [scheduler.submit(_image(i)) for i in range(10)]
+    scheduler.stop()
+    assert [future.result(0)[0] for future in futures] == list(range(10))
+    assert not scheduler.stats()['running']
+
+    with pytest.raises(RuntimeError):
+        scheduler.submit(_image(1))
+
+    # Khởi động lại được sau khi dừng
+    scheduler.start()
+    try:
+        assert scheduler.predict(_image(3))[0] == 3
+    finally:
+        scheduler.stop()
+
+def test_stop_fails_queued_requests_when_worker_is_stuck():
+    release = threading.Event()
+    started = threading.Event()
+
+    def infer(batch):
+        started.set()
+        release.wait(5)
+        return _mean_infer(batch)
+
+    scheduler = MicroBatchScheduler(infer, max_batch_size=1, max_wait_ms=1)
+    scheduler.start()
+    running = scheduler.submit(_image(1))
+    started.wait(5)
+    queued = [scheduler.submit(_image(i)) for i in range(3)]
+
+    scheduler.stop(timeout=0.1)
+    for future in queued:
+        with pytest.raises(RuntimeError):
+            future.result(0)
+
+    release.set()
+    assert running.result(5)[0] == 1
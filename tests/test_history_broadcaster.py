@@ -0,0 +1,110 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_broadcaster import HistoryBroadcaster
+from time_extractor import TimeExtractor
+
+@pytest.fixture
+def extractor(tmp_path):
+    extractor = TimeExtractor(str(tmp_path / 'history.db'))
+    yield extractor
+    extractor.close()
+
+def _broadcaster(extractor, **options):
+    options.setdefault('heartbeat_seconds', 0.01)
+    broadcaster = HistoryBroadcaster(extractor, **options)
+    extractor.add_listener(broadcaster.publish)
+    return broadcaster
+
+def _connect(broadcaster, last_id=None):
+    """Mở luồng và đọc sự kiện retry (client được đăng ký từ đây)"""
+    stream = broadcaster.stream(last_id)
+    assert next(stream).startswith('retry:')
+    return stream
+
+def _read_ids(stream, count, max_heartbeats=200):
+    """Đọc count sự kiện analysis (bỏ qua heartbeat), trả về các id; dừng sớm nếu chờ quá lâu"""
+    ids = []
+    heartbeats = 0
+    for event in stream:
+        if event.startswith(':'):
+            heartbeats += 1
+            if heartbeats > max_heartbeats:
+                break
+            continue
+        lines = dict(line.split(': ', 1) for line in event.strip().split('\n'))
+        assert lines['event'] == 'analysis'
+        assert json.loads(lines['data'])['id'] == int(lines['id'])
+        ids.append(int(lines['id']))
+        if len(ids) == count:
+            break
+    return ids
+
+def _record(extractor, count):
+    return [record['id'] for record in extractor.record_analyses(
+        [{'image_name': f'{i}.jpg', 'prediction': 'Mưa', 'confidence': 0.5} for i in range(count)]
+    )]
+
+def test_fan_out_to_every_subscriber(extractor):
+    broadcaster = _broadcaster(extractor)
+    streams = [_connect(broadcaster) for _ in range(3)]
+    assert broadcaster.stats()['subscribers'] == 3
+    
+    ids = _record(extractor, 2) + _record(extractor, 3)
+    ids.append(extractor.record_analysis('single.jpg', 'Nắng', 0.9)['id'])
+    
+    for stream in streams:
+        assert _read_ids(stream, len(ids)) == ids
+    assert broadcaster.stats()['published'] == len(ids)
+    
+    for stream in streams:
+        stream.close()
+    assert broadcaster.stats()['subscribers'] == 0
+
+def test_slow_subscriber_is_dropped(extractor):
+    broadcaster = _broadcaster(extractor, queue_size=2)
+    slow = _connect(broadcaster)
+    fast = _connect(broadcaster)
+    
+    ids = []
+    for _ in range(3):
+        ids += _record(extractor, 1)
+        # Client nhanh đọc kịp sau mỗi lần ghi, client chậm không đọc
+        assert _read_ids(fast, 1) == ids[-1:]
+    
+    stats = broadcaster.stats()
+    assert stats['dropped'] == 1 and stats['subscribers'] == 1
+    # Luồng bị ngắt kết thúc ngay; client kết nối lại với Last-Event-ID để nhận phần bị bỏ
+    assert list(slow) == []
+    
+    ids += _record(extractor, 1)
+    assert _read_ids(fast, 1) == ids[-1:]
+    fast.close()
+
+def test_reconnect_replays_missed_records(extractor):
+    broadcaster = _broadcaster(extractor, replay_limit=3)
+    first = _connect(broadcaster)
+    ids = _record(extractor, 2)
+    assert _read_ids(first, 2) == ids
+    first.close()
+    
+    # Bỏ lỡ nhiều hơn replay_limit bản ghi: phát lại qua nhiều trang, không trùng, không sót
+    missed = _record(extractor, 7)
+    stream = _connect(broadcaster, last_id=ids[-1])
+    assert _read_ids(stream, 7) == missed
+    
+    live = _record(extractor, 2)
+    assert _read_ids(stream, 2) == live
+    stream.close()
+
+def test_close_ends_streams(extractor):
+    broadcaster = _broadcaster(extractor)
+    stream = _connect(broadcaster)
+    broadcaster.close()
+    assert [event for event in stream if not event.startswith(':')] == []
+    assert broadcaster.stats()['closed'] and broadcaster.stats()['subscribers'] == 0
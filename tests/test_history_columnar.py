@@ -0,0 +1,46 @@
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_columnar import export_columnar, load_columnar
+
+def test_export_upgrades_pre_migration_database(tmp_path):
+    """Cơ sở dữ liệu tạo trước các migration (chưa có cột epoch_ms) vẫn xuất được"""
+    db_path = str(tmp_path / 'analysis_history.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE analysis_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            year INTEGER,
+            month INTEGER,
+            day INTEGER,
+            hour INTEGER,
+            minute INTEGER,
+            second INTEGER,
+            image_name TEXT,
+            prediction TEXT,
+            confidence REAL,
+            duration REAL,
+            notes TEXT
+        )
+    ''')
+    conn.executemany(
+        "INSERT INTO analysis_history (timestamp, year, month, day, hour, minute, second, "
+        "image_name, prediction, confidence, duration) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [('2024-03-01T08:15:00', 2024, 3, 1, 8, 15, 0, 'a.jpg', 'Nắng', 0.9, 0.1),
+         ('2024-03-02T19:30:00', 2024, 3, 2, 19, 30, 0, 'b.jpg', 'Mưa', 0.7, None)]
+    )
+    conn.commit()
+    conn.close()
+
+    schema = export_columnar(db_path, str(tmp_path / 'columnar'))
+    columns, _ = load_columnar(str(tmp_path / 'columnar'))
+
+    assert schema['rows'] == 2
+    assert list(columns['id']) == [1, 2]
+    assert list(columns['hour']) == [8, 19]
+    assert (columns['epoch_ms'] > 0).all()
+    assert schema['prediction_codes'] == ['Mưa', 'Nắng']
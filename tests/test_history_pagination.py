@@ -0,0 +1,82 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from partitioned_history import PartitionedTimeExtractor
+from time_extractor import TimeExtractor, make_history_cursor, parse_history_cursor
+
+# Nhiều bản ghi trùng timestamp, trải trên ba tháng (ba phân vùng)
+TIMES = [datetime(2024, month, 15, hour, 0) for month in (1, 2, 3) for hour in (6, 6, 6, 9, 12, 12)]
+
+@pytest.fixture(params=['single', 'partitioned'])
+def history(request, tmp_path):
+    if request.param == 'single':
+        history = TimeExtractor(str(tmp_path / 'history.db'))
+    else:
+        history = PartitionedTimeExtractor(str(tmp_path / 'partitions'))
+    history.record_analyses([{'image_name': f'{i}.jpg', 'prediction': 'Mưa', 'confidence': 0.5, 'dt': dt}
+                             for i, dt in enumerate(TIMES)])
+    yield history
+    history.close()
+
+def _add(history, count, prefix='new'):
+    return [record['id'] for record in history.record_analyses(
+        [{'image_name': f'{prefix}_{i}.jpg', 'prediction': 'Nắng', 'confidence': 0.9} for i in range(count)]
+    )]
+
+def _page_by_cursor(history, limit, on_page=None):
+    ids = []
+    cursor = None
+    while True:
+        records = history.get_all_history(limit, cursor=cursor)
+        ids.extend(record['id'] for record in records)
+        if len(records) < limit:
+            return ids
+        # Cursor đi qua dạng chuỗi giống API
+        cursor = parse_history_cursor(make_history_cursor(records[-1]))
+        if on_page is not None:
+            on_page()
+
+@pytest.mark.parametrize('limit', [1, 4, 6, 7, len(TIMES), len(TIMES) + 1])
+def test_cursor_pages_have_no_gaps_or_duplicates(history, limit):
+    expected = [record['id'] for record in history.get_all_history(1000)]
+    assert len(expected) == len(TIMES)
+    assert _page_by_cursor(history, limit) == expected
+
+def test_cursor_pages_are_stable_under_inserts(history):
+    expected = [record['id'] for record in history.get_all_history(1000)]
+    # Bản ghi mới (mới hơn mọi cursor) không làm lệch các trang cũ hơn
+    assert _page_by_cursor(history, 5, on_page=lambda: _add(history, 2)) == expected
+
+@pytest.mark.parametrize('limit', [1, 3, 10, 50])
+def test_since_id_catches_up_without_gaps(history, limit):
+    last_id = max(record['id'] for record in history.get_all_history(1000))
+    new_ids = _add(history, 10)
+    
+    received = []
+    added_later = False
+    while True:
+        records = history.get_all_history(limit, since_id=last_id)
+        assert len(records) <= limit
+        # Mỗi trang vẫn sắp xếp mới nhất trước
+        assert records == sorted(records, key=lambda record: (record['timestamp'], record['id']),
+                                 reverse=True)
+        if not records:
+            break
+        received.extend(record['id'] for record in records)
+        last_id = max(record['id'] for record in records)
+        if not added_later and len(received) >= 5:
+            # Bản ghi ghi xen giữa các lần gọi cũng được nhận
+            new_ids += _add(history, 3, prefix='later')
+            added_later = True
+    
+    assert sorted(received) == sorted(new_ids)
+    assert len(received) == len(set(received))
+
+def test_since_id_without_new_records(history):
+    last_id = max(record['id'] for record in history.get_all_history(1000))
+    assert history.get_all_history(10, since_id=last_id) == []
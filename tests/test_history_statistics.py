@@ -0,0 +1,167 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_history_queries import raw_hourly_statistics, raw_statistics
+from conftest import baseline_row
+from time_extractor import TimeExtractor
+
+# (thời điểm, prediction, confidence, duration) - gồm cả độ tin cậy 0/None và thời lượng None
+RECORDS = [
+    (datetime(2024, 5, 1, 8, 5), 'Nắng', 0.91, 0.12),
+    (datetime(2024, 5, 1, 8, 40), 'Nắng', 0.55, 0.30),
+    (datetime(2024, 5, 1, 8, 59), 'Mưa', 0.73, None),
+    (datetime(2024, 5, 1, 13, 0), 'Tuyết', 0.0, 0.05),
+    (datetime(2024, 5, 1, 23, 59), 'Mưa', None, 0.20),
+    (datetime(2024, 5, 2, 0, 1), 'Mưa', 0.66, 0.11),
+    (datetime(2024, 5, 20, 12, 30), 'Nắng', 0.99, 0.08),
+    (datetime(2024, 6, 1, 9, 0), 'Tuyết', 0.42, 0.09),
+    (datetime(2025, 5, 1, 8, 0), 'Nắng', 0.88, 0.10),
+]
+
+def baseline_statistics(records):
+    """Thống kê theo cách tính Python của phiên bản gốc (duyệt từng bản ghi)"""
+    if not records:
+        return {'total': 0, 'by_prediction': {}, 'average_confidence': 0, 'max_confidence': 0,
+                'min_confidence': 0, 'total_duration': 0, 'average_duration': 0}
+    by_prediction = {}
+    total_confidence = 0
+    total_duration = 0
+    max_conf = 0
+    min_conf = 1
+    for record in records:
+        by_prediction[record['prediction']] = by_prediction.get(record['prediction'], 0) + 1
+        if record['confidence']:
+            total_confidence += record['confidence']
+            max_conf = max(max_conf, record['confidence'])
+            min_conf = min(min_conf, record['confidence'])
+        if record['duration']:
+            total_duration += record['duration']
+    return {
+        'total': len(records),
+        'by_prediction': by_prediction,
+        'average_confidence': round(total_confidence / len(records), 4),
+        'max_confidence': round(max_conf, 4) if max_conf > 0 else 0,
+        'min_confidence': round(min_conf, 4) if min_conf < 1 else 0,
+        'total_duration': round(total_duration, 2),
+        'average_duration': round(total_duration / len(records), 4)
+    }
+
+def baseline_hourly_statistics(records):
+    """Thống kê theo giờ theo cách tính Python của phiên bản gốc"""
+    hourly_stats = {hour: {'count': 0, 'predictions': {}, 'average_confidence': 0, 'total_duration': 0}
+                    for hour in range(24)}
+    for record in records:
+        stats = hourly_stats[record['hour']]
+        stats['count'] += 1
+        stats['predictions'][record['prediction']] = stats['predictions'].get(record['prediction'], 0) + 1
+        if record['confidence']:
+            stats['average_confidence'] = (
+                (stats['average_confidence'] * (stats['count'] - 1) + record['confidence']) / stats['count']
+            )
+        if record['duration']:
+            stats['total_duration'] += record['duration']
+    return hourly_stats
+
+def assert_hourly_equal(actual, expected):
+    assert set(actual) == set(expected)
+    for hour in expected:
+        assert actual[hour]['count'] == expected[hour]['count']
+        assert actual[hour]['predictions'] == expected[hour]['predictions']
+        assert actual[hour]['average_confidence'] == pytest.approx(expected[hour]['average_confidence'])
+        assert actual[hour]['total_duration'] == pytest.approx(expected[hour]['total_duration'])
+
+@pytest.fixture
+def extractor(tmp_path):
+    extractor = TimeExtractor(str(tmp_path / 'history.db'))
+    extractor.record_analyses([
+        {'image_name': f'{i}.jpg', 'prediction': prediction, 'confidence': confidence,
+         'duration': duration, 'dt': dt}
+        for i, (dt, prediction, confidence, duration) in enumerate(RECORDS)
+    ])
+    yield extractor
+    extractor.close()
+
+DATE_FILTERS = [(2024, None, None), (2024, 5, None), (2024, 5, 1), (2024, 5, 2), (2025, None, None),
+                (2023, None, None), (2024, 7, None)]
+
+@pytest.mark.parametrize('year, month, day', DATE_FILTERS)
+def test_statistics_match_baseline(extractor, year, month, day):
+    records = extractor.get_analysis_by_date(year, month, day)
+    expected = baseline_statistics(records)
+    assert extractor.get_statistics_by_date(year, month, day) == expected
+    if day is None and month is not None:
+        # Truy vấn GROUP BY trực tiếp trên analysis_history cho cùng kết quả
+        assert raw_statistics(extractor.db_path, year, month) == expected
+
+@pytest.mark.parametrize('year, month, day', [(2024, 5, 1), (2024, 5, 2), (2024, 6, 2)])
+def test_hourly_statistics_match_baseline(extractor, year, month, day):
+    expected = baseline_hourly_statistics(extractor.get_analysis_by_date(year, month, day))
+    assert_hourly_equal(extractor.get_hourly_statistics(year, month, day), expected)
+    assert_hourly_equal(raw_hourly_statistics(extractor.db_path, year, month, day), expected)
+
+def _assert_rollups_match(extractor, year, month, day):
+    records = extractor.get_analysis_by_date(year, month, day)
+    assert extractor.get_statistics_by_date(year, month, day) == baseline_statistics(records)
+    assert_hourly_equal(extractor.get_hourly_statistics(year, month, day),
+                        baseline_hourly_statistics(records))
+
+def test_rollups_match_after_rebuild(extractor):
+    extractor.rebuild_rollups()
+    for year, month, day in DATE_FILTERS:
+        records = extractor.get_analysis_by_date(year, month, day)
+        assert extractor.get_statistics_by_date(year, month, day) == baseline_statistics(records)
+
+def test_migration_with_null_predictions(baseline_history_db):
+    # analysis_history gốc cho phép prediction NULL; migration v3 không được lỗi
+    path = baseline_history_db([
+        baseline_row('2024-05-01 08:05:00', None, 0.5, 0.1),
+        baseline_row('2024-05-01 08:10:00', 'Nắng', 0.9, 0.2),
+        baseline_row('2024-05-01 09:00:00', None, None, None),
+    ])
+    extractor = TimeExtractor(path)
+    
+    stats = extractor.get_statistics_by_date(2024, 5, 1)
+    assert stats['by_prediction'] == {None: 2, 'Nắng': 1}
+    _assert_rollups_match(extractor, 2024, 5, 1)
+    extractor.close()
+
+def test_live_inserts_with_null_prediction(extractor):
+    dt = datetime(2024, 5, 1, 8, 30)
+    extractor.record_analyses([
+        {'image_name': 'null1.jpg', 'prediction': None, 'confidence': 0.6, 'dt': dt},
+        {'image_name': 'null2.jpg', 'prediction': None, 'confidence': 0.2, 'dt': datetime(2024, 5, 1, 20, 0)},
+    ])
+    assert extractor.get_statistics_by_date(2024, 5, 1)['by_prediction'][None] == 2
+    _assert_rollups_match(extractor, 2024, 5, 1)
+    
+    record = extractor.record_analysis('null3.jpg', None, 0.35, duration=0.4)
+    today = datetime.now()
+    assert extractor.get_statistics_by_date(today.year, today.month, today.day)['by_prediction'] == {None: 1}
+    _assert_rollups_match(extractor, today.year, today.month, today.day)
+    assert record['prediction'] is None
+    
+    # Tính lại toàn bộ cho cùng kết quả với cập nhật tăng dần
+    before = extractor.get_statistics_by_date(2024)
+    extractor.rebuild_rollups()
+    assert extractor.get_statistics_by_date(2024) == before
+
+def test_rollups_follow_retention(tmp_path):
+    extractor = TimeExtractor(str(tmp_path / 'history.db'))
+    now = datetime.now().replace(microsecond=0)
+    old = now - timedelta(days=40)
+    extractor.record_analyses([
+        {'image_name': 'old.jpg', 'prediction': 'Mưa', 'confidence': 0.7, 'dt': old},
+        {'image_name': 'old_null.jpg', 'prediction': None, 'confidence': 0.4, 'dt': old},
+        {'image_name': 'new.jpg', 'prediction': 'Nắng', 'confidence': 0.9, 'dt': now},
+    ])
+    assert extractor.clear_old_records(days_old=30) == 2
+    
+    for dt in (old, now):
+        _assert_rollups_match(extractor, dt.year, dt.month, dt.day)
+    assert extractor.get_statistics_by_date(old.year, old.month, old.day)['by_prediction'].get('Mưa') is None
+    extractor.close()
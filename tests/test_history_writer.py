@@ -0,0 +1,93 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_writer import HistoryQueueFull, HistoryWriter
+from time_extractor import TimeExtractor
+
+class GatedExtractor:
+    """TimeExtractor chỉ ghi khi gate được mở, để giữ bản ghi trong hàng đợi"""
+
+    def __init__(self, extractor):
+        self.extractor = extractor
+        self.gate = threading.Event()
+        self.entered = threading.Event()
+
+    def record_analyses(self, analyses):
+        self.entered.set()
+        self.gate.wait(5)
+        return self.extractor.record_analyses(analyses)
+
+def _analysis(i):
+    return {'image_name': f'{i}.jpg', 'prediction': 'Nắng', 'confidence': 0.9,
+            'duration': 0.01, 'notes': None, 'from_cache': False}
+
+@pytest.fixture
+def extractor(tmp_path):
+    return TimeExtractor(str(tmp_path / 'history.db'))
+
+def test_flush_writes_all_records_in_batches(extractor):
+    writer = HistoryWriter(extractor, batch_size=8, max_latency_ms=50).start()
+    try:
+        callbacks = []
+        futures = writer.submit_many([_analysis(i) for i in range(20)], callback=callbacks.append)
+        assert writer.flush(timeout=5)
+        records = [future.result(0) for future in futures]
+    finally:
+        writer.close()
+
+    assert [record['image'] for record in records] == [f'{i}.jpg' for i in range(20)]
+    assert len({record['id'] for record in records}) == 20
+    assert len(callbacks) == 20
+    assert len(extractor.get_all_history(limit=100)) == 20
+    stats = writer.stats()
+    assert stats['written'] == 20
+    assert stats['batches'] >= 3
+
+def test_close_writes_pending_records_and_rejects_new_ones(extractor):
+    writer = HistoryWriter(extractor, max_latency_ms=1000).start()
+    futures = [writer.submit(f'{i}.jpg', 'Mưa', 0.5) for i in range(5)]
+    writer.close()
+    assert all(future.result(0)['id'] for future in futures)
+    with pytest.raises(RuntimeError):
+        writer.submit('late.jpg', 'Mưa', 0.5)
+
+def test_drop_policy_when_queue_is_full(extractor):
+    gated = GatedExtractor(extractor)
+    writer = HistoryWriter(gated, max_queue_size=2, batch_size=1, max_latency_ms=1,
+                           full_policy='drop').start()
+    try:
+        first = writer.submit('0.jpg', 'Nắng', 0.9)
+        gated.entered.wait(5)  # bản ghi đầu đang được ghi, hàng đợi trống
+        queued = [writer.submit(f'{i}.jpg', 'Nắng', 0.9) for i in (1, 2)]
+        dropped = writer.submit('3.jpg', 'Nắng', 0.9)
+        with pytest.raises(HistoryQueueFull):
+            dropped.result(0)
+        assert writer.stats()['dropped'] == 1
+        gated.gate.set()
+        assert writer.flush(timeout=5)
+        assert first.result(0)['id'] and all(future.result(0)['id'] for future in queued)
+    finally:
+        gated.gate.set()
+        writer.close()
+
+def test_close_fails_records_left_when_writer_is_stuck(extractor):
+    gated = GatedExtractor(extractor)
+    writer = HistoryWriter(gated, batch_size=1, max_latency_ms=1).start()
+    writer.submit('0.jpg', 'Nắng', 0.9)
+    gated.entered.wait(5)
+    pending = writer.submit('1.jpg', 'Nắng', 0.9)
+
+    # Thread ghi vẫn bận: close() trả về, không bản ghi mới nào được nhận
+    writer.close(timeout=0.1)
+    with pytest.raises(RuntimeError):
+        writer.submit('2.jpg', 'Nắng', 0.9)
+
+    # Khi thread dừng, close() lần nữa không để lại Future nào chưa hoàn thành
+    gated.gate.set()
+    writer.close()
+    assert pending.done()
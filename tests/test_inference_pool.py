@@ -0,0 +1,69 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_pool import InferencePool
+from prediction_cache import PredictionCache
+from predict_simple import WeatherPredictor
+from time_extractor import TimeExtractor
+
+IMG_SIZE = 224
+
+def _save_constant_model(path, label):
+    """Model luôn dự đoán lớp label (bỏ qua nội dung ảnh)"""
+    import tensorflow as tf
+
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(IMG_SIZE, IMG_SIZE, 3)),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(3, activation='softmax')
+    ])
+    bias = np.zeros(3, dtype=np.float32)
+    bias[label] = 10.
+    model.layers[-1].set_weights([np.zeros((3, 3), np.float32), bias])
+    model.save(str(path))
+    return str(path)
+
+@pytest.fixture
+def models(tmp_path):
+    return (_save_constant_model(tmp_path / 'first.h5', 0),
+            _save_constant_model(tmp_path / 'second.h5', 2))
+
+@pytest.fixture
+def pool(models, tmp_path):
+    pool = InferencePool(models[0], num_workers=1, max_batch_size=4, img_size=IMG_SIZE,
+                         data_dir=str(tmp_path / 'data'))
+    pool.start()
+    yield pool
+    pool.stop()
+
+def _predicted_class(pool):
+    return int(np.argmax(pool.infer(np.zeros((1, IMG_SIZE, IMG_SIZE, 3), np.float32))[0]))
+
+def test_reload_waits_for_new_model(pool, models):
+    assert _predicted_class(pool) == 0
+
+    pool.reload(models[1])
+    # reload chỉ trả về khi worker mới đã tải xong: không còn kết quả của model cũ
+    assert all(worker['ready'] for worker in pool.stats()['workers'])
+    assert _predicted_class(pool) == 2
+    assert pool.stats()['restarts'] == 1
+
+def test_reload_without_wait_marks_workers_not_ready(pool, models):
+    pool.reload(models[1], wait=False)
+    assert not any(worker['ready'] for worker in pool.stats()['workers'])
+    pool.wait_ready(pool.ready_timeout)
+    assert _predicted_class(pool) == 2
+
+def test_predictor_reload_clears_cache_after_new_model(pool, models, tmp_path):
+    cache = PredictionCache()
+    predictor = WeatherPredictor(models[0], data_dir=str(tmp_path / 'data'), cache=cache,
+                                 inference_pool=pool,
+                                 time_extractor=TimeExtractor(str(tmp_path / 'history.db')))
+    predictor.reload_model(models[1])
+    assert _predicted_class(pool) == 2
+    assert cache.stats()['entries'] == 0
@@ -0,0 +1,100 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import partitioned_history
+from partitioned_history import PartitionedTimeExtractor, partition_id_base
+
+MONTHS = [(2024, 1), (2024, 2), (2024, 3)]
+
+def _analysis(name, dt, prediction='Mưa'):
+    return {'image_name': name, 'prediction': prediction, 'confidence': 0.8, 'duration': 0.1, 'dt': dt}
+
+@pytest.fixture
+def partition_dir(tmp_path):
+    history = PartitionedTimeExtractor(str(tmp_path))
+    history.record_analyses([_analysis(f'{year}_{month}_{i}.jpg', datetime(year, month, 10 + i, 12))
+                             for year, month in MONTHS for i in range(2)])
+    history.close()
+    return str(tmp_path)
+
+@pytest.fixture
+def seeds(monkeypatch):
+    """Ghi lại các phân vùng được đặt bộ đếm id"""
+    calls = []
+    seed = partitioned_history._seed_id_sequence
+    def record(extractor, year, month):
+        calls.append((year, month))
+        seed(extractor, year, month)
+    monkeypatch.setattr(partitioned_history, '_seed_id_sequence', record)
+    return calls
+
+def test_ids_use_partition_space(partition_dir):
+    history = PartitionedTimeExtractor(partition_dir)
+    for year, month in MONTHS:
+        ids = sorted(record['id'] for record in history.get_analysis_by_date(year, month))
+        assert ids == [partition_id_base(year, month) + 1, partition_id_base(year, month) + 2]
+    history.close()
+
+def test_seed_only_on_create(partition_dir, seeds):
+    history = PartitionedTimeExtractor(partition_dir)
+    history.get_all_history(limit=100)
+    history.record_analyses([_analysis('more.jpg', datetime(2024, 2, 20, 8))])
+    # Phân vùng có sẵn được mở mà không đặt lại bộ đếm
+    assert seeds == []
+    
+    history.record_analyses([_analysis('new.jpg', datetime(2024, 4, 1, 8))])
+    assert seeds == [(2024, 4)]
+    
+    ids = {record['image_name']: record['id'] for record in history.get_all_history(limit=100)}
+    assert ids['more.jpg'] == partition_id_base(2024, 2) + 3
+    assert ids['new.jpg'] == partition_id_base(2024, 4) + 1
+    history.close()
+
+def test_queries_open_only_matching_partitions(partition_dir):
+    history = PartitionedTimeExtractor(partition_dir)
+    assert len(history.get_analysis_by_date(2024, 2)) == 2
+    assert set(history._partitions) == {(2024, 2)}
+    
+    assert history.get_statistics_by_date(2024, 3, 10)['total'] == 1
+    assert set(history._partitions) == {(2024, 2), (2024, 3)}
+    
+    records = history.get_analysis_between(datetime(2024, 1, 11), datetime(2024, 1, 31))
+    assert [record['image_name'] for record in records] == ['2024_1_1.jpg']
+    assert set(history._partitions) == {(2024, 1), (2024, 2), (2024, 3)}
+    
+    # Tháng chưa có phân vùng không tạo file mới khi chỉ đọc
+    assert history.get_analysis_by_date(2023, 12) == []
+    assert history.list_partitions() == sorted(MONTHS, reverse=True)
+    history.close()
+
+def test_retention_drops_expired_partitions(tmp_path):
+    history = PartitionedTimeExtractor(str(tmp_path))
+    now = datetime.now().replace(microsecond=0)
+    expired = now - timedelta(days=200)
+    old = now - timedelta(days=40)
+    history.record_analyses([
+        _analysis('expired_1.jpg', expired),
+        _analysis('expired_2.jpg', expired, 'Nắng'),
+        _analysis('old.jpg', old),
+        _analysis('new.jpg', now, 'Nắng'),
+    ])
+    assert (expired.year, expired.month) in history.list_partitions()
+    
+    assert history.clear_old_records(days_old=30) == 3
+    
+    # Tháng hết hạn hoàn toàn bị xóa nguyên file (kể cả -wal/-shm)
+    expired_path = history.partition_path(expired.year, expired.month)
+    assert not any(os.path.exists(expired_path + suffix) for suffix in ('', '-wal', '-shm'))
+    assert (expired.year, expired.month) not in history.list_partitions()
+    
+    assert [record['image_name'] for record in history.get_all_history(limit=100)] == ['new.jpg']
+    assert history.get_statistics_by_date(old.year, old.month, old.day)['total'] == 0
+    assert history.get_statistics_by_date(now.year, now.month, now.day)['by_prediction'] == {'Nắng': 1}
+    
+    assert history.clear_old_records(days_old=30) == 0
+    history.close()
@@ -0,0 +1,77 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from predict_simple import WeatherPredictor
+from time_extractor import TimeExtractor
+
+def _save_model(tmp_path):
+    """Lưu model nhỏ (224x224x3 -> 3 lớp) thành file .h5, trả về đường dẫn"""
+    import tensorflow as tf
+
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(224, 224, 3)),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(3, activation='softmax')
+    ])
+    model_path = str(tmp_path / 'model.h5')
+    model.save(model_path)
+    return model_path
+
+@pytest.fixture
+def predictor(tmp_path):
+    """WeatherPredictor với model nhỏ và cơ sở dữ liệu lịch sử tạm"""
+    model_path = _save_model(tmp_path)
+    return WeatherPredictor(model_path, data_dir=str(tmp_path / 'data'), warmup_batch_sizes=(1,),
+                            time_extractor=TimeExtractor(str(tmp_path / 'history.db')))
+
+def test_micro_batching_start_stop_restart(predictor):
+    image = np.random.rand(1, 224, 224, 3).astype(np.float32)
+    expected = predictor.infer(image)
+
+    first = predictor.start_micro_batching(max_batch_size=4, max_wait_ms=1)
+    np.testing.assert_allclose(predictor._infer_single(image), expected, rtol=1e-5)
+
+    # Bật lại khi đang chạy: scheduler cũ được dừng và thay bằng scheduler mới
+    second = predictor.start_micro_batching(max_batch_size=4, max_wait_ms=1)
+    assert second is not first
+    assert predictor.batch_scheduler is second
+    np.testing.assert_allclose(predictor._infer_single(image), expected, rtol=1e-5)
+
+    predictor.stop_micro_batching()
+    assert predictor.batch_scheduler is None
+    assert predictor.inference_pool is None
+    np.testing.assert_allclose(predictor._infer_single(image), expected, rtol=1e-5)
+
+    # Tắt lần nữa không làm gì
+    predictor.stop_micro_batching()
+    assert predictor.batch_scheduler is None
+
+def test_item_to_array_accepts_preprocessed_and_uint8(predictor):
+    preprocessed = np.random.rand(224, 224, 3).astype(np.float32)
+    np.testing.assert_array_equal(predictor._item_to_array(preprocessed), preprocessed)
+
+    array = predictor._item_to_array(np.full((100, 150, 3), 255, np.uint8))
+    assert array.shape == (224, 224, 3)
+    np.testing.assert_allclose(array, 1.0)
+
+def test_item_to_array_rejects_unpreprocessed_float(predictor):
+    # Ảnh float [0, 1] sai kích thước không được ép thẳng sang uint8 (gần như toàn số 0)
+    with pytest.raises(ValueError):
+        predictor._item_to_array(np.random.rand(100, 150, 3))
+
+def test_worker_predictor_does_not_open_history(tmp_path, monkeypatch):
+    """Predictor của worker InferencePool (TimeExtractor(db_path=None)) không tạo file lịch sử"""
+    model_path = _save_model(tmp_path)
+    monkeypatch.chdir(tmp_path)
+
+    predictor = WeatherPredictor(model_path, data_dir=str(tmp_path / 'data'), warmup_batch_sizes=(1,),
+                                 time_extractor=TimeExtractor(db_path=None))
+    assert predictor.infer(np.zeros((1, 224, 224, 3), np.float32)).shape == (1, 3)
+    assert not (tmp_path / 'analysis_history.db').exists()
+    with pytest.raises(RuntimeError):
+        predictor.time_extractor.record_analysis('x.jpg', 'Nắng', 0.9)
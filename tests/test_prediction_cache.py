@@ -0,0 +1,65 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prediction_cache
+from prediction_cache import PredictionCache
+
+def _result(name, confidence=0.9):
+    return {'class': name, 'confidence': confidence, 'confidences': {name: confidence}}
+
+def test_hit_returns_copy():
+    cache = PredictionCache()
+    key = PredictionCache.make_key(b'image', 'model:1')
+    assert cache.get(key) is None
+
+    cache.put(key, _result('Nắng'))
+    result = cache.get(key)
+    assert result == _result('Nắng')
+
+    # Sửa kết quả trả về không làm thay đổi mục trong cache
+    result['confidences']['Nắng'] = 0.0
+    assert cache.get(key)['confidences']['Nắng'] == 0.9
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 1
+
+def test_key_depends_on_model_and_content():
+    key = PredictionCache.make_key(b'image', 'model:1')
+    assert key == PredictionCache.make_key(b'image', 'model:1')
+    assert key != PredictionCache.make_key(b'image', 'model:2')
+    assert key != PredictionCache.make_key(b'other', 'model:1')
+
+def test_lru_eviction():
+    cache = PredictionCache(max_entries=2)
+    cache.put('a', _result('Mưa'))
+    cache.put('b', _result('Nắng'))
+    cache.get('a')  # 'a' được dùng gần đây hơn 'b'
+    cache.put('c', _result('Tuyết'))
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+    assert cache.stats()['evictions'] == 1
+
+def test_max_bytes_eviction():
+    cache = PredictionCache(max_entries=100, max_bytes=250)
+    for key in 'abcdef':
+        cache.put(key, _result('Nắng'))
+    stats = cache.stats()
+    assert stats['bytes'] <= 250
+    assert stats['entries'] < 6
+    assert cache.get('f') is not None
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(prediction_cache.time, 'monotonic', lambda: now[0])
+    cache = PredictionCache(ttl=10)
+    cache.put('a', _result('Nắng'))
+
+    now[0] += 9
+    assert cache.get('a') is not None
+    now[0] += 1
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+    assert cache.stats()['entries'] == 0
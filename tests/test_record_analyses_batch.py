@@ -0,0 +1,67 @@
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from time_extractor import TimeExtractor
+
+ANALYSES = [
+    {'image_name': f'{i}.jpg', 'prediction': ['Mưa', 'Nắng', 'Tuyết'][i % 3], 'confidence': 0.5 + i / 100,
+     'duration': 0.1 * i, 'notes': 'offline' if i % 2 else None, 'from_cache': i % 4 == 0,
+     'dt': datetime(2024, 7, 1 + i // 3, i, 30)}
+    for i in range(7)
+]
+
+COLUMNS = ('timestamp', 'epoch_ms', 'year', 'month', 'day', 'hour', 'minute', 'second',
+           'image_name', 'prediction', 'confidence', 'duration', 'notes', 'from_cache')
+
+def _rows(extractor):
+    with extractor._connection() as conn:
+        return conn.execute(f"SELECT id, {', '.join(COLUMNS)} FROM analysis_history ORDER BY id").fetchall()
+
+def test_batch_matches_record_analyses(tmp_path):
+    single = TimeExtractor(str(tmp_path / 'single.db'))
+    batch = TimeExtractor(str(tmp_path / 'batch.db'))
+    single.record_analyses(ANALYSES)
+    
+    # Bộ (không có from_cache) và dict cùng đi qua một đường ghi
+    tuples = [(a['image_name'], a['prediction'], a['confidence'], a['duration'], a['notes'], a['dt'])
+              for a in ANALYSES[:3]]
+    assert batch.record_analyses_batch(tuples + ANALYSES[3:], chunk_size=2) == (1, 7)
+    
+    expected = [row if row[0] > 3 else row[:-1] + (0,) for row in _rows(single)]
+    assert _rows(batch) == expected
+    assert batch.get_statistics_by_date(2024, 7) == single.get_statistics_by_date(2024, 7)
+    assert batch.get_hourly_statistics(2024, 7, 2) == single.get_hourly_statistics(2024, 7, 2)
+    single.close()
+    batch.close()
+
+def test_batch_notifies_listeners_per_chunk(tmp_path):
+    extractor = TimeExtractor(str(tmp_path / 'history.db'))
+    extractor.record_analysis('first.jpg', 'Mưa', 0.9)
+    calls = []
+    extractor.add_listener(calls.append)
+    
+    assert extractor.record_analyses_batch(iter(ANALYSES), chunk_size=3) == (2, 8)
+    assert [len(rows) for rows in calls] == [3, 3, 1]
+    
+    rows = [row for chunk in calls for row in chunk]
+    assert [row['id'] for row in rows] == list(range(2, 9))
+    assert [row['image_name'] for row in rows] == [a['image_name'] for a in ANALYSES]
+    assert [row['from_cache'] for row in rows] == [int(a['from_cache']) for a in ANALYSES]
+    
+    # Cùng dạng với listener của record_analysis
+    single = []
+    extractor.add_listener(single.append)
+    extractor.record_analysis('last.jpg', 'Nắng', 0.8)
+    assert set(single[0][0]) == set(rows[0])
+    extractor.close()
+
+def test_empty_batch(tmp_path):
+    extractor = TimeExtractor(str(tmp_path / 'history.db'))
+    calls = []
+    extractor.add_listener(calls.append)
+    assert extractor.record_analyses_batch([]) is None
+    assert calls == []
+    extractor.close()
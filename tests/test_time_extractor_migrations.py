@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conftest import baseline_row
+from time_extractor import MIGRATIONS, SCHEMA_VERSION, TimeExtractor
+
+ROWS = [
+    baseline_row('2024-03-01 08:15:00', 'Nắng', 0.9, 0.1),
+    baseline_row('2024-03-01 08:45:10', 'Mưa', 0.6, 0.2),
+    baseline_row('2024-03-02 19:30:00', 'Tuyết', 0.8, None),
+]
+
+def _schema(path):
+    conn = sqlite3.connect(path)
+    try:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(analysis_history)")]
+        indexes = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'analysis_history'")}
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        rows = conn.execute("SELECT id, image_name, prediction, from_cache FROM analysis_history "
+                            "ORDER BY id").fetchall()
+    finally:
+        conn.close()
+    return columns, indexes, version, rows
+
+def test_migrates_baseline_database(baseline_history_db):
+    path = baseline_history_db(ROWS)
+    extractor = TimeExtractor(path)
+    assert extractor.get_schema_version() == SCHEMA_VERSION == len(MIGRATIONS)
+
+    columns, indexes, version, rows = _schema(path)
+    assert 'from_cache' in columns and 'epoch_ms' in columns
+    assert {'idx_history_date', 'idx_history_timestamp', 'idx_history_hour',
+            'idx_history_epoch'} <= indexes
+    assert version == SCHEMA_VERSION
+    # Dữ liệu cũ được giữ nguyên, from_cache mặc định 0
+    assert rows == [(1, 'a.jpg', 'Nắng', 0), (2, 'a.jpg', 'Mưa', 0), (3, 'a.jpg', 'Tuyết', 0)]
+
+    # epoch_ms được điền lại từ timestamp của các dòng cũ
+    conn = sqlite3.connect(path)
+    epochs = [row[0] for row in conn.execute("SELECT epoch_ms FROM analysis_history ORDER BY id")]
+    conn.close()
+    expected = [int(datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S').replace(
+        tzinfo=timezone.utc).timestamp()) * 1000 for row in ROWS]
+    assert epochs == expected
+
+    # Ghi tiếp được sau khi nâng cấp
+    record = extractor.record_analysis('new.jpg', 'Mưa', 0.7, from_cache=True)
+    assert record['id'] == 4
+    extractor.close()
+
+def test_migrations_are_idempotent(baseline_history_db):
+    path = baseline_history_db(ROWS)
+    TimeExtractor(path).close()
+    before = _schema(path)
+    TimeExtractor(path).close()
+    assert _schema(path) == before
+
+def test_resumes_from_intermediate_version(baseline_history_db):
+    path = baseline_history_db(ROWS)
+    conn = sqlite3.connect(path)
+    conn.execute("ALTER TABLE analysis_history ADD COLUMN from_cache INTEGER DEFAULT 0")
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+    extractor = TimeExtractor(path)
+    assert extractor.get_schema_version() == SCHEMA_VERSION
+    columns, indexes, _, rows = _schema(path)
+    assert columns.count('from_cache') == 1
+    assert 'idx_history_date' in indexes
+    assert len(rows) == 3
+    extractor.close()
+
+def test_new_database_starts_at_latest_version(tmp_path):
+    extractor = TimeExtractor(str(tmp_path / 'new.db'))
+    assert extractor.get_schema_version() == SCHEMA_VERSION
+    extractor.close()
@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from time_extractor import TimeExtractor
+
+@pytest.fixture
+def extractor(tmp_path):
+    extractor = TimeExtractor(str(tmp_path / 'history.db'), max_idle_connections=2)
+    yield extractor
+    extractor.close()
+
+def test_database_uses_wal(extractor):
+    with extractor._connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        # synchronous = NORMAL (1) được đặt cho mọi kết nối mới
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+
+def test_connections_are_reused(extractor):
+    with extractor._connection() as first:
+        pass
+    with extractor._connection() as second:
+        assert second is first
+    
+    # Mượn lồng nhau mở kết nối mới; pool chỉ giữ lại tối đa max_idle_connections
+    with extractor._connection() as a, extractor._connection() as b, extractor._connection() as c:
+        assert len({id(a), id(b), id(c)}) == 3
+    assert len(extractor._idle) == 2
+
+def test_failed_transaction_is_rolled_back(extractor):
+    with pytest.raises(RuntimeError):
+        with extractor._connection() as conn:
+            conn.execute("INSERT INTO analysis_history (image_name, prediction) VALUES ('x.jpg', 'Mưa')")
+            raise RuntimeError("boom")
+    
+    with extractor._connection() as conn:
+        assert conn is not None and not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM analysis_history").fetchone()[0] == 0
+
+def test_close_discards_pooled_connections(extractor):
+    with extractor._connection() as borrowed:
+        with extractor._connection() as pooled:
+            pass
+        assert extractor._idle == [pooled]
+        extractor.close()
+        assert extractor._idle == []
+        with pytest.raises(sqlite3.ProgrammingError):
+            pooled.execute("SELECT 1")
+    
+    # Kết nối đang mượn khi close() được đóng khi trả về thay vì quay lại pool
+    with pytest.raises(sqlite3.ProgrammingError):
+        borrowed.execute("SELECT 1")
+    assert extractor._idle == []
+    
+    # Vẫn dùng được sau close()
+    assert extractor.record_analysis('after.jpg', 'Nắng', 0.8)['id'] == 1
+
+def test_concurrent_reads_and_writes(extractor):
+    writers, per_writer = 4, 25
+    errors = []
+    ids = []
+    done = threading.Event()
+    
+    def write(worker):
+        try:
+            for i in range(per_writer):
+                ids.append(extractor.record_analysis(f'{worker}_{i}.jpg', 'Mưa', 0.5)['id'])
+        except Exception as e:
+            errors.append(e)
+    
+    def read():
+        try:
+            while not done.is_set():
+                # Đọc song song với ghi (WAL) không bị khóa
+                extractor.get_all_history(limit=10)
+                extractor.get_statistics_by_date(2024)
+        except Exception as e:
+            errors.append(e)
+    
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    threads = [threading.Thread(target=write, args=(w,)) for w in range(writers)]
+    for thread in readers + threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    for thread in readers:
+        thread.join()
+    
+    assert errors == []
+    assert sorted(ids) == list(range(1, writers * per_writer + 1))
+    assert len(extractor.get_all_history(limit=1000)) == writers * per_writer
+    assert len(extractor._idle) <= extractor.max_idle_connections
@@ -0,0 +1,26 @@
+import argparse
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simple_model import ARCHITECTURES
+from training_args import LOADERS, add_training_arguments
+
+def test_defaults():
+    args = add_training_arguments(argparse.ArgumentParser()).parse_args([])
+    assert args.loader == 'directory' and args.loader in LOADERS
+    assert args.cache_dir == 'dataset_cache'
+    assert args.workers == 1 and args.seed is None and not args.graph_augmentation
+    assert args.architecture is None and args.width_multiplier == 1.0
+
+def test_architecture_arguments():
+    parser = add_training_arguments(argparse.ArgumentParser())
+    args = parser.parse_args(['--loader', 'tfdata', '--seed', '3', '--architecture', 'separable',
+                              '--width-multiplier', '0.5'])
+    assert (args.loader, args.seed, args.architecture, args.width_multiplier) == ('tfdata', 3, 'separable', 0.5)
+    assert 'separable' in ARCHITECTURES
+    with pytest.raises(SystemExit):
+        parser.parse_args(['--architecture', 'resnet'])
@@ -0,0 +1,228 @@
+import os
+import threading
+
+import numpy as np
+import tensorflow as tf
+
+from balanced_sampler import class_sampling_rates, default_steps_per_epoch
+from batch_augmentation import BatchAugmentation
+from dataset_utils import list_image_files, subset_indices
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+def decode_image(path, image_size):
+    """
+    Đọc và giải mã một ảnh thành tensor uint8 (H, W, 3), resize 'nearest' giống hệt load_img
+
+    Args:
+        path: Tensor chuỗi đường dẫn ảnh
+        image_size: (chiều cao, chiều rộng)
+    """
+    contents = tf.io.read_file(path)
+    # INTEGER_ACCURATE cho kết quả giống hệt PIL (mặc định INTEGER_FAST lệch vài mức xám)
+    image = tf.cond(
+        tf.io.is_jpeg(contents),
+        lambda: tf.io.decode_jpeg(contents, channels=3, dct_method='INTEGER_ACCURATE'),
+        lambda: tf.io.decode_image(contents, channels=3, expand_animations=False)
+    )
+    shape = tf.shape(image)
+    image = tf.gather(image, _nearest_indices(shape[0], image_size[0]), axis=0)
+    image = tf.gather(image, _nearest_indices(shape[1], image_size[1]), axis=1)
+    image.set_shape((*image_size, 3))
+    return image
+
+def _nearest_indices(in_size, out_size):
+    """
+    Chỉ số pixel nguồn của resize 'nearest' theo đúng cách PIL tính (cộng dồn bước
+    in_size/out_size bằng số thực double từ tâm pixel đầu tiên); tf.image.resize làm tròn
+    khác PIL ở các điểm chia đều
+    """
+    step = tf.cast(in_size, tf.float64) / out_size
+    positions = tf.math.cumsum(tf.concat([[step * 0.5], tf.fill([out_size - 1], step)], 0))
+    return tf.minimum(tf.cast(positions, tf.int32), in_size - 1)
+
+def make_dataset(data_dir, image_size, batch_size, subset='training', validation_split=0.2,
+                 image_data_generator=None, shuffle=True, seed=None, cache=True,
+                 in_graph_augmentation=False):
+    """
+    Tạo tf.data.Dataset đọc ảnh từ data_dir, chia và augmentation giống
+    ImageDataGenerator.flow_from_directory
+
+    Các bước: giải mã song song (AUTOTUNE) -> cache ảnh uint8 đã resize -> xáo trộn ->
+    batch -> augmentation song song theo batch -> prefetch
+
+    Args:
+        data_dir: Thư mục dữ liệu, mỗi thư mục con là một lớp
+        image_size: (chiều cao, chiều rộng) ảnh đầu vào
+        batch_size: Số ảnh mỗi batch
+        subset: 'training' hoặc 'validation'
+        validation_split: Tỉ lệ validation của mỗi lớp
+        image_data_generator: ImageDataGenerator của script training, dùng cho
+            random_transform và rescale (None = chỉ chuyển sang float32)
+        shuffle: Xáo trộn lại thứ tự ảnh mỗi epoch
+        seed: Seed cho thứ tự xáo trộn và augmentation (None = ngẫu nhiên mỗi lần chạy)
+        cache: True = cache ảnh đã giải mã trong bộ nhớ, chuỗi = tiền tố file cache trên đĩa
+            (thêm đuôi .training/.validation), False = giải mã lại mỗi epoch
+        in_graph_augmentation: Thực hiện augmentation của image_data_generator bằng
+            BatchAugmentation (cả batch, trong graph) thay vì random_transform từng ảnh
+
+    Returns:
+        tf.data.Dataset: Các batch (ảnh float32, nhãn one-hot), có thêm thuộc tính
+            samples và class_indices như DirectoryIterator
+    """
+    image_size = tuple(image_size)
+    filenames, labels, class_names = list_image_files(data_dir)
+    indices = subset_indices(labels, validation_split, subset)
+    paths = [os.path.join(data_dir, filenames[i]) for i in indices]
+    num_classes = len(class_names)
+
+    dataset = _decoded_dataset(paths, labels[indices], image_size,
+                               f'{cache}.{subset}' if isinstance(cache, str) else cache)
+    if shuffle:
+        dataset = dataset.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+    dataset = _augment_and_batch(dataset, batch_size, image_size, num_classes, image_data_generator,
+                                 seed, in_graph_augmentation)
+
+    # Cùng thuộc tính với DirectoryIterator để các script training dùng chung
+    dataset.samples = len(paths)
+    dataset.class_indices = {name: i for i, name in enumerate(class_names)}
+    return dataset
+
+def make_sampled_dataset(data_dir, image_size, batch_size, sampling='balanced', validation_split=0.2,
+                         image_data_generator=None, seed=None, cache=True, in_graph_augmentation=False,
+                         steps_per_epoch=None):
+    """
+    Tạo tf.data.Dataset training vô hạn lấy mẫu ảnh theo tỉ lệ lớp (tf.data.Dataset.sample_from_datasets
+    trên các dataset của từng lớp): không nhân bản ảnh, mỗi lớp duyệt ảnh của mình theo thứ tự
+    xáo trộn rồi lặp lại; độ dài epoch do steps_per_epoch quyết định
+
+    Args:
+        sampling: Cách lấy mẫu theo lớp (xem balanced_sampler.class_sampling_rates)
+        steps_per_epoch: Số batch mỗi epoch (mặc định: một lượt tập training)
+        Các tham số còn lại giống make_dataset
+
+    Returns:
+        tf.data.Dataset: Các batch (ảnh float32, nhãn one-hot), có thêm thuộc tính samples,
+            class_indices, steps_per_epoch và sampling_rates
+    """
+    image_size = tuple(image_size)
+    filenames, labels, class_names = list_image_files(data_dir)
+    indices = subset_indices(labels, validation_split, 'training')
+    num_classes = len(class_names)
+    rates = class_sampling_rates(labels[indices], sampling, class_names)
+
+    datasets = []
+    weights = []
+    for label in range(num_classes):
+        members = indices[labels[indices] == label]
+        if rates[label] == 0:
+            continue
+        paths = [os.path.join(data_dir, filenames[i]) for i in members]
+        dataset = _decoded_dataset(paths, labels[members], image_size,
+                                   f'{cache}.training.{label}' if isinstance(cache, str) else cache)
+        dataset = dataset.shuffle(len(paths), seed=None if seed is None else seed + label,
+                                  reshuffle_each_iteration=True)
+        datasets.append(dataset.repeat())
+        weights.append(float(rates[label]))
+
+    dataset = tf.data.Dataset.sample_from_datasets(datasets, weights=weights, seed=seed)
+    dataset = _augment_and_batch(dataset, batch_size, image_size, num_classes, image_data_generator,
+                                 seed, in_graph_augmentation)
+
+    dataset.samples = len(indices)
+    dataset.class_indices = {name: i for i, name in enumerate(class_names)}
+    dataset.steps_per_epoch = steps_per_epoch or default_steps_per_epoch(len(indices), batch_size)
+    dataset.sampling_rates = dict(zip(class_names, rates.tolist()))
+    return dataset
+
+def tf_data_generators(data_dir, image_size, batch_size, image_data_generator, seed=None, cache=True,
+                       in_graph_augmentation=False, sampling=None, steps_per_epoch=None):
+    """
+    Tạo cặp (training, validation) tf.data thay cho hai lần gọi flow_from_directory
+    với validation_split của image_data_generator
+
+    Args:
+        sampling: Cách lấy mẫu theo lớp cho tập training (xem make_sampled_dataset),
+            None = duyệt toàn bộ tập training mỗi epoch
+        steps_per_epoch: Số batch mỗi epoch khi có sampling
+
+    Returns:
+        tuple: (tf.data.Dataset training, tf.data.Dataset validation)
+    """
+    validation_split = image_data_generator._validation_split
+    if sampling is not None:
+        train_ds = make_sampled_dataset(data_dir, image_size, batch_size, sampling, validation_split,
+                                        image_data_generator, seed=seed, cache=cache,
+                                        in_graph_augmentation=in_graph_augmentation,
+                                        steps_per_epoch=steps_per_epoch)
+    else:
+        train_ds = make_dataset(data_dir, image_size, batch_size, 'training', validation_split,
+                                image_data_generator, shuffle=True, seed=seed, cache=cache,
+                                in_graph_augmentation=in_graph_augmentation)
+    valid_ds = make_dataset(data_dir, image_size, batch_size, 'validation', validation_split,
+                            image_data_generator, shuffle=False, seed=seed, cache=cache,
+                            in_graph_augmentation=in_graph_augmentation)
+    return train_ds, valid_ds
+
+def _decoded_dataset(paths, labels, image_size, cache):
+    """Dataset (ảnh uint8 đã resize, nhãn) giải mã song song, cache theo tham số cache của make_dataset"""
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    dataset = dataset.map(lambda path, label: (decode_image(path, image_size), label),
+                          num_parallel_calls=AUTOTUNE, deterministic=True)
+    if cache:
+        dataset = dataset.cache(cache if isinstance(cache, str) else '')
+    return dataset
+
+def _augment_and_batch(dataset, batch_size, image_size, num_classes, image_data_generator, seed,
+                       in_graph_augmentation):
+    """Gom batch, augmentation (từng ảnh bằng numpy hoặc cả batch trong graph), one-hot, prefetch"""
+    if image_data_generator is not None and in_graph_augmentation:
+        augmentation = BatchAugmentation.from_image_data_generator(image_data_generator)
+        # Mỗi batch nhận một seed (2,) cho các phép random stateless
+        seeds = tf.data.Dataset.random(seed=seed, rerandomize_each_iteration=True).batch(2)
+        dataset = tf.data.Dataset.zip((dataset.batch(batch_size), seeds))
+        dataset = dataset.map(lambda batch, batch_seed: (augmentation(batch[0], batch_seed),
+                                                         tf.one_hot(batch[1], num_classes)),
+                              num_parallel_calls=AUTOTUNE, deterministic=True)
+    elif image_data_generator is not None:
+        # Mỗi ảnh nhận một seed riêng từ luồng số ngẫu nhiên có seed: kết quả không phụ thuộc
+        # thread nào xử lý batch
+        seeds = tf.data.Dataset.random(seed=seed, rerandomize_each_iteration=True)
+        augment = _numpy_augmentation(image_data_generator)
+
+        def transform(images, labels, batch_seeds):
+            images = tf.numpy_function(augment, [images, batch_seeds], tf.float32, stateful=False)
+            images.set_shape((None, *image_size, 3))
+            return images, tf.one_hot(labels, num_classes)
+
+        dataset = tf.data.Dataset.zip((dataset, seeds))
+        dataset = dataset.map(lambda image_label, element_seed: (*image_label, element_seed))
+        dataset = dataset.batch(batch_size)
+        # Augmentation theo cả batch: mỗi lần gọi Python xử lý batch_size ảnh
+        dataset = dataset.map(transform, num_parallel_calls=AUTOTUNE, deterministic=True)
+    else:
+        dataset = dataset.batch(batch_size)
+        dataset = dataset.map(lambda images, labels: (tf.cast(images, tf.float32),
+                                                      tf.one_hot(labels, num_classes)),
+                              num_parallel_calls=AUTOTUNE)
+    dataset = dataset.prefetch(AUTOTUNE)
+
+    return dataset
+
+def _numpy_augmentation(image_data_generator):
+    """Hàm numpy áp dụng random_transform + standardize của ImageDataGenerator cho một batch,
+    mỗi ảnh với seed cho trước"""
+    # get_random_transform(seed=...) đặt seed toàn cục của np.random nên cần khóa;
+    # apply_transform (phần tốn thời gian) chạy song song giữa các batch
+    lock = threading.Lock()
+
+    def augment(images, seeds):
+        batch = images.astype(np.float32)
+        for i, seed in enumerate(seeds):
+            with lock:
+                params = image_data_generator.get_random_transform(batch[i].shape, seed=int(seed) % 2**32)
+            x = image_data_generator.apply_transform(batch[i], params)
+            batch[i] = image_data_generator.standardize(x)
+        return batch
+
+    return augment
@@ -1,47 +1,317 @@
 import json
+import logging
 import os
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from itertools import islice
 from pathlib import Path
 import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+def _migrate_add_from_cache(cursor):
+    """v1: Cột from_cache đánh dấu kết quả lấy từ cache dự đoán"""
+    cursor.execute("PRAGMA table_info(analysis_history)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if 'from_cache' not in columns:
+        cursor.execute("ALTER TABLE analysis_history ADD COLUMN from_cache INTEGER DEFAULT 0")
+
+def _migrate_add_indexes(cursor):
+    """v2: Index cho truy vấn theo ngày/giờ, thống kê và sắp xếp theo timestamp"""
+    # Lọc theo year/month/day/hour; bao phủ các cột dùng cho thống kê
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_history_date
+        ON analysis_history (year, month, day, hour, prediction, confidence, duration)
+    ''')
+    # ORDER BY timestamp (get_all_history) và xóa theo timestamp (clear_old_records)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_history_timestamp
+        ON analysis_history (timestamp)
+    ''')
+    # Lọc theo khoảng giờ khi không chỉ định ngày (get_analysis_by_time_range)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_history_hour
+        ON analysis_history (hour, timestamp)
+    ''')
+
+# Bảng tổng hợp theo giờ: một dòng cho mỗi (năm, tháng, ngày, giờ, lớp dự đoán)
+# confidence_min/max bỏ qua độ tin cậy rỗng hoặc 0, giống thống kê gốc
+ROLLUP_COLUMNS = ('year, month, day, hour, prediction, count, '
+                  'confidence_sum, confidence_min, confidence_max, duration_sum')
+
+# prediction trong analysis_history có thể NULL, nhưng là một phần của khóa chính bảng tổng hợp:
+# NULL được lưu thành '' và đọc lại thành None (NULLIF) khi thống kê
+ROLLUP_NULL_PREDICTION = ''
+
+# Tính lại các dòng tổng hợp từ analysis_history (thêm WHERE trước GROUP BY nếu cần)
+ROLLUP_SELECT = f'''
+    SELECT year, month, day, hour, COALESCE(prediction, '{ROLLUP_NULL_PREDICTION}'),
+           COUNT(*),
+           SUM(COALESCE(confidence, 0)),
+           MIN(CASE WHEN confidence != 0 THEN confidence END),
+           MAX(CASE WHEN confidence != 0 THEN confidence END),
+           SUM(COALESCE(duration, 0))
+    FROM analysis_history
+'''
+ROLLUP_GROUP_BY = f"GROUP BY year, month, day, hour, COALESCE(prediction, '{ROLLUP_NULL_PREDICTION}')"
+
+# Cộng dồn một bucket đã gộp vào bảng tổng hợp
+ROLLUP_UPSERT = f'''
+    INSERT INTO analysis_rollup_hourly ({ROLLUP_COLUMNS})
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (year, month, day, hour, prediction) DO UPDATE SET
+        count = count + excluded.count,
+        confidence_sum = confidence_sum + excluded.confidence_sum,
+        confidence_min = COALESCE(MIN(confidence_min, excluded.confidence_min),
+                                  confidence_min, excluded.confidence_min),
+        confidence_max = COALESCE(MAX(confidence_max, excluded.confidence_max),
+                                  confidence_max, excluded.confidence_max),
+        duration_sum = duration_sum + excluded.duration_sum
+'''
+
+def _migrate_add_rollups(cursor):
+    """v3: Bảng tổng hợp theo giờ cho các endpoint thống kê, tính từ dữ liệu hiện có"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS analysis_rollup_hourly (
+            year INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            hour INTEGER NOT NULL,
+            prediction TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            confidence_sum REAL NOT NULL,
+            confidence_min REAL,
+            confidence_max REAL,
+            duration_sum REAL NOT NULL,
+            PRIMARY KEY (year, month, day, hour, prediction)
+        ) WITHOUT ROWID
+    ''')
+    _rebuild_rollups(cursor)
+
+def _migrate_add_epoch_ms(cursor):
+    """v4: Cột epoch_ms (mili giây UTC, có index) cho truy vấn theo khoảng thời gian bất kỳ"""
+    cursor.execute("PRAGMA table_info(analysis_history)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if 'epoch_ms' not in columns:
+        cursor.execute("ALTER TABLE analysis_history ADD COLUMN epoch_ms INTEGER")
+    # Bản ghi cũ: timestamp là CURRENT_TIMESTAMP (UTC, độ chính xác giây)
+    cursor.execute('''
+        UPDATE analysis_history
+        SET epoch_ms = CAST(strftime('%s', timestamp) AS INTEGER) * 1000
+        WHERE epoch_ms IS NULL
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_history_epoch
+        ON analysis_history (epoch_ms)
+    ''')
+    # Bản ghi được ghi trực tiếp bằng SQL (không qua TimeExtractor) vẫn có epoch_ms
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_history_epoch_ms
+        AFTER INSERT ON analysis_history
+        WHEN NEW.epoch_ms IS NULL
+        BEGIN
+            UPDATE analysis_history
+            SET epoch_ms = CAST(strftime('%s', NEW.timestamp) AS INTEGER) * 1000
+            WHERE id = NEW.id;
+        END
+    ''')
+
+# Danh sách migration theo thứ tự; phiên bản = vị trí trong danh sách (PRAGMA user_version)
+MIGRATIONS = [
+    _migrate_add_from_cache,
+    _migrate_add_indexes,
+    _migrate_add_rollups,
+    _migrate_add_epoch_ms,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# Số câu lệnh đã biên dịch sqlite3 giữ lại cho mỗi kết nối (tra theo chuỗi SQL),
+# nên các câu lệnh dùng thường xuyên được khai báo một lần ở đây
+STATEMENT_CACHE_SIZE = 256
+
+# Các cột của INSERT_ANALYSIS theo đúng thứ tự tham số
+INSERT_ANALYSIS_COLUMNS = ('timestamp', 'epoch_ms', 'year', 'month', 'day', 'hour', 'minute', 'second',
+                           'image_name', 'prediction', 'confidence', 'duration', 'notes', 'from_cache')
+
+INSERT_ANALYSIS = '''
+    INSERT INTO analysis_history 
+    (timestamp, epoch_ms, year, month, day, hour, minute, second, image_name, prediction, confidence, duration, notes, from_cache)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Phân trang keyset theo (timestamp, id): thứ tự ổn định kể cả khi nhiều bản ghi cùng timestamp
+SELECT_RECENT = "SELECT * FROM analysis_history ORDER BY timestamp DESC, id DESC LIMIT ?"
+
+SELECT_RECENT_BEFORE = ("SELECT * FROM analysis_history WHERE (timestamp, id) < (?, ?) "
+                        "ORDER BY timestamp DESC, id DESC LIMIT ?")
+
+# Chỉ các bản ghi mới hơn id client đã thấy (quét theo khóa chính); khi vượt limit lấy các
+# bản ghi cũ nhất, để client gọi lại với id lớn nhất đã nhận mà không bỏ sót bản ghi nào
+SELECT_RECENT_SINCE = ("SELECT * FROM (SELECT * FROM analysis_history WHERE id > ? "
+                       "ORDER BY id LIMIT ?) ORDER BY timestamp DESC, id DESC")
+
+SELECT_BETWEEN = ("SELECT * FROM analysis_history WHERE epoch_ms >= ? AND epoch_ms < ? "
+                  "ORDER BY epoch_ms DESC, id DESC")
+
+# Số bản ghi mỗi transaction khi ghi hàng loạt (record_analyses_batch)
+BATCH_CHUNK_SIZE = 10000
+
+# Thứ tự các trường khi record_analyses_batch nhận bản ghi dạng bộ
+BATCH_RECORD_FIELDS = ('image_name', 'prediction', 'confidence', 'duration', 'notes', 'dt')
+
+# Số bản ghi đọc mỗi lần fetchmany khi duyệt lịch sử (iter_history)
+FETCH_CHUNK_SIZE = 1000
 
 class TimeExtractor:
     """Trích xuất và quản lý thông tin thời gian phân tích thời tiết"""
     
-    def __init__(self, db_path='analysis_history.db'):
+    def __init__(self, db_path='analysis_history.db', journal_mode='WAL', synchronous='NORMAL',
+                 busy_timeout=5.0, max_idle_connections=8):
         """
         Khởi tạo TimeExtractor
         
         Args:
-            db_path: Đường dẫn tới cơ sở dữ liệu SQLite
+            db_path: Đường dẫn tới cơ sở dữ liệu SQLite; None = không dùng cơ sở dữ liệu
+                (chỉ trích xuất thời gian, các thao tác lịch sử báo lỗi)
+            journal_mode: Chế độ journal (WAL cho phép đọc song song với ghi)
+            synchronous: Mức fsync của SQLite (NORMAL là đủ an toàn với WAL)
+            busy_timeout: Thời gian chờ tối đa khi cơ sở dữ liệu đang bị khóa (giây)
+            max_idle_connections: Số kết nối rảnh tối đa giữ lại trong pool để dùng lại
         """
         self.db_path = db_path
-        self.init_database()
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.busy_timeout = busy_timeout
+        self.max_idle_connections = max_idle_connections
+        self._idle = []
+        self._generation = 0
+        self._pool_lock = threading.Lock()
+        self._listeners = []
+        if db_path is not None:
+            self.init_database()
+    
+    def add_listener(self, listener):
+        """
+        Đăng ký hàm được gọi sau mỗi lần ghi record_analysis/record_analyses thành công
+        
+        Args:
+            listener: Hàm nhận list các dict bản ghi vừa ghi (cùng khóa với các cột
+                của analysis_history); được gọi trên thread đã ghi nên cần chạy nhanh
+        """
+        self._listeners.append(listener)
+    
+    def remove_listener(self, listener):
+        """Hủy đăng ký listener đã thêm bằng add_listener"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+    
+    def _notify(self, inserted):
+        """Gửi các bản ghi vừa ghi tới listener; inserted là các bộ (id, tham số INSERT_ANALYSIS)"""
+        if not self._listeners:
+            return
+        rows = [dict(zip(INSERT_ANALYSIS_COLUMNS, params), id=analysis_id)
+                for analysis_id, params in inserted]
+        for listener in list(self._listeners):
+            try:
+                listener(rows)
+            except Exception as e:
+                logger.error(f"History listener failed: {str(e)}")
+    
+    def _open_connection(self):
+        """Mở kết nối mới với các PRAGMA của TimeExtractor"""
+        if self.db_path is None:
+            raise RuntimeError("Analysis history is disabled (db_path=None)")
+        # check_same_thread=False: kết nối trong pool được dùng lại bởi nhiều thread (lần lượt)
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        return conn
+    
+    @contextmanager
+    def _connection(self):
+        """Mượn một kết nối từ pool (mở mới nếu pool trống) và trả lại sau khi dùng"""
+        with self._pool_lock:
+            generation = self._generation
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._open_connection()
+        
+        try:
+            yield conn
+        finally:
+            # Transaction dở dang (do lỗi) không được mang sang lần dùng sau
+            if conn.in_transaction:
+                conn.rollback()
+            with self._pool_lock:
+                if generation == self._generation and len(self._idle) < self.max_idle_connections:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+    
+    def close(self):
+        """
+        Đóng các kết nối trong pool; kết nối đang được dùng sẽ đóng khi trả về.
+        TimeExtractor vẫn dùng được sau đó (kết nối mới được mở khi cần)
+        """
+        with self._pool_lock:
+            self._generation += 1
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
     
     def init_database(self):
-        """Khởi tạo cơ sở dữ liệu nếu chưa tồn tại"""
-        conn = sqlite3.connect(self.db_path)
+        """Khởi tạo cơ sở dữ liệu nếu chưa tồn tại và nâng cấp schema lên phiên bản mới nhất"""
+        conn = self._open_connection()
+        conn.isolation_level = None
         cursor = conn.cursor()
         
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS analysis_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                year INTEGER,
-                month INTEGER,
-                day INTEGER,
-                hour INTEGER,
-                minute INTEGER,
-                second INTEGER,
-                image_name TEXT,
-                prediction TEXT,
-                confidence REAL,
-                duration REAL,
-                notes TEXT
-            )
-        ''')
+        try:
+            # journal_mode được lưu trong file cơ sở dữ liệu, chỉ cần đặt một lần
+            cursor.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS analysis_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    year INTEGER,
+                    month INTEGER,
+                    day INTEGER,
+                    hour INTEGER,
+                    minute INTEGER,
+                    second INTEGER,
+                    image_name TEXT,
+                    prediction TEXT,
+                    confidence REAL,
+                    duration REAL,
+                    notes TEXT
+                )
+            ''')
+            
+            # Áp dụng lần lượt các migration chưa chạy, mỗi migration một transaction
+            for version, migration in enumerate(MIGRATIONS, start=1):
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    current_version = cursor.execute("PRAGMA user_version").fetchone()[0]
+                    if current_version < version:
+                        migration(cursor)
+                        cursor.execute(f"PRAGMA user_version = {version}")
+                    cursor.execute("COMMIT")
+                except Exception:
+                    cursor.execute("ROLLBACK")
+                    raise
+        finally:
+            conn.close()
+    
+    def get_schema_version(self):
+        """
+        Lấy phiên bản schema hiện tại của cơ sở dữ liệu
         
-        conn.commit()
-        conn.close()
+        Returns:
+            int: Giá trị PRAGMA user_version
+        """
+        with self._connection() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
     
     def extract_time_components(self, dt=None):
         """
@@ -78,7 +348,8 @@ class TimeExtractor:
         
         return time_components
     
-    def record_analysis(self, image_name, prediction, confidence, duration=None, notes=None):
+    def record_analysis(self, image_name, prediction, confidence, duration=None, notes=None,
+                        from_cache=False):
         """
         Ghi lại kết quả phân tích với thông tin thời gian
         
@@ -88,47 +359,122 @@ class TimeExtractor:
             confidence: Độ tin cậy (0-1)
             duration: Thời gian xử lý (giây)
             notes: Ghi chú thêm
+            from_cache: Kết quả được lấy từ cache dự đoán
             
         Returns:
             dict: Thông tin phân tích đã ghi
         """
         dt = datetime.now()
-        time_comp = self.extract_time_components(dt)
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO analysis_history 
-            (year, month, day, hour, minute, second, image_name, prediction, confidence, duration, notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            time_comp['year'],
-            time_comp['month'],
-            time_comp['day'],
-            time_comp['hour'],
-            time_comp['minute'],
-            time_comp['second'],
-            image_name,
-            prediction,
-            confidence,
-            duration,
-            notes
-        ))
-        
-        conn.commit()
-        analysis_id = cursor.lastrowid
-        conn.close()
-        
-        return {
-            'id': analysis_id,
-            'time': time_comp,
-            'image': image_name,
+        analysis = {
+            'image_name': image_name,
             'prediction': prediction,
             'confidence': confidence,
             'duration': duration,
-            'notes': notes
+            'notes': notes,
+            'from_cache': from_cache
         }
+        
+        with self._connection() as conn:
+            # Bảng tổng hợp được cập nhật trong cùng transaction
+            inserted = self._insert_analyses(conn.cursor(), [analysis], dt)
+            conn.commit()
+        
+        self._notify(inserted)
+        
+        return _analysis_record(inserted[0][0], self.extract_time_components(dt), analysis)
+    
+    def record_analyses(self, analyses):
+        """
+        Ghi lại nhiều kết quả phân tích trong một transaction duy nhất
+        
+        Args:
+            analyses: Danh sách dict với các khóa image_name, prediction,
+                confidence, duration, notes, from_cache, dt (5 khóa cuối tùy chọn;
+                dt là thời điểm phân tích, mặc định là thời điểm ghi)
+            
+        Returns:
+            list: Thông tin các phân tích đã ghi (cùng định dạng record_analysis)
+        """
+        now = datetime.now()
+        analyses = list(analyses)
+        
+        with self._connection() as conn:
+            inserted = self._insert_analyses(conn.cursor(), analyses, now)
+            conn.commit()
+        
+        self._notify(inserted)
+        
+        time_comps = {}
+        results = []
+        for (analysis_id, _), analysis in zip(inserted, analyses):
+            dt = analysis.get('dt') or now
+            if dt not in time_comps:
+                time_comps[dt] = self.extract_time_components(dt)
+            results.append(_analysis_record(analysis_id, time_comps[dt], analysis))
+        
+        return results
+    
+    def record_analyses_batch(self, records, chunk_size=BATCH_CHUNK_SIZE):
+        """
+        Ghi hàng loạt kết quả phân tích (ví dụ nhập lại kết quả phân loại offline)
+        bằng executemany, mỗi chunk_size bản ghi một transaction; listener được gọi
+        sau mỗi chunk đã commit
+        
+        Args:
+            records: Iterable các dict như record_analyses, hoặc các bộ
+                (image_name, prediction, confidence, duration, notes[, dt]) theo
+                BATCH_RECORD_FIELDS; dt mặc định là thời điểm ghi
+            chunk_size: Số bản ghi tối đa trong một transaction
+            
+        Returns:
+            tuple: (id đầu tiên, id cuối cùng) đã được gán, hoặc None nếu không có bản ghi
+        """
+        now = datetime.now()
+        records = iter(records)
+        first_id = last_id = None
+        
+        while True:
+            chunk = [_batch_analysis(record) for record in islice(records, chunk_size)]
+            if not chunk:
+                break
+            
+            with self._connection() as conn:
+                inserted = self._insert_analyses(conn.cursor(), chunk, now)
+                conn.commit()
+            
+            self._notify(inserted)
+            
+            if first_id is None:
+                first_id = inserted[0][0]
+            last_id = inserted[-1][0]
+        
+        if first_id is None:
+            return None
+        return first_id, last_id
+    
+    def _insert_analyses(self, cursor, analyses, now):
+        """
+        Ghi các dict phân tích bằng một executemany và cộng vào bảng tổng hợp,
+        trong transaction đang mở của cursor (người gọi commit)
+        
+        Args:
+            cursor: Cursor của kết nối đang ghi
+            analyses: Các dict phân tích (xem record_analyses)
+            now: Thời điểm dùng cho các dict không có dt
+            
+        Returns:
+            list: Các bộ (id, tham số INSERT_ANALYSIS) theo thứ tự của analyses, dùng cho _notify
+        """
+        rows = [_analysis_params(analysis, analysis.get('dt') or now) for analysis in analyses]
+        if not rows:
+            return []
+        
+        cursor.executemany(INSERT_ANALYSIS, rows)
+        _apply_rollups(cursor, [(row[2], row[3], row[4], row[5], row[9], row[10], row[11])
+                                for row in rows])
+        # Transaction giữ khóa ghi nên id của các bản ghi liên tiếp (AUTOINCREMENT)
+        last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(zip(range(last_id - len(rows) + 1, last_id + 1), rows))
     
     def get_analysis_by_date(self, year, month=None, day=None):
         """
@@ -142,10 +488,6 @@ class TimeExtractor:
         Returns:
             list: Danh sách các bản ghi phân tích
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
         query = "SELECT * FROM analysis_history WHERE year = ?"
         params = [year]
         
@@ -159,9 +501,11 @@ class TimeExtractor:
         
         query += " ORDER BY timestamp DESC"
         
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
         
         results = []
         for row in rows:
@@ -183,10 +527,6 @@ class TimeExtractor:
         Returns:
             list: Danh sách các bản ghi phân tích
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
         query = "SELECT * FROM analysis_history WHERE hour >= ? AND hour <= ?"
         params = [start_hour, end_hour]
         
@@ -204,9 +544,11 @@ class TimeExtractor:
         
         query += " ORDER BY timestamp DESC"
         
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
         
         results = []
         for row in rows:
@@ -214,6 +556,33 @@ class TimeExtractor:
         
         return results
     
+    def get_analysis_between(self, start, end, limit=None):
+        """
+        Lấy lịch sử phân tích trong khoảng thời gian [start, end) bất kỳ
+        (có thể qua nửa đêm, qua tháng), bằng một lần quét index epoch_ms
+        
+        Args:
+            start: datetime bắt đầu (không có múi giờ = giờ địa phương)
+            end: datetime kết thúc (không bao gồm)
+            limit: Giới hạn số bản ghi (tùy chọn)
+            
+        Returns:
+            list: Danh sách các bản ghi phân tích, mới nhất trước
+        """
+        query = SELECT_BETWEEN
+        params = [_epoch_ms(start), _epoch_ms(end)]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        
+        return [dict(row) for row in rows]
+    
     def get_statistics_by_date(self, year, month=None, day=None):
         """
         Lấy thống kê phân tích theo ngày/tháng/năm
@@ -226,48 +595,25 @@ class TimeExtractor:
         Returns:
             dict: Thống kê (tổng số, phân loại, độ tin cậy trung bình, etc.)
         """
-        records = self.get_analysis_by_date(year, month, day)
-        
-        if not records:
-            return {
-                'total': 0,
-                'by_prediction': {},
-                'average_confidence': 0,
-                'max_confidence': 0,
-                'min_confidence': 0,
-                'total_duration': 0,
-                'average_duration': 0
-            }
-        
-        by_prediction = {}
-        total_confidence = 0
-        total_duration = 0
-        max_conf = 0
-        min_conf = 1
-        
-        for record in records:
-            pred = record['prediction']
-            if pred not in by_prediction:
-                by_prediction[pred] = 0
-            by_prediction[pred] += 1
-            
-            if record['confidence']:
-                total_confidence += record['confidence']
-                max_conf = max(max_conf, record['confidence'])
-                min_conf = min(min_conf, record['confidence'])
-            
-            if record['duration']:
-                total_duration += record['duration']
-        
-        return {
-            'total': len(records),
-            'by_prediction': by_prediction,
-            'average_confidence': round(total_confidence / len(records), 4) if records else 0,
-            'max_confidence': round(max_conf, 4) if max_conf > 0 else 0,
-            'min_confidence': round(min_conf, 4) if min_conf < 1 else 0,
-            'total_duration': round(total_duration, 2),
-            'average_duration': round(total_duration / len(records), 4) if records else 0
-        }
+        return _format_statistics(self._statistics_groups(year, month, day))
+    
+    def _statistics_groups(self, year, month=None, day=None):
+        """Các nhóm (prediction, count, confidence_sum, max, min, duration_sum) cho _format_statistics"""
+        where, params = _date_conditions(year, month, day)
+        
+        # Đọc từ bảng tổng hợp: chi phí theo số bucket giờ, không theo số bản ghi
+        with self._connection() as conn:
+            return conn.execute(f'''
+                SELECT NULLIF(prediction, ?),
+                       SUM(count),
+                       SUM(confidence_sum),
+                       MAX(confidence_max),
+                       MIN(confidence_min),
+                       SUM(duration_sum)
+                FROM analysis_rollup_hourly
+                WHERE {where}
+                GROUP BY prediction
+            ''', [ROLLUP_NULL_PREDICTION] + params).fetchall()
     
     def get_hourly_statistics(self, year, month, day):
         """
@@ -281,36 +627,30 @@ class TimeExtractor:
         Returns:
             dict: Thống kê theo giờ (từ 0 đến 23)
         """
-        records = self.get_analysis_by_date(year, month, day)
-        
-        hourly_stats = {}
-        for hour in range(24):
-            hourly_stats[hour] = {
-                'count': 0,
-                'predictions': {},
-                'average_confidence': 0,
-                'total_duration': 0
-            }
+        return _format_hourly_statistics(self._hourly_statistics_groups(year, month, day))
+    
+    def _hourly_statistics_groups(self, year, month, day):
+        """Các nhóm (hour, prediction, count, confidence_sum, duration_sum) cho _format_hourly_statistics"""
+        with self._connection() as conn:
+            return conn.execute('''
+                SELECT hour, NULLIF(prediction, ?), count, confidence_sum, duration_sum
+                FROM analysis_rollup_hourly
+                WHERE year = ? AND month = ? AND day = ?
+            ''', [ROLLUP_NULL_PREDICTION, year, month, day]).fetchall()
+    
+    def rebuild_rollups(self):
+        """
+        Tính lại toàn bộ bảng tổng hợp từ analysis_history
+        (dùng khi dữ liệu được sửa trực tiếp ngoài TimeExtractor)
         
-        for record in records:
-            hour = record['hour']
-            hourly_stats[hour]['count'] += 1
-            
-            pred = record['prediction']
-            if pred not in hourly_stats[hour]['predictions']:
-                hourly_stats[hour]['predictions'][pred] = 0
-            hourly_stats[hour]['predictions'][pred] += 1
-            
-            if record['confidence']:
-                hourly_stats[hour]['average_confidence'] = (
-                    (hourly_stats[hour]['average_confidence'] * (hourly_stats[hour]['count'] - 1) + 
-                     record['confidence']) / hourly_stats[hour]['count']
-                )
-            
-            if record['duration']:
-                hourly_stats[hour]['total_duration'] += record['duration']
+        Returns:
+            int: Số bucket (giờ, lớp dự đoán) sau khi tính lại
+        """
+        with self._connection() as conn:
+            buckets = _rebuild_rollups(conn.cursor())
+            conn.commit()
         
-        return hourly_stats
+        return buckets
     
     def export_history_to_json(self, output_path='analysis_history.json', 
                                year=None, month=None, day=None):
@@ -327,12 +667,11 @@ class TimeExtractor:
             str: Đường dẫn file được tạo
         """
         if year is None:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM analysis_history ORDER BY timestamp DESC")
-            rows = cursor.fetchall()
-            conn.close()
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = sqlite3.Row
+                cursor.execute("SELECT * FROM analysis_history ORDER BY timestamp DESC")
+                rows = cursor.fetchall()
             records = [dict(row) for row in rows]
         else:
             records = self.get_analysis_by_date(year, month, day)
@@ -342,26 +681,66 @@ class TimeExtractor:
         
         return output_path
     
-    def get_all_history(self, limit=100):
+    def iter_history(self, year=None, month=None, day=None, chunk_size=FETCH_CHUNK_SIZE):
+        """
+        Duyệt lịch sử phân tích (mới nhất trước) theo từng chunk bằng fetchmany,
+        bộ nhớ không phụ thuộc số bản ghi
+        
+        Args:
+            year: Năm (tùy chọn, nếu None duyệt tất cả)
+            month: Tháng (tùy chọn)
+            day: Ngày (tùy chọn)
+            chunk_size: Số bản ghi đọc mỗi lần
+            
+        Yields:
+            dict: Từng bản ghi phân tích
+        """
+        query = "SELECT * FROM analysis_history"
+        params = []
+        if year is not None:
+            where, params = _date_conditions(year, month, day)
+            query += f" WHERE {where}"
+        query += " ORDER BY timestamp DESC"
+        
+        # Kết nối được giữ cho tới khi generator chạy hết hoặc bị đóng
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+    
+    def get_all_history(self, limit=100, cursor=None, since_id=None):
         """
         Lấy toàn bộ lịch sử phân tích
         
         Args:
             limit: Giới hạn số bản ghi
+            cursor: Bộ (timestamp, id) của bản ghi cuối trang trước (tùy chọn);
+                trả về trang kế tiếp (cũ hơn) mà không cần OFFSET
+            since_id: Chỉ lấy các bản ghi có id lớn hơn giá trị này (tùy chọn),
+                dùng khi client chỉ cần phần mới từ lần tải trước; nếu có nhiều hơn
+                limit bản ghi mới thì trả về limit bản ghi có id nhỏ nhất
             
         Returns:
-            list: Danh sách phân tích
+            list: Danh sách phân tích (mới nhất trước)
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        if since_id is not None:
+            query, params = SELECT_RECENT_SINCE, [since_id, limit]
+        elif cursor is not None:
+            query, params = SELECT_RECENT_BEFORE, [cursor[0], cursor[1], limit]
+        else:
+            query, params = SELECT_RECENT, [limit]
         
-        cursor.execute(
-            "SELECT * FROM analysis_history ORDER BY timestamp DESC LIMIT ?",
-            [limit]
-        )
-        rows = cursor.fetchall()
-        conn.close()
+        with self._connection() as conn:
+            db_cursor = conn.cursor()
+            db_cursor.row_factory = sqlite3.Row
+            db_cursor.execute(query, params)
+            rows = db_cursor.fetchall()
         
         return [dict(row) for row in rows]
     
@@ -375,20 +754,239 @@ class TimeExtractor:
         Returns:
             int: Số bản ghi đã xóa
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         # Lấy datetime cách đây n ngày
         from datetime import timedelta
         cutoff_date = datetime.now() - timedelta(days=days_old)
         
-        cursor.execute(
-            "DELETE FROM analysis_history WHERE timestamp < ?",
-            [cutoff_date.isoformat()]
-        )
-        
-        deleted_count = cursor.rowcount
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            # Các giờ bị ảnh hưởng, để tính lại bảng tổng hợp sau khi xóa
+            cursor.execute(
+                "SELECT DISTINCT year, month, day, hour FROM analysis_history WHERE epoch_ms < ?",
+                [_epoch_ms(cutoff_date)]
+            )
+            buckets = cursor.fetchall()
+            
+            cursor.execute(
+                "DELETE FROM analysis_history WHERE epoch_ms < ?",
+                [_epoch_ms(cutoff_date)]
+            )
+            deleted_count = cursor.rowcount
+            
+            _rebuild_rollups(cursor, buckets)
+            conn.commit()
         
         return deleted_count
+
+def _analysis_params(analysis, dt):
+    """Tham số INSERT_ANALYSIS (theo INSERT_ANALYSIS_COLUMNS) của một dict phân tích tại thời điểm dt"""
+    return (
+        _utc_timestamp(dt),
+        _epoch_ms(dt),
+        dt.year,
+        dt.month,
+        dt.day,
+        dt.hour,
+        dt.minute,
+        dt.second,
+        analysis['image_name'],
+        analysis['prediction'],
+        analysis['confidence'],
+        analysis.get('duration'),
+        analysis.get('notes'),
+        int(bool(analysis.get('from_cache', False)))
+    )
+
+def _analysis_record(analysis_id, time_comp, analysis):
+    """Thông tin phân tích đã ghi trả về cho người gọi record_analysis/record_analyses"""
+    return {
+        'id': analysis_id,
+        'time': time_comp,
+        'image': analysis['image_name'],
+        'prediction': analysis['prediction'],
+        'confidence': analysis['confidence'],
+        'duration': analysis.get('duration'),
+        'notes': analysis.get('notes'),
+        'from_cache': bool(analysis.get('from_cache', False))
+    }
+
+def _batch_analysis(record):
+    """Dict phân tích từ một bản ghi của record_analyses_batch (dict hoặc bộ theo BATCH_RECORD_FIELDS)"""
+    if isinstance(record, dict):
+        return record
+    return dict(zip(BATCH_RECORD_FIELDS, record))
+
+def _utc_timestamp(dt):
+    """Chuỗi thời gian UTC cùng định dạng với CURRENT_TIMESTAMP của SQLite"""
+    return dt.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+def make_history_cursor(record):
+    """Cursor phân trang (chuỗi) trỏ tới bản ghi cuối cùng của một trang"""
+    return f"{record['timestamp']}|{record['id']}"
+
+def parse_history_cursor(cursor):
+    """
+    Đọc cursor do make_history_cursor tạo ra
+    
+    Returns:
+        tuple: (timestamp, id)
+        
+    Raises:
+        ValueError: Cursor không hợp lệ
+    """
+    timestamp, separator, record_id = cursor.rpartition('|')
+    if not separator or not timestamp:
+        raise ValueError(f"Invalid history cursor: {cursor}")
+    return timestamp, int(record_id)
+
+def _epoch_ms(dt):
+    """Mili giây kể từ 1970-01-01 UTC (datetime không có múi giờ được hiểu là giờ địa phương)"""
+    return round(dt.timestamp() * 1000)
+
+def _apply_rollups(cursor, rows):
+    """
+    Cộng các bản ghi mới vào bảng tổng hợp theo giờ
+    
+    Args:
+        cursor: Cursor trong transaction đang ghi bản ghi
+        rows: Các bộ (year, month, day, hour, prediction, confidence, duration);
+            prediction None được gộp vào bucket ROLLUP_NULL_PREDICTION
+    """
+    buckets = {}
+    for year, month, day, hour, prediction, confidence, duration in rows:
+        if prediction is None:
+            prediction = ROLLUP_NULL_PREDICTION
+        key = (year, month, day, hour, prediction)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = [0, 0.0, None, None, 0.0]
+        bucket[0] += 1
+        bucket[1] += confidence or 0
+        if confidence:
+            bucket[2] = confidence if bucket[2] is None else min(bucket[2], confidence)
+            bucket[3] = confidence if bucket[3] is None else max(bucket[3], confidence)
+        bucket[4] += duration or 0
+    
+    cursor.executemany(ROLLUP_UPSERT, [key + tuple(bucket) for key, bucket in buckets.items()])
+
+def _rebuild_rollups(cursor, hours=None):
+    """
+    Tính lại bảng tổng hợp từ analysis_history
+    
+    Args:
+        cursor: Cursor trong transaction đang mở
+        hours: Các bộ (year, month, day, hour) cần tính lại (None = toàn bộ bảng)
+        
+    Returns:
+        int: Số bucket được tính lại
+    """
+    if hours is None:
+        cursor.execute("DELETE FROM analysis_rollup_hourly")
+        cursor.execute(f"INSERT INTO analysis_rollup_hourly ({ROLLUP_COLUMNS}) "
+                       f"{ROLLUP_SELECT} {ROLLUP_GROUP_BY}")
+        return cursor.execute("SELECT COUNT(*) FROM analysis_rollup_hourly").fetchone()[0]
+    
+    hours = [tuple(hour) for hour in hours]
+    bucket_filter = "year = ? AND month = ? AND day = ? AND hour = ?"
+    cursor.executemany(f"DELETE FROM analysis_rollup_hourly WHERE {bucket_filter}", hours)
+    buckets = 0
+    for hour in hours:
+        cursor.execute(f"INSERT INTO analysis_rollup_hourly ({ROLLUP_COLUMNS}) "
+                       f"{ROLLUP_SELECT} WHERE {bucket_filter} {ROLLUP_GROUP_BY}", hour)
+        buckets += cursor.rowcount
+    return buckets
+
+def _date_conditions(year, month=None, day=None):
+    """Điều kiện WHERE và tham số cho bộ lọc năm/tháng/ngày"""
+    conditions = ["year = ?"]
+    params = [year]
+    
+    if month is not None:
+        conditions.append("month = ?")
+        params.append(month)
+    
+    if day is not None:
+        conditions.append("day = ?")
+        params.append(day)
+    
+    return " AND ".join(conditions), params
+
+def _format_statistics(groups):
+    """
+    Tạo dict thống kê từ các nhóm đã gộp theo lớp dự đoán
+    
+    Args:
+        groups: Các bộ (prediction, count, confidence_sum, confidence_max,
+            confidence_min, duration_sum); min/max bỏ qua độ tin cậy rỗng hoặc 0
+    """
+    total = 0
+    by_prediction = {}
+    total_confidence = 0
+    total_duration = 0
+    max_conf = 0
+    min_conf = 1
+    
+    for prediction, count, conf_sum, conf_max, conf_min, dur_sum in groups:
+        if not count:
+            continue
+        total += count
+        by_prediction[prediction] = by_prediction.get(prediction, 0) + count
+        total_confidence += conf_sum or 0
+        total_duration += dur_sum or 0
+        if conf_max is not None:
+            max_conf = max(max_conf, conf_max)
+        if conf_min is not None:
+            min_conf = min(min_conf, conf_min)
+    
+    if not total:
+        return {
+            'total': 0,
+            'by_prediction': {},
+            'average_confidence': 0,
+            'max_confidence': 0,
+            'min_confidence': 0,
+            'total_duration': 0,
+            'average_duration': 0
+        }
+    
+    return {
+        'total': total,
+        'by_prediction': by_prediction,
+        'average_confidence': round(total_confidence / total, 4),
+        'max_confidence': round(max_conf, 4) if max_conf > 0 else 0,
+        'min_confidence': round(min_conf, 4) if min_conf < 1 else 0,
+        'total_duration': round(total_duration, 2),
+        'average_duration': round(total_duration / total, 4)
+    }
+
+def _format_hourly_statistics(groups):
+    """
+    Tạo dict thống kê 24 giờ từ các nhóm đã gộp theo (giờ, lớp dự đoán)
+    
+    Args:
+        groups: Các bộ (hour, prediction, count, confidence_sum, duration_sum)
+    """
+    hourly_stats = {}
+    for hour in range(24):
+        hourly_stats[hour] = {
+            'count': 0,
+            'predictions': {},
+            'average_confidence': 0,
+            'total_duration': 0
+        }
+    
+    confidence_sums = {}
+    for hour, prediction, count, conf_sum, dur_sum in groups:
+        if hour not in hourly_stats or not count:
+            continue
+        stats = hourly_stats[hour]
+        stats['count'] += count
+        stats['predictions'][prediction] = stats['predictions'].get(prediction, 0) + count
+        stats['total_duration'] += dur_sum or 0
+        confidence_sums[hour] = confidence_sums.get(hour, 0) + (conf_sum or 0)
+    
+    for hour, conf_sum in confidence_sums.items():
+        hourly_stats[hour]['average_confidence'] = conf_sum / hourly_stats[hour]['count']
+    
+    return hourly_stats
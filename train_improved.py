@@ -3,14 +3,39 @@ from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Conv2D, MaxPooling2D, Flatten, Dense, Dropout, BatchNormalization
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.optimizers import Adam
+import argparse
 import os
 import numpy as np
 
+from simple_model import create_model
+from training_args import add_training_arguments
+
 IMAGE_SIZE = (224, 224)
 BATCH_SIZE = 32
 EPOCHS = 15
 NUM_CLASSES = 3
 
+parser = argparse.ArgumentParser(description='Training model phân loại thời tiết có cải thiện')
+add_training_arguments(parser, seed_help='Seed xáo trộn, lấy mẫu theo lớp và augmentation '
+                                         '(augmentation chỉ với --loader tfdata)')
+parser.add_argument('--sampling',
+                    help="Lấy mẫu theo lớp thay cho class_weight: natural, sqrt, balanced hoặc "
+                         "'Mưa=1,Nắng=0.5,Tuyết=1' (chỉ với --loader memmap/tfdata)")
+parser.add_argument('--steps-per-epoch', type=int,
+                    help='Số batch mỗi epoch khi có --sampling (mặc định: một lượt tập training)')
+args = parser.parse_args()
+
+if args.sampling is not None:
+    from balanced_sampler import parse_sampling
+    if args.loader == 'directory':
+        parser.error('--sampling cần --loader memmap hoặc tfdata')
+    try:
+        sampling = parse_sampling(args.sampling)
+    except ValueError as e:
+        parser.error(str(e))
+else:
+    sampling = None
+
 print("\n" + "="*60)
 print("🚀 TRAINING MODEL CÓ CẢI THIỆN")
 print("="*60)
@@ -50,23 +75,34 @@ data_gen = ImageDataGenerator(
     fill_mode='nearest'
 )
 
-train_gen = data_gen.flow_from_directory(
-    'data',
-    target_size=IMAGE_SIZE,
-    batch_size=BATCH_SIZE,
-    class_mode='categorical',
-    subset='training',
-    shuffle=True
-)
-
-valid_gen = data_gen.flow_from_directory(
-    'data',
-    target_size=IMAGE_SIZE,
-    batch_size=BATCH_SIZE,
-    class_mode='categorical',
-    subset='validation',
-    shuffle=False
-)
+if args.loader == 'memmap':
+    from memmap_dataset import memmap_generators
+    train_gen, valid_gen = memmap_generators(args.cache_dir, IMAGE_SIZE, BATCH_SIZE, data_gen,
+                                             seed=args.seed, sampling=sampling,
+                                             steps_per_epoch=args.steps_per_epoch, workers=args.workers)
+elif args.loader == 'tfdata':
+    from tf_data_pipeline import tf_data_generators
+    train_gen, valid_gen = tf_data_generators('data', IMAGE_SIZE, BATCH_SIZE, data_gen, seed=args.seed,
+                                              in_graph_augmentation=args.graph_augmentation,
+                                              sampling=sampling, steps_per_epoch=args.steps_per_epoch)
+else:
+    train_gen = data_gen.flow_from_directory(
+        'data',
+        target_size=IMAGE_SIZE,
+        batch_size=BATCH_SIZE,
+        class_mode='categorical',
+        subset='training',
+        shuffle=True
+    )
+
+    valid_gen = data_gen.flow_from_directory(
+        'data',
+        target_size=IMAGE_SIZE,
+        batch_size=BATCH_SIZE,
+        class_mode='categorical',
+        subset='validation',
+        shuffle=False
+    )
 
 print(f"   Training: {train_gen.samples} ảnh")
 print(f"   Validation: {valid_gen.samples} ảnh")
@@ -74,37 +110,40 @@ print(f"   Validation: {valid_gen.samples} ảnh")
 # Bước 3: Xây dựng model cải thiện
 print("\n🏗️  Bước 3: Xây dựng model")
 
-model = Sequential([
-    Conv2D(32, (3, 3), activation='relu', padding='same', input_shape=(IMAGE_SIZE[0], IMAGE_SIZE[1], 3)),
-    BatchNormalization(),
-    Conv2D(32, (3, 3), activation='relu', padding='same'),
-    BatchNormalization(),
-    MaxPooling2D((2, 2)),
-    Dropout(0.25),
+if args.architecture is not None:
+    model = create_model((IMAGE_SIZE[0], IMAGE_SIZE[1], 3), NUM_CLASSES, args.architecture, args.width_multiplier)
+else:
+    model = Sequential([
+        Conv2D(32, (3, 3), activation='relu', padding='same', input_shape=(IMAGE_SIZE[0], IMAGE_SIZE[1], 3)),
+        BatchNormalization(),
+        Conv2D(32, (3, 3), activation='relu', padding='same'),
+        BatchNormalization(),
+        MaxPooling2D((2, 2)),
+        Dropout(0.25),
     
-    Conv2D(64, (3, 3), activation='relu', padding='same'),
-    BatchNormalization(),
-    Conv2D(64, (3, 3), activation='relu', padding='same'),
-    BatchNormalization(),
-    MaxPooling2D((2, 2)),
-    Dropout(0.25),
+        Conv2D(64, (3, 3), activation='relu', padding='same'),
+        BatchNormalization(),
+        Conv2D(64, (3, 3), activation='relu', padding='same'),
+        BatchNormalization(),
+        MaxPooling2D((2, 2)),
+        Dropout(0.25),
     
-    Conv2D(128, (3, 3), activation='relu', padding='same'),
-    BatchNormalization(),
-    Conv2D(128, (3, 3), activation='relu', padding='same'),
-    BatchNormalization(),
-    MaxPooling2D((2, 2)),
-    Dropout(0.25),
+        Conv2D(128, (3, 3), activation='relu', padding='same'),
+        BatchNormalization(),
+        Conv2D(128, (3, 3), activation='relu', padding='same'),
+        BatchNormalization(),
+        MaxPooling2D((2, 2)),
+        Dropout(0.25),
     
-    Flatten(),
-    Dense(256, activation='relu'),
-    BatchNormalization(),
-    Dropout(0.5),
-    Dense(128, activation='relu'),
-    BatchNormalization(),
-    Dropout(0.3),
-    Dense(NUM_CLASSES, activation='softmax')
-])
+        Flatten(),
+        Dense(256, activation='relu'),
+        BatchNormalization(),
+        Dropout(0.5),
+        Dense(128, activation='relu'),
+        BatchNormalization(),
+        Dropout(0.3),
+        Dense(NUM_CLASSES, activation='softmax')
+    ])
 
 # Compile với learning rate thấp hơn
 optimizer = Adam(learning_rate=0.0001)
@@ -135,11 +174,17 @@ early_stopping = tf.keras.callbacks.EarlyStopping(
     verbose=1
 )
 
-# QUAN TRỌNG: Sử dụng class_weights
+# QUAN TRỌNG: Sử dụng class_weights (hoặc lấy mẫu cân bằng theo lớp với --sampling)
+if sampling is not None:
+    class_weights = None
+    print(f"\n⚖️  Lấy mẫu theo lớp '{args.sampling}' thay cho class_weight, "
+          f"{train_gen.steps_per_epoch} batch mỗi epoch")
+
 history = model.fit(
     train_gen,
     validation_data=valid_gen,
     epochs=EPOCHS,
+    steps_per_epoch=getattr(train_gen, 'steps_per_epoch', None),
     class_weight=class_weights,  # ← KEY LINE
     callbacks=[checkpoint, early_stopping],
     verbose=1
@@ -159,7 +204,10 @@ print(f"   • checkpoints/simple_model_best.h5")
 print(f"   • checkpoints/simple_model.h5")
 
 print(f"\n🎯 Cải thiện:")
-print(f"   ✅ Sử dụng class_weight để cân bằng dữ liệu")
+if sampling is not None:
+    print(f"   ✅ Lấy mẫu theo lớp ({args.sampling}) để cân bằng dữ liệu")
+else:
+    print(f"   ✅ Sử dụng class_weight để cân bằng dữ liệu")
 print(f"   ✅ Tăng data augmentation (30 độ rotation, zoom, shift, shear)")
 print(f"   ✅ Thêm Batch Normalization")
 print(f"   ✅ Tăng Dropout (lên 0.5)")
@@ -2,13 +2,21 @@ import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Conv2D, MaxPooling2D, Flatten, Dense, Dropout
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
+import argparse
 import os
 
+from simple_model import create_model
+from training_args import add_training_arguments
+
 IMAGE_SIZE = (128, 128)
 BATCH_SIZE = 32
 EPOCHS = 5
 NUM_CLASSES = 3
 
+parser = argparse.ArgumentParser(description='Training nhanh model phân loại thời tiết')
+add_training_arguments(parser)
+args = parser.parse_args()
+
 print('=== BẮT ĐẦU TRAINING MODEL NHANH ===')
 print('Bước 1: Chuẩn bị dữ liệu')
 
@@ -20,39 +28,51 @@ data_gen = ImageDataGenerator(
     brightness_range=[0.8, 1.2]
 )
 
-train_gen = data_gen.flow_from_directory(
-    'data',
-    target_size=IMAGE_SIZE,
-    batch_size=BATCH_SIZE,
-    class_mode='categorical',
-    subset='training',
-    shuffle=True
-)
+if args.loader == 'memmap':
+    from memmap_dataset import memmap_generators
+    train_gen, valid_gen = memmap_generators(args.cache_dir, IMAGE_SIZE, BATCH_SIZE, data_gen,
+                                             workers=args.workers)
+elif args.loader == 'tfdata':
+    from tf_data_pipeline import tf_data_generators
+    train_gen, valid_gen = tf_data_generators('data', IMAGE_SIZE, BATCH_SIZE, data_gen, seed=args.seed,
+                                              in_graph_augmentation=args.graph_augmentation)
+else:
+    train_gen = data_gen.flow_from_directory(
+        'data',
+        target_size=IMAGE_SIZE,
+        batch_size=BATCH_SIZE,
+        class_mode='categorical',
+        subset='training',
+        shuffle=True
+    )
 
-valid_gen = data_gen.flow_from_directory(
-    'data',
-    target_size=IMAGE_SIZE,
-    batch_size=BATCH_SIZE,
-    class_mode='categorical',
-    subset='validation',
-    shuffle=False
-)
+    valid_gen = data_gen.flow_from_directory(
+        'data',
+        target_size=IMAGE_SIZE,
+        batch_size=BATCH_SIZE,
+        class_mode='categorical',
+        subset='validation',
+        shuffle=False
+    )
 
 print(f'Training images: {train_gen.samples}, Validation images: {valid_gen.samples}')
 
 print('\nBước 2: Xây dựng model')
-model = Sequential([
-    Conv2D(32, (3, 3), activation='relu', padding='same', input_shape=(*IMAGE_SIZE, 3)),
-    MaxPooling2D((2, 2)),
-    Conv2D(64, (3, 3), activation='relu', padding='same'),
-    MaxPooling2D((2, 2)),
-    Conv2D(64, (3, 3), activation='relu', padding='same'),
-    MaxPooling2D((2, 2)),
-    Flatten(),
-    Dense(128, activation='relu'),
-    Dropout(0.5),
-    Dense(NUM_CLASSES, activation='softmax')
-])
+if args.architecture is not None:
+    model = create_model((*IMAGE_SIZE, 3), NUM_CLASSES, args.architecture, args.width_multiplier)
+else:
+    model = Sequential([
+        Conv2D(32, (3, 3), activation='relu', padding='same', input_shape=(*IMAGE_SIZE, 3)),
+        MaxPooling2D((2, 2)),
+        Conv2D(64, (3, 3), activation='relu', padding='same'),
+        MaxPooling2D((2, 2)),
+        Conv2D(64, (3, 3), activation='relu', padding='same'),
+        MaxPooling2D((2, 2)),
+        Flatten(),
+        Dense(128, activation='relu'),
+        Dropout(0.5),
+        Dense(NUM_CLASSES, activation='softmax')
+    ])
 
 model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
 
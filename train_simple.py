@@ -2,8 +2,12 @@ import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Conv2D, MaxPooling2D, Flatten, Dense, Dropout
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
+import argparse
 import os
 
+from simple_model import create_model as create_architecture
+from training_args import add_training_arguments
+
 """
 Mini project phân loại ảnh thời tiết
 Model này được thiết kế đơn giản để:
@@ -19,8 +23,14 @@ EPOCHS = 20              # Số lần train lại toàn bộ dữ liệu
 NUM_CLASSES = 3          # Số loại thời tiết (Nắng, Mưa, Tuyết)
 
 # 2. Chuẩn bị dữ liệu
-def prepare_data():
-    """Chuẩn bị dữ liệu train và validation"""
+def prepare_data(loader='directory', cache_dir='dataset_cache', workers=1, seed=None,
+                 graph_augmentation=False):
+    """
+    Chuẩn bị dữ liệu train và validation
+    
+    loader='memmap' đọc ảnh đã giải mã sẵn từ cache_dir (tạo bằng prepare_dataset.py),
+    loader='tfdata' dùng pipeline tf.data (tf_data_pipeline.py)
+    """
     print("\n--- Bước 1: Chuẩn bị dữ liệu ---")
     
     # Tăng cường dữ liệu (Data Augmentation) đơn giản
@@ -32,25 +42,34 @@ def prepare_data():
         brightness_range=[0.8, 1.2]  # Điều chỉnh độ sáng
     )
     
-    # Load dữ liệu training
-    train_gen = data_gen.flow_from_directory(
-        'data',
-        target_size=IMAGE_SIZE,
-        batch_size=BATCH_SIZE,
-        class_mode='categorical',
-        subset='training',
-        shuffle=True
-    )
-    
-    # Load dữ liệu validation
-    valid_gen = data_gen.flow_from_directory(
-        'data',
-        target_size=IMAGE_SIZE,
-        batch_size=BATCH_SIZE,
-        class_mode='categorical',
-        subset='validation',
-        shuffle=False
-    )
+    if loader == 'memmap':
+        from memmap_dataset import memmap_generators
+        train_gen, valid_gen = memmap_generators(cache_dir, IMAGE_SIZE, BATCH_SIZE, data_gen,
+                                                 workers=workers)
+    elif loader == 'tfdata':
+        from tf_data_pipeline import tf_data_generators
+        train_gen, valid_gen = tf_data_generators('data', IMAGE_SIZE, BATCH_SIZE, data_gen, seed=seed,
+                                                  in_graph_augmentation=graph_augmentation)
+    else:
+        # Load dữ liệu training
+        train_gen = data_gen.flow_from_directory(
+            'data',
+            target_size=IMAGE_SIZE,
+            batch_size=BATCH_SIZE,
+            class_mode='categorical',
+            subset='training',
+            shuffle=True
+        )
+        
+        # Load dữ liệu validation
+        valid_gen = data_gen.flow_from_directory(
+            'data',
+            target_size=IMAGE_SIZE,
+            batch_size=BATCH_SIZE,
+            class_mode='categorical',
+            subset='validation',
+            shuffle=False
+        )
     
     print(f"Số lớp phân loại: {len(train_gen.class_indices)}")
     print(f"Tên các lớp: {train_gen.class_indices}")
@@ -60,11 +79,37 @@ def prepare_data():
     return train_gen, valid_gen
 
 # 3. Xây dựng model
-def create_model():
-    """Tạo model CNN đơn giản nhưng hiệu quả"""
+def create_model(architecture=None, width_multiplier=1.0):
+    """
+    Tạo model CNN đơn giản nhưng hiệu quả
+
+    Args:
+        architecture: None = model mặc định của script, hoặc tên kiến trúc của
+            simple_model.create_model ('baseline', 'gap', 'separable')
+        width_multiplier: Hệ số nhân số filter (chỉ với architecture)
+    """
     print("\n--- Bước 2: Xây dựng model ---")
     
-    model = Sequential([
+    if architecture is not None:
+        model = create_architecture((*IMAGE_SIZE, 3), NUM_CLASSES, architecture, width_multiplier)
+    else:
+        model = _default_model()
+    
+    # Compile model
+    model.compile(
+        optimizer='adam',
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    
+    # In tổng quan model
+    model.summary()
+    
+    return model
+
+def _default_model():
+    """Model mặc định: 3 block Conv2D + Flatten + Dense(128)"""
+    return Sequential([
         # Block 1: Trích xuất đặc trưng cơ bản
         Conv2D(32, (3, 3), activation='relu', padding='same', 
                input_shape=(*IMAGE_SIZE, 3)),
@@ -86,18 +131,6 @@ def create_model():
         Dropout(0.5),  # Tránh overfitting
         Dense(NUM_CLASSES, activation='softmax')  # Layer output
     ])
-    
-    # Compile model
-    model.compile(
-        optimizer='adam',
-        loss='categorical_crossentropy',
-        metrics=['accuracy']
-    )
-    
-    # In tổng quan model
-    model.summary()
-    
-    return model
 
 # 4. Training
 def train_model(model, train_gen, valid_gen):
@@ -141,13 +174,18 @@ def train_model(model, train_gen, valid_gen):
 
 def main():
     """Hàm chính chạy toàn bộ quá trình"""
+    parser = argparse.ArgumentParser(description='Training model phân loại thời tiết')
+    add_training_arguments(parser)
+    args = parser.parse_args()
+    
     print("=== BẮT ĐẦU TRAINING MODEL PHÂN LOẠI THỜI TIẾT ===")
     
     # 1. Chuẩn bị dữ liệu
-    train_gen, valid_gen = prepare_data()
+    train_gen, valid_gen = prepare_data(args.loader, args.cache_dir, args.workers, args.seed,
+                                        args.graph_augmentation)
     
     # 2. Tạo model
-    model = create_model()
+    model = create_model(args.architecture, args.width_multiplier)
     
     # 3. Training
     history = train_model(model, train_gen, valid_gen)
@@ -0,0 +1,31 @@
+from simple_model import ARCHITECTURES
+
+# Cách đọc dữ liệu của các script training
+LOADERS = ('directory', 'memmap', 'tfdata')
+
+def add_training_arguments(parser, seed_help='Seed xáo trộn và augmentation (chỉ với --loader tfdata)'):
+    """
+    Thêm các tham số dòng lệnh chung của train_simple.py, train_improved.py và train_quick.py
+    (cách đọc dữ liệu, augmentation, kiến trúc model)
+
+    Args:
+        parser: argparse.ArgumentParser của script
+        seed_help: Mô tả của --seed (tùy script dùng seed cho những gì)
+
+    Returns:
+        argparse.ArgumentParser: parser đã thêm tham số
+    """
+    parser.add_argument('--loader', choices=LOADERS, default='directory',
+                        help="directory: đọc JPEG từ data/ mỗi epoch; memmap: đọc cache của prepare_dataset.py; "
+                             "tfdata: pipeline tf.data giải mã song song và cache trong bộ nhớ")
+    parser.add_argument('--cache-dir', default='dataset_cache', help='Thư mục cache của prepare_dataset.py')
+    parser.add_argument('--workers', type=int, default=1, help='Số thread tạo batch (chỉ với --loader memmap)')
+    parser.add_argument('--seed', type=int, help=seed_help)
+    parser.add_argument('--graph-augmentation', action='store_true',
+                        help='Augmentation theo batch trong graph TensorFlow (chỉ với --loader tfdata)')
+    parser.add_argument('--architecture', choices=ARCHITECTURES,
+                        help='Kiến trúc của simple_model.create_model thay cho model mặc định '
+                             '(xem benchmark_models.py)')
+    parser.add_argument('--width-multiplier', type=float, default=1.0,
+                        help='Hệ số nhân số filter (chỉ với --architecture)')
+    return parser